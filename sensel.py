@@ -98,11 +98,8 @@ EC_REG_INVALID_ADDRESS = 1
 EC_REG_INVALID_VALUE = 2
 EC_REG_INVALID_PERMISSIONS = 3
 
-sensel_serial = None
-sensor_x_to_mm_factor = -1
-sensor_y_to_mm_factor = -1
-
-_serial_lock = None
+_open_ports = set() # Ports held by any SenselDevice in this process
+_open_ports_lock = threading.Lock()
 
 SENSEL_DEVICE_INFO_SIZE = 9
 
@@ -116,34 +113,138 @@ class SenselDeviceInfo():
         self.device_id =        _convertBufToVal(data[6:8])
         self.device_revision =  _convertBufToVal(data[8:9])
 
+#Packets that are a single type byte, and packets followed by a size,
+#payload and checksum
+SENSEL_SINGLE_BYTE_PACKETS = (SENSEL_PT_FRAME_NACK, SENSEL_PT_READ_NACK,
+                              SENSEL_PT_RVS_NACK, SENSEL_PT_WRITE_ACK,
+                              SENSEL_PT_WRITE_NACK, SENSEL_PT_WVS_ACK,
+                              SENSEL_PT_WVS_NACK)
+SENSEL_SIZED_PACKETS = (SENSEL_PT_FRAME, SENSEL_PT_READ_ACK, SENSEL_PT_RVS_ACK)
+
+#Packet parser states
+_PARSE_TYPE = 0
+_PARSE_SIZE = 1
+_PARSE_PAYLOAD = 2
+
+class SenselPacketReader():
+    """Reads the serial port in chunks into a reusable buffer and parses
+    complete packets out of it, one state at a time, so that a packet
+    split across reads is picked up where it was left off"""
+
+    def __init__(self, port, capacity=4096):
+        self.port = port
+        self.buf = bytearray(capacity)
+        self.start = 0 #First unparsed byte
+        self.end = 0 #End of the bytes read
+        self.state = _PARSE_TYPE
+        self.packet_type = 0
+        self.packet_size = 0
+        self.resync_end = 0 #Bytes before this belong to a rejected packet
+        self.reads = 0 #Serial read calls
+        self.bytes_read = 0
+        self.skipped_bytes = 0 #Bytes dropped to resynchronize
+        self.checksum_errors = 0
+
+    def reset(self):
+        self.start = 0
+        self.end = 0
+        self.resync_end = 0
+        self.state = _PARSE_TYPE
+
+    def readPacket(self):
+        while True:
+            (packet, needed) = self._parsePacket()
+            if packet is not None:
+                return packet
+            if not self._fill(needed):
+                logging.error("Timed out with %d bytes of a packet buffered" %
+                              (self.end - self.start))
+                self.reset()
+                raise SenselSerialReadError(0, needed)
+
+    #Reads at least the bytes needed, and all that are already waiting
+    def _fill(self, needed):
+        size = max(needed, self.port.inWaiting())
+        if self.end + size > len(self.buf):
+            remaining = self.end - self.start
+            if self.start > 0:
+                self.buf[:remaining] = self.buf[self.start:self.end]
+                self.resync_end = max(self.resync_end - self.start, 0)
+                (self.start, self.end) = (0, remaining)
+            if remaining + size > len(self.buf):
+                self.buf.extend(bytearray(remaining + size - len(self.buf)))
+        data = self.port.read(size)
+        self.reads += 1
+        self.bytes_read += len(data)
+        self.buf[self.end:self.end + len(data)] = data
+        self.end += len(data)
+        return len(data) > 0
+
+    #Returns ((type, payload), 0) for a complete packet, or (None, bytes
+    #still needed). The payload of a single byte packet is None.
+    def _parsePacket(self):
+        buf = self.buf
+        while True:
+            available = self.end - self.start
+            if self.state == _PARSE_TYPE:
+                if available < 1:
+                    return (None, 1)
+                packet_type = buf[self.start]
+                if packet_type in SENSEL_SINGLE_BYTE_PACKETS and \
+                        self.start >= self.resync_end:
+                    self.start += 1
+                    return ((packet_type, None), 0)
+                #Inside a rejected packet only a sized packet with a good
+                #checksum counts, as any byte there may look like an ACK
+                if packet_type not in SENSEL_SIZED_PACKETS:
+                    self.start += 1
+                    self.skipped_bytes += 1
+                    continue
+                self.packet_type = packet_type
+                self.state = _PARSE_SIZE
+            if self.state == _PARSE_SIZE:
+                if available < 3:
+                    return (None, 3 - available)
+                self.packet_size = buf[self.start + 1] | (buf[self.start + 2] << 8)
+                self.state = _PARSE_PAYLOAD
+            total = 4 + self.packet_size
+            if available < total:
+                return (None, total - available)
+            payload_start = self.start + 3
+            payload_end = payload_start + self.packet_size
+            payload = buf[payload_start:payload_end]
+            self.state = _PARSE_TYPE
+            if (sum(payload) & 0xFF) != buf[payload_end]:
+                logging.error("Checksum failed on packet type %d of %d bytes" %
+                              (self.packet_type, self.packet_size))
+                self.checksum_errors += 1
+                self.skipped_bytes += 1
+                self.resync_end = max(self.resync_end, self.start + total)
+                self.start += 1 #Resynchronize from the next confirmed packet
+                continue
+            self.start += total
+            self.resync_end = 0
+            if self.start == self.end:
+                self.reset()
+            return ((self.packet_type, bytes(payload)), 0)
+
 class SenselContact():
     data_size = 30
 
-    def __init__(self, data):
+    def __init__(self, data, x_to_mm_factor, y_to_mm_factor):
         if(len(data) != SenselContact.data_size):
             logging.error("Unable to create SenselContact. Data length (%d) != contact length (%d)" %
                           (len(data), SenselContact.data_size))
             raise Exception
 
-        self.total_force = _convertBufToVal(data[0:4])
-        self.uid =         _convertBufToVal(data[4:8])
-        self.area =        _convertBufToVal(data[8:12])
-        x_pos =            _convertBufToVal(data[12:14])
-        y_pos =            _convertBufToVal(data[14:16])
-        self.dx =          _convertBufToVal(data[16:18])
-        self.dy =          _convertBufToVal(data[18:20])
-        orientation =      _convertBufToVal(data[20:22])
-        major_axis =       _convertBufToVal(data[22:24])
-        minor_axis =       _convertBufToVal(data[24:26])
-        self.peak_x =      _convertBufToVal(data[26:27])
-        self.peak_y =      _convertBufToVal(data[27:28])
-        self.id =          _convertBufToVal(data[28:29])
-        self.type =        _convertBufToVal(data[29:30])
-        self.x_pos_mm = x_pos * sensor_x_to_mm_factor
-        self.y_pos_mm = y_pos * sensor_y_to_mm_factor
-        self.orientation_degrees = (unpack('h', pack('H', orientation))[0]) / 256.0
-        self.major_axis_mm = major_axis * sensor_x_to_mm_factor
-        self.minor_axis_mm = minor_axis * sensor_x_to_mm_factor
+        (self.total_force, self.uid, self.area, x_pos, y_pos, self.dx, self.dy,
+         orientation, major_axis, minor_axis, self.peak_x, self.peak_y,
+         self.id, self.type) = unpack('<IIIHHHHhHHBBBB', data)
+        self.x_pos_mm = x_pos * x_to_mm_factor
+        self.y_pos_mm = y_pos * y_to_mm_factor
+        self.orientation_degrees = orientation / 256.0
+        self.major_axis_mm = major_axis * x_to_mm_factor
+        self.minor_axis_mm = minor_axis * x_to_mm_factor
 
     def __str__(self):
         retstring = "Sensel Contact:\n"
@@ -166,20 +267,40 @@ class SenselContact():
 class SenselDevice():
 
     def __init__(self):
-        pass
+        self.sensel_serial = None
+        self.sensor_x_to_mm_factor = -1
+        self.sensor_y_to_mm_factor = -1
+        self.port_name = None
+        self.packet_reader = None
+        self._serial_lock = threading.RLock()
 
     def _openAndProbePort(self, port_name):
-        global sensel_serial
+        _open_ports_lock.acquire()
+        try:
+            if port_name in _open_ports:
+                logging.info("Port " + str(port_name) + " is already open")
+                return False
+            _open_ports.add(port_name)
+        finally:
+            _open_ports_lock.release()
+
+        if self._probePort(port_name):
+            self.port_name = port_name
+            return True
+        _releasePort(port_name)
+        return False
 
+    def _probePort(self, port_name):
         logging.info("Opening port " + str(port_name))
         try:
-            sensel_serial.port=port_name
-            sensel_serial.open()
-            sensel_serial.flushInput()
+            self.sensel_serial.port=port_name
+            self.sensel_serial.open()
+            self.sensel_serial.flushInput()
+            self.packet_reader = SenselPacketReader(self.sensel_serial)
             resp = self.readReg(0x00, 6)
         except SenselRegisterReadError:
             logging.warning("Failed to read magic register")
-            sensel_serial.close()
+            self.sensel_serial.close()
             return False
         except Exception:
             e = sys.exc_info()[1]
@@ -192,7 +313,7 @@ class SenselDevice():
             return True
         else:
             logging.info("Probe didn't read out magic (%s)" % resp)
-            sensel_serial.close()
+            self.sensel_serial.close()
             return False
         
     def _openSensorWin(self):
@@ -227,13 +348,13 @@ class SenselDevice():
         logging.basicConfig(stream=sys.stderr, level=SENSEL_LOGGING_LEVEL, format=FORMAT)
 
     def _serialRead(self, num_bytes):
-        resp = sensel_serial.read(num_bytes)
+        resp = self.sensel_serial.read(num_bytes)
         if(len(resp) != num_bytes):
             raise SenselSerialReadError(len(resp), num_bytes)
         return resp
 
     def _serialWrite(self, data):
-        resp = sensel_serial.write(data)
+        resp = self.sensel_serial.write(data)
         if(resp != len(data)):
             raise SenselSerialWriteError(resp, len(data))
         return True;
@@ -245,24 +366,19 @@ class SenselDevice():
             return ord(buf[idx])
 
     def openConnection(self, com_port=None):
-        global sensel_serial
-        global _serial_lock
-
         self._initLogging()
 
         platform_name = platform.system()
 
         logging.info("Initializing Sensel on " + platform_name + " platform")
 
-        sensel_serial = serial.Serial(
+        self.sensel_serial = serial.Serial(
             baudrate=SENSEL_BAUD,\
                 parity=serial.PARITY_NONE,\
                 stopbits=serial.STOPBITS_ONE,\
                 bytesize=serial.EIGHTBITS,\
                 timeout=SENSEL_TIMEOUT)
 
-        _serial_lock = threading.RLock()
-
         if(com_port != None):
             if platform_name == "Windows": #Windows serial open takes an integer indicating COM port number, so we need to extract that.
                 if "COM" in com_port:
@@ -327,16 +443,13 @@ class SenselDevice():
         return self.writeReg(SENSEL_REG_SOFT_RESET, 1, bytearray([1]))
 
     def _populateDimensions(self):
-        global sensor_x_to_mm_factor
-        global sensor_y_to_mm_factor
-
         sensor_max_x = 256 * (_convertBufToVal(self.readReg(0x10, 1)) - 1)
         sensor_max_y = 256 * (_convertBufToVal(self.readReg(0x11, 1)) - 1)
         (sensor_width_um, sensor_height_um) = self.getSensorActiveAreaDimensionsUM()
         sensor_width_mm  = sensor_width_um  / 1000.0
         sensor_height_mm = sensor_height_um / 1000.0
-        sensor_x_to_mm_factor = sensor_width_mm  / sensor_max_x
-        sensor_y_to_mm_factor = sensor_height_mm / sensor_max_y
+        self.sensor_x_to_mm_factor = sensor_width_mm  / sensor_max_x
+        self.sensor_y_to_mm_factor = sensor_height_mm / sensor_max_y
 
     def startScanning(self):
         self._populateDimensions()
@@ -348,12 +461,12 @@ class SenselDevice():
 
     #The user doesn't need to know that we're sending a write request
     def readFrame(self):
-        global _serial_lock
-
-        _serial_lock.acquire()
-        self._sendFrameReadReq()
-        frame_data = self._readFrameData()
-        _serial_lock.release()
+        self._serial_lock.acquire()
+        try:
+            self._sendFrameReadReq()
+            frame_data = self._readFrameData()
+        finally:
+            self._serial_lock.release()
         return self._parseFrameData(frame_data)
 
     def _sendFrameReadReq(self):
@@ -361,25 +474,16 @@ class SenselDevice():
         cmd = pack('BBB', SENSEL_READ_HEADER, SENSEL_REG_SCAN_READ_FRAME, 0)
         return self._serialWrite(cmd)
 
-    #Reads frame data, and verifies checksum
+    #Reads frame data, its checksum verified by the packet reader
     def _readFrameData(self):
 
-        ack = _convertBufToVal(self._serialRead(1))
+        (ack, frame_data) = self.packet_reader.readPacket()
 
         if(ack != SENSEL_PT_FRAME):
             logging.error("Failed to recieve ACK on force frame finish! (received %d)\n" % ack)
             raise SenselSerialReadError(0, 1)
 
-        frame_size = _convertBufToVal(self._serialRead(2))
-        logging.info("reading frame of %d bytes" % frame_size)
-
-        frame_data = self._serialRead(frame_size)
-        resp_checksum = _convertBufToVal(self._serialRead(1))
-
-        if not self._verifyChecksum(frame_data, resp_checksum):
-            logging.error("Response checksum didn't match checksum (resp_checksum=%d, checksum=%d)" % 
-                          (resp_checksum, checksum))
-            raise SenselSerialReadError(1, 1)
+        logging.info("read frame of %d bytes" % len(frame_data))
 
         return frame_data
 
@@ -392,20 +496,20 @@ class SenselDevice():
         #Pull off frame header info
         content_bit_mask = _convertBufToVal(frame_data[0])
         lost_frame_count = _convertBufToVal(frame_data[1])
-        frame_data = frame_data[2:]
 
         logging.info("content mask: %d, lost frames: %d" % (content_bit_mask, lost_frame_count))
 
         if content_bit_mask & SENSEL_FRAME_CONTACTS_FLAG:
             logging.info("Received contacts")
-            num_contacts = _convertBufToVal(frame_data[0])
-            frame_data = frame_data[1:]
+            num_contacts = _convertBufToVal(frame_data[2])
 
             contacts = []
 
-            for i in range(num_contacts):
-                contacts.append(SenselContact(frame_data[:SenselContact.data_size]))
-                frame_data = frame_data[SenselContact.data_size:]
+            size = SenselContact.data_size
+            for i in range(3, 3 + num_contacts * size, size):
+                contacts.append(SenselContact(frame_data[i:i + size],
+                                              self.sensor_x_to_mm_factor,
+                                              self.sensor_y_to_mm_factor))
         else:
             contacts = None
 
@@ -413,13 +517,7 @@ class SenselDevice():
 
 
     def _verifyChecksum(self, data, checksum):
-        curr_sum = 0
-        for val in data:
-            if PY3:
-                curr_sum += val
-            else:
-                curr_sum += ord(val)
-        curr_sum = (curr_sum & 0xFF)
+        curr_sum = sum(bytearray(data)) & 0xFF
         if(checksum != curr_sum):
             logging.error("Checksum failed! (%d != %d)" % (checksum, curr_sum))
             return False
@@ -436,55 +534,39 @@ class SenselDevice():
             return None
 
     def readReg(self, reg, size):
-        global _serial_lock
-
         cmd = pack('BBB', SENSEL_READ_HEADER, reg, size)
-        _serial_lock.acquire()
+        self._serial_lock.acquire()
         try:
             self._serialWrite(cmd)
-            ack = _convertBufToVal(self._serialRead(1))
-            resp_size = _convertBufToVal(self._serialRead(2))
+            (ack, resp) = self.packet_reader.readPacket()
 
             if(ack != SENSEL_PT_READ_ACK):
                 logging.error("Failed to receive ACK from reg read (received %d)" % ack)
                 raise SenselSerialReadError(1, 0)
 
-            if(resp_size != size):
-                logging.error("Response size didn't match request size (resp_size=%d, req_size=%d)" % (resp_size, size))
-                raise SenselSerialReadError(resp_size, size)
-
-            resp = self._serialRead(size)
-            resp_checksum = _convertBufToVal(self._serialRead(1))
+            if(len(resp) != size):
+                logging.error("Response size didn't match request size (resp_size=%d, req_size=%d)" % (len(resp), size))
+                raise SenselSerialReadError(len(resp), size)
         except (SenselSerialWriteError, SenselSerialReadError):
             raise SenselRegisterReadError(reg, size)
-        _serial_lock.release()
-
-        if not self._verifyChecksum(resp, resp_checksum):
-            logging.error("Response checksum didn't match checksum (resp_checksum=%d, checksum=%d)" % (resp_checksum, checksum))
-            raise SenselSerialReadError(1, 1)
+        finally:
+            self._serial_lock.release()
 
         return resp
 
     def readRegVSP(self, reg):
-        global _serial_lock
-
         cmd = pack('BBB', SENSEL_READ_HEADER, reg, 0) # 0 for RVS
-        _serial_lock.acquire()
+        self._serial_lock.acquire()
         try:
             self._serialWrite(cmd)
-            ack = _convertBufToVal(self._serialRead(1))
+            (ack, resp) = self.packet_reader.readPacket()
             if(ack != SENSEL_PT_RVS_ACK):
                 logging.error("Failed to receive ACK from vsp read (received %d)" % ack)
-                raise SenselSerialReadError
-            vsp_size = _convertBufToVal(self._serialRead(2))
-            resp = self._serialRead(vsp_size)
-            resp_checksum = _convertBufToVal(self._serialRead(1))
+                raise SenselSerialReadError(0, 1)
         except SenselSerialReadError:
-            raise SenselRegisterReadVSPError(reg, vsp_size)
-        _serial_lock.release()
-
-        if not self._verifyChecksum(resp, resp_checksum):
-            raise SenselRegisterReadVSPError(reg, vsp_size)
+            raise SenselRegisterReadVSPError(reg, 0)
+        finally:
+            self._serial_lock.release()
 
         return resp
 
@@ -503,33 +585,39 @@ class SenselDevice():
 
 
     def writeReg(self, reg, size, data):
-        global _serial_lock
         cmd = pack('BBB', SENSEL_WRITE_HEADER, reg, size)
 
-        checksum = 0
-        for d in data:
-            checksum += d
-        checksum &= 0xFF
+        checksum = sum(bytearray(data)) & 0xFF
 
-        _serial_lock.acquire()
+        self._serial_lock.acquire()
         try:
-            self._serialWrite(cmd)
-            self._serialWrite(data)
-            self._serialWrite(bytearray([checksum]))
-            resp = _convertBufToVal(self._serialRead(1)) #Read ACK
-        except (SenselSerialWriteError, SenselSerialReadError):
-            raise SenselRegisterWriteError(reg, size, data, False, 0)
-
-        if (resp != SENSEL_PT_WRITE_ACK):
-            raise SenselRegisterWriteError(reg, size, data, True, resp)
-
-        ec = self.readErrorCode()
-        _serial_lock.release() #We should hold the lock through the EC read
+            try:
+                #One write for the whole request
+                self._serialWrite(bytearray(cmd) + bytearray(data) + bytearray([checksum]))
+                (resp, payload) = self.packet_reader.readPacket() #Read ACK
+            except (SenselSerialWriteError, SenselSerialReadError):
+                raise SenselRegisterWriteError(reg, size, data, False, 0)
+
+            if (resp != SENSEL_PT_WRITE_ACK):
+                raise SenselRegisterWriteError(reg, size, data, True, resp)
+
+            ec = self.readErrorCode()
+        finally:
+            self._serial_lock.release() #We should hold the lock through the EC read
         return ec
 
     def closeConnection(self):
         self.setLEDBrightnessArr([0] * 16)
-        sensel_serial.close()
+        self.sensel_serial.close()
+        _releasePort(self.port_name)
+
+
+def _releasePort(port_name):
+    _open_ports_lock.acquire()
+    try:
+        _open_ports.discard(port_name)
+    finally:
+        _open_ports_lock.release()
 
 
 def _convertBufToVal(buf):
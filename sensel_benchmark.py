@@ -0,0 +1,935 @@
+# ==============================================================================
+# SENSEL GESTURE KEYBOARD BENCHMARKS
+#
+# Measures recognition accuracy and latency without a Sensel device attached.
+# Run "python sensel_benchmark.py" from the repository directory.
+# ==============================================================================
+
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import timeit
+try:
+    import fcntl
+    import select
+except ImportError:
+    fcntl = None                          # Windows, where there is no pty
+try:
+    from time import process_time
+except ImportError:
+    from time import clock as process_time
+import numpy as np
+import sensel
+import sensel_devices
+import sensel_dispatch
+import sensel_features
+import sensel_lexicon
+import sensel_load
+import sensel_personalization
+import sensel_pointer
+import sensel_service
+import sensel_simulator
+import sensel_zones
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# GESTURE SYNTHESIS
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# ------------------------------------------------------------------------------
+# Trace the letter path of a word with jitter, as a finger would on the pad
+def make_gesture(lexicon, word, rng, scale=0.5, noise=1.0, step=1.0,
+                 rotation=0.0, y_scale=1.0):
+    keys = [lexicon.get_letter_coords(c) for c in word]
+    (cos, sin) = (math.cos(rotation), math.sin(rotation))
+    keys = [((x * cos - y * y_scale * sin) * scale,
+             (x * sin + y * y_scale * cos) * scale) for (x, y) in keys]
+    points = [keys[0]]
+    for i in range(1, len(keys)):
+        n = int(max(1, sensel_lexicon.distance(keys[i], keys[i-1]) / step))
+        for j in range(1, n + 1):
+            points.append((keys[i-1][0] + (keys[i][0]-keys[i-1][0]) * j / n,
+                           keys[i-1][1] + (keys[i][1]-keys[i-1][1]) * j / n))
+    return [(x + rng.gauss(0, noise), y + rng.gauss(0, noise))
+            for (x, y) in points]
+
+# ------------------------------------------------------------------------------
+# Build a reproducible sample of (word index, gesture) pairs, traced at the
+# given mm per layout unit
+def make_samples(lexicon, count, seed=1, scale=0.5):
+    rng = random.Random(seed)
+    samples = []
+    for i in range(count):
+        index = rng.randrange(len(lexicon.words))
+        samples.append((index, make_gesture(lexicon, lexicon.words[index],
+                                            rng, scale)))
+    return samples
+
+# ------------------------------------------------------------------------------
+# Extend a word list to the given size with words drawn from its letter bigrams
+def make_words(words, count, seed=1):
+    rng = random.Random(seed)
+    following = {}
+    for w in words:
+        w = "^" + w + "$"
+        for i in range(len(w) - 1):
+            following.setdefault(w[i], []).append(w[i+1])
+    result = list(words[:count])
+    while len(result) < count:
+        word = ""
+        c = rng.choice(following["^"])
+        while c != "$" and len(word) < 15:
+            word = word + c
+            c = rng.choice(following[c])
+        if word:
+            result.append(word)
+    return result
+
+# ------------------------------------------------------------------------------
+# A contact sample as decoded by sensel.SenselContact
+class SyntheticContact:
+    def __init__(self, contact_id, x, y, force):
+        self.id = contact_id
+        self.x_pos_mm = x
+        self.y_pos_mm = y
+        self.total_force = force
+
+# ------------------------------------------------------------------------------
+# Trace a word as timed contact samples that slow down and press harder at each
+# letter, with speed and force varying from gesture to gesture
+def make_contacts(lexicon, word, rng, scale=0.5, noise=1.0, contact_id=0):
+    keys = [lexicon.get_letter_coords(c) for c in word]
+    keys = [(x * scale, y * scale) for (x, y) in keys]
+    speed = rng.uniform(1.5, 4.0)         # mm per frame between letters
+    base_force = rng.uniform(200, 600)
+    contacts = []
+    for i in range(len(keys)):
+        for j in range(rng.randint(2, 5)): # Dwell on the letter
+            contacts.append((keys[i][0], keys[i][1], base_force * 1.8))
+        if i + 1 < len(keys):
+            d = sensel_lexicon.distance(keys[i], keys[i+1])
+            n = int(max(1, d / speed))
+            for j in range(1, n):
+                t = float(j) / n
+                contacts.append((keys[i][0] + (keys[i+1][0]-keys[i][0]) * t,
+                                 keys[i][1] + (keys[i+1][1]-keys[i][1]) * t,
+                                 base_force))
+    return [SyntheticContact(contact_id, x + rng.gauss(0, noise),
+                             y + rng.gauss(0, noise),
+                             f * rng.uniform(0.9, 1.1))
+            for (x, y, f) in contacts]
+
+# ------------------------------------------------------------------------------
+# Trace trackpad strokes of (dx mm, dy mm, seconds) as timed noisy samples,
+# with a hold before each stroke. Returns the (time, x, y) samples, the ideal
+# position at any time, and the (start, end) times of each stroke.
+def make_pointer_trace(strokes, rng, frame_rate=125, noise=0.1, hold=0.5):
+    segments = []                         # (start time, x, y, dx, dy, seconds)
+    (t, x, y) = (2 * hold, 100.0, 60.0)   # Longer first hold for jitter
+    for (dx, dy, seconds) in strokes:
+        segments.append((t, x, y, dx, dy, seconds))
+        (t, x, y) = (t + seconds + hold, x + dx, y + dy)
+    def ideal(time):
+        (px, py) = (100.0, 60.0)
+        for (start, x, y, dx, dy, seconds) in segments:
+            if time < start:
+                break
+            u = min((time - start) / seconds, 1.0)
+            s = u * u * u * (10 - 15 * u + 6 * u * u) # Minimum jerk profile
+            (px, py) = (x + dx * s, y + dy * s)
+        return (px, py)
+    samples = []
+    for i in range(int(t * frame_rate)):
+        (px, py) = ideal(float(i) / frame_rate)
+        samples.append((float(i) / frame_rate, px + rng.gauss(0, noise),
+                        py + rng.gauss(0, noise)))
+    return (samples, ideal, [(s[0], s[0] + s[5]) for s in segments])
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# BENCHMARKS
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# ------------------------------------------------------------------------------
+# Run recognize over the samples, returning top-1 accuracy and ms per gesture
+def measure(lexicon, samples, resolution=None):
+    correct = 0
+    start = timeit.default_timer()
+    for (index, gesture) in samples:
+        (vector, options) = lexicon.recognize(gesture, resolution)
+        if lexicon.words[options[0][0]] == lexicon.words[index]:
+            correct = correct + 1
+    elapsed = timeit.default_timer() - start
+    return (float(correct) / len(samples), 1000.0 * elapsed / len(samples))
+
+# ------------------------------------------------------------------------------
+# Compare each fixed resolution of the pyramid against adaptive selection
+def benchmark_resolutions(lexicon, samples):
+    print("Resolution accuracy/latency (%d words, %d gestures)" %
+          (len(lexicon.words), len(samples)))
+    cascade = lexicon.cascade
+    lexicon.cascade = False
+    for r in lexicon.resolutions:
+        (accuracy, latency) = measure(lexicon, samples, r)
+        print("  %-10s top-1 %5.1f%%  %7.3f ms" % (r, 100 * accuracy, latency))
+    (accuracy, latency) = measure(lexicon, samples)
+    print("  %-10s top-1 %5.1f%%  %7.3f ms" % ("adaptive", 100 * accuracy,
+                                              latency))
+    lexicon.cascade = True
+    (accuracy, latency) = measure(lexicon, samples)
+    print("  %-10s top-1 %5.1f%%  %7.3f ms" % ("cascade", 100 * accuracy,
+                                              latency))
+    lexicon.cascade = cascade
+
+# ------------------------------------------------------------------------------
+# Estimate the bytes held by the lexicon's word vectors and words
+def lexicon_bytes(lexicon):
+    total = lexicon.lengths.nbytes + template_bytes(lexicon)
+    for w in lexicon.words:
+        total = total + sys.getsizeof(w)
+    return total + sys.getsizeof(lexicon.words)
+
+# ------------------------------------------------------------------------------
+# Get the bytes of the word templates, float or quantized
+def template_bytes(lexicon):
+    total = 0
+    for r in lexicon.resolutions:
+        if r in lexicon.codes:
+            total = total + lexicon.codes[r].nbytes
+        else:
+            total = total + lexicon.trajectories[r].nbytes
+    return total
+
+# ------------------------------------------------------------------------------
+# Estimate the bytes of the old list of (list of float vector, word) tuples
+def legacy_bytes(lexicon, resolution=20):
+    vector = [float(i) + 0.5 for i in range(resolution)]
+    per_word = sys.getsizeof(vector) + resolution * sys.getsizeof(0.5) + \
+                sys.getsizeof((vector, ""))
+    total = sys.getsizeof(lexicon.words)
+    for w in lexicon.words:
+        total = total + per_word + sys.getsizeof(w)
+    return total
+
+# ------------------------------------------------------------------------------
+# Report memory and latency of sharded and unsharded matching by lexicon size
+def benchmark_sharding(sizes, gestures=200, scales=(0.25, 0.35, 0.5, 0.7, 1.0)):
+    words = sensel_lexicon.read_words('words.txt')
+    print("Lexicon size scaling (%d gestures per scale)" % gestures)
+    for size in sizes:
+        lexicon = sensel_lexicon.GestureLexicon(None)
+        start = timeit.default_timer()
+        lexicon.set_words(make_words(words, size))
+        build = timeit.default_timer() - start
+        print("  %7d words: build %6.2f s, %7.1f MB (list-based %7.1f MB)" %
+              (size, build, lexicon_bytes(lexicon) / 1e6,
+               legacy_bytes(lexicon) / 1e6))
+
+        # Gestures drawn smaller or larger than the lexicon's gesture scale
+        # assumes, which is 1 / gesture_scale mm per layout unit
+        for scale in scales:
+            samples = make_samples(lexicon, gestures, scale=scale)
+            (sharded_acc, sharded) = measure(lexicon, samples)
+            tolerance = lexicon.shard_tolerance
+            lexicon.shard_tolerance = float("inf")
+            (full_acc, full) = measure(lexicon, samples)
+            lexicon.shard_tolerance = tolerance
+            print("  %7s %4.2f mm/unit sharded %8.3f ms %5.1f%%, "
+                  "unsharded %8.3f ms %5.1f%%" % ("", scale, sharded,
+                  100 * sharded_acc, full, 100 * full_acc))
+
+# ------------------------------------------------------------------------------
+# Compare template memory, whole-lexicon scan throughput, accuracy and
+# agreement with the float top options of quantized templates, with and
+# without a re-rank of the best candidates. Options agree when their exact
+# errors match the float ones, as words with equal templates tie.
+def benchmark_quantization(sizes, gestures=100, resolution=16):
+    words = sensel_lexicon.read_words('words.txt')
+    print("Quantized templates (%d gestures, %d samples)" %
+          (gestures, resolution))
+    for size in sizes:
+        lexicon = sensel_lexicon.GestureLexicon(None)
+        lexicon.set_words(make_words(words, size))
+        samples = make_samples(lexicon, gestures)
+        vectors = [lexicon.process_word(g, resolution) for (i, g) in samples]
+        exact = dict([(r, t.copy()) for (r, t) in lexicon.trajectories.items()])
+        expected = [np.sort(lexicon.get_errors(v))[:lexicon.num_options]
+                    for v in vectors]
+        rerank = lexicon.rerank_candidates
+        for (quantization, candidates) in ((None, 0), ("int16", 0),
+                                           ("int16", rerank)):
+            lexicon.set_quantization(quantization)
+            lexicon.rerank_candidates = candidates
+            start = timeit.default_timer()
+            options = [lexicon.get_closest_word(v) for v in vectors]
+            elapsed = timeit.default_timer() - start
+            memory = template_bytes(lexicon)
+            lexicon.set_quantization(None)
+            for r in exact:
+                lexicon.trajectories[r][:] = exact[r]
+            agreement = 0
+            correct = 0
+            for i in range(len(vectors)):
+                errors = lexicon.get_errors(vectors[i],
+                                            np.array([o[0] for o in options[i]]))
+                if np.allclose(np.sort(errors), expected[i], atol=1e-3):
+                    agreement = agreement + 1
+                if lexicon.words[options[i][0][0]] == \
+                        lexicon.words[samples[i][0]]:
+                    correct = correct + 1
+            print("  %6d words %-5s re-rank %3d: %6.1f MB, %5.1f M words/s, "
+                  "top-1 %5.1f%%, top-%d agreement %5.1f%%" %
+                  (size, quantization or "float", candidates, memory / 1e6,
+                   size * len(vectors) / elapsed / 1e6,
+                   100.0 * correct / len(vectors), lexicon.num_options,
+                   100.0 * agreement / len(vectors)))
+        lexicon.rerank_candidates = rerank
+
+# ------------------------------------------------------------------------------
+# Compare grid zone lookup against testing every zone rectangle in turn, and
+# check that the grid agrees with the exact bounds, also right at zone edges
+def benchmark_zones(counts=(4, 16, 64, 1024), lookups=100000, width=230.0,
+                    height=130.0):
+    rng = random.Random(1)
+    points = [(rng.uniform(0, width), rng.uniform(0, height))
+              for i in range(lookups)]
+    print("Zone classification (%d points)" % lookups)
+    for count in counts:
+        zones = []
+        side = int(math.ceil(math.sqrt(count)))
+        for i in range(count):
+            x0 = (i % side) * width / side + 0.13
+            y0 = (i // side) * height / side + 0.07
+            zones.append({"name": str(i), "type": "button", "type_id": 3,
+                          "rect": (x0, x0 + width / side - 0.3,
+                                   y0, y0 + height / side - 0.3)})
+        start = timeit.default_timer()
+        zone_map = sensel_zones.ZoneMap(zones, width, height)
+        zone_map.max_scanned = 0          # Always build the grid
+        zone_map.compile()
+        build = timeit.default_timer() - start
+        edges = []
+        for zone in zones:
+            (x0, x1, y0, y1) = zone["rect"]
+            for (x, y) in ((x0, y0), (x1, y1), (x0 + 1e-9, y0 + 1e-9),
+                           (x1 - 1e-9, y1 - 1e-9), (x0 - 0.01, y0 + 0.01)):
+                edges.append((x, y))
+        for (x, y) in points[:10000] + edges:
+            if zone_map.get_zone(x, y) is not zone_map.find_zone(x, y):
+                raise AssertionError("Grid zone differs at (%f, %f)" % (x, y))
+        start = timeit.default_timer()
+        for (x, y) in points:
+            zone_map.get_zone(x, y)
+        grid = timeit.default_timer() - start
+        start = timeit.default_timer()
+        for (x, y) in points:
+            zone_map.find_zone(x, y)
+        scan = timeit.default_timer() - start
+        print("  %5d zones: grid %9.0f /s (built in %.1f ms), scan %9.0f /s" %
+              (count, lookups / grid, 1000 * build, lookups / scan))
+
+# ------------------------------------------------------------------------------
+# Find the fractions of the length of a path, as the lexicon filters it for
+# matching, at which the samples of the given indices lie
+def get_path_fractions(lexicon, coords, indices):
+    lengths = [0.0]                       # Filtered path length at each sample
+    last = coords[0]
+    for p in coords[1:]:
+        d = sensel_lexicon.distance(p, last)
+        if d >= lexicon.deadband:
+            lengths.append(lengths[-1] + d)
+            last = p
+        else:
+            lengths.append(lengths[-1])
+    total = lengths[-1] if lengths[-1] > 0 else 1.0
+    return [lengths[i] / total for i in indices]
+
+# ------------------------------------------------------------------------------
+# Compare recognition with and without force and speed key points, and report
+# the per-sample cost of recording them
+def benchmark_features(lexicon, count=500):
+    rng = random.Random(1)
+    features = sensel_features.GestureFeatures(1)
+    samples = []
+    for i in range(count):
+        index = rng.randrange(len(lexicon.words))
+        samples.append((index, make_contacts(lexicon, lexicon.words[index],
+                                             rng)))
+    correct = [0, 0, 0]
+    record = [0.0, 0.0]
+    recognize = [0.0, 0.0]
+    total = 0
+    for (index, contacts) in samples:
+        total = total + len(contacts)
+        start = timeit.default_timer()
+        coords = []
+        for c in contacts:
+            coords.append((c.x_pos_mm, c.y_pos_mm))
+        record[0] = record[0] + timeit.default_timer() - start
+        start = timeit.default_timer()
+        features.start(0)
+        for c in contacts:
+            features.add(c)
+        record[1] = record[1] + timeit.default_timer() - start
+
+        start = timeit.default_timer()
+        results = [lexicon.recognize(coords)[1]]
+        recognize[0] = recognize[0] + timeit.default_timer() - start
+        start = timeit.default_timer()
+        (path, fractions) = features.get_segmented_path(0)
+        results.append(lexicon.recognize(path, None, fractions)[1])
+        recognize[1] = recognize[1] + timeit.default_timer() - start
+        fractions = get_path_fractions(lexicon, coords,
+                                       features.get_key_indices(0))
+        results.append(lexicon.recognize(coords, None, fractions)[1])
+        for i in range(len(results)):
+            if lexicon.words[results[i][0][0]] == lexicon.words[index]:
+                correct[i] = correct[i] + 1
+    print("Contact features (%d gestures, %d samples)" % (count, total))
+    print("  per sample: list append %.2f us, feature record %.2f us" %
+          (1e6 * record[0] / total, 1e6 * record[1] / total))
+    print("  per gesture: recognize %.3f ms, with key points %.3f ms" %
+          (1000 * recognize[0] / count, 1000 * recognize[1] / count))
+    print("  top-1: raw %.1f%%, segmented %.1f%%, weighted raw %.1f%%" %
+          tuple([100.0 * c / count for c in correct]))
+
+# ------------------------------------------------------------------------------
+# Match batches of gestures in flight at once on 1, 2 and 4 worker threads,
+# checking that results come back in submission order
+def benchmark_dispatch(lexicon, samples, in_flight=8):
+    print("Concurrent dispatch (%d gestures, %d in flight)" %
+          (len(samples), in_flight))
+    expected = [lexicon.recognize(g)[1] for (i, g) in samples]
+    for workers in (1, 2, 4):
+        dispatcher = sensel_dispatch.GestureDispatcher(lexicon, workers)
+        results = []
+        start = timeit.default_timer()
+        for i in range(0, len(samples), in_flight):
+            for (index, gesture) in samples[i:i+in_flight]:
+                dispatcher.submit(gesture)
+            while dispatcher.pending() > 0:
+                results.extend(dispatcher.poll())
+                time.sleep(0.0001)
+        elapsed = timeit.default_timer() - start
+        dispatcher.stop()
+        if [r[1] for r in results] != expected:
+            raise AssertionError("Dispatch results out of order")
+        print("  %d workers: %7.1f gestures/s" %
+              (workers, len(samples) / elapsed))
+
+# ------------------------------------------------------------------------------
+# Read several simulated devices at once, paced at their scan rate and
+# unpaced, and check that every frame arrives in order
+def benchmark_devices(counts=(1, 2, 4), frames=250, contacts=5):
+    print("Concurrent devices (%d frames of %d contacts each)" %
+          (frames, contacts))
+    for frame_rate in (125, None):
+        for count in counts:
+            sims = []
+            devices = []
+            for i in range(count):
+                sim = sensel_simulator.SimulatedSensel(frame_rate=frame_rate,
+                                                       serial_number=i)
+                for f in range(frames):
+                    sim.add_frame([(k, sensel.SENSEL_EVENT_CONTACT_MOVE,
+                                    10.0 * k, 20.0, f, 10)
+                                   for k in range(contacts)])
+                sims.append(sim)
+                devices.append(open_simulated(sim))
+            stream = sensel_devices.DeviceStream(devices, frame_rate)
+            last = [-1] * count
+            received = 0
+            start = timeit.default_timer()
+            stream.start()
+            while received < count * frames:
+                event = stream.get(1.0)
+                if event is None:
+                    raise AssertionError("Simulated device stalled")
+                (t, index, frame) = event
+                if len(frame) != contacts or \
+                        frame[0].total_force != last[index] + 1:
+                    raise AssertionError("Device frames lost or reordered")
+                last[index] = frame[0].total_force
+                received = received + 1
+            elapsed = timeit.default_timer() - start
+            stream.stop()
+            for (sim, device) in zip(sims, devices):
+                device.stopScanning()
+                device.closeConnection()
+                sim.stop()
+            print("  %d devices at %-4s Hz: %7.1f frames/s, %8.1f contacts/s" %
+                  (count, frame_rate or "max", received / elapsed,
+                   received * contacts / elapsed))
+
+# ------------------------------------------------------------------------------
+# Open a simulated device and start it scanning
+def open_simulated(sim):
+    sim.start()
+    device = sensel.SenselDevice()
+    if not device.openConnection(sim.port_name):
+        raise AssertionError("Could not open simulated device")
+    device.setFrameContentControl(sensel.SENSEL_FRAME_CONTACTS_FLAG)
+    device.startScanning()
+    return device
+
+# ------------------------------------------------------------------------------
+# Compare the CPU time and frame reads of an idle pad read in a busy loop and
+# with paced reads, and the latency of waking from the idle rate
+def benchmark_polling(idle_seconds=2.0, wakeups=20, idle_after=0.2):
+    print("Idle polling (%.1f s idle, %d wake-ups)" % (idle_seconds, wakeups))
+    for pace in (False, True):
+        sim = sensel_simulator.SimulatedSensel(frame_rate=None)
+        device = open_simulated(sim)
+        stream = sensel_devices.DeviceStream([device], pace, 10, idle_after)
+        stream.start()
+        time.sleep(idle_after)            # Let the paced stream back off
+        reads = sim.frames_sent
+        cpu = process_time()
+        time.sleep(idle_seconds)
+        cpu = process_time() - cpu
+        reads = sim.frames_sent - reads
+        latencies = []
+        rng = random.Random(1)
+        for i in range(wakeups):
+            time.sleep(idle_after + rng.uniform(0.0, 0.15))
+            start = time.time()
+            sim.add_frame([(0, sensel.SENSEL_EVENT_CONTACT_START, 50.0, 50.0,
+                            100, 10)])
+            event = stream.get(1.0)
+            if event is None:
+                raise AssertionError("Contact not read after wake-up")
+            latencies.append(1000 * (event[0] - start))
+        stream.stop()
+        device.stopScanning()
+        device.closeConnection()
+        sim.stop()
+        print("  %-6s %5.1f%% CPU idle, %7.1f reads/s, wake-up %5.1f ms mean"
+              " %5.1f ms max" % ("paced" if pace else "busy",
+                                 100 * cpu / idle_seconds,
+                                 reads / idle_seconds,
+                                 sum(latencies) / len(latencies),
+                                 max(latencies)))
+
+# ------------------------------------------------------------------------------
+# Read a frame the old way: four serial reads, a per-byte checksum and a
+# per-field contact decode
+def legacy_read_frame(device):
+    port = device.sensel_serial
+    value = sensel._convertBufToVal
+    port.write(bytearray([sensel.SENSEL_READ_HEADER,
+                          sensel.SENSEL_REG_SCAN_READ_FRAME, 0]))
+    if value(port.read(1)) != sensel.SENSEL_PT_FRAME:
+        raise AssertionError("Legacy frame read got no frame")
+    data = port.read(value(port.read(2)))
+    checksum = 0
+    for v in bytearray(data):
+        checksum = checksum + v
+    if checksum & 0xFF != value(port.read(1)):
+        raise AssertionError("Legacy frame checksum failed")
+    contacts = []
+    data = data[3:]
+    while data:
+        c = data[:30]
+        contacts.append([value(c[0:4]), value(c[4:8]), value(c[8:12]),
+                         value(c[12:14]) * device.sensor_x_to_mm_factor,
+                         value(c[14:16]) * device.sensor_y_to_mm_factor,
+                         value(c[16:18]), value(c[18:20]), value(c[20:22]),
+                         value(c[22:24]), value(c[24:26]), value(c[26:27]),
+                         value(c[27:28]), value(c[28:29]), value(c[29:30])])
+        data = data[30:]
+    return contacts
+
+# === Syscall Counter ==========================================================
+# Counts the reads, writes, selects and ioctls pyserial makes for this thread
+# ==============================================================================
+
+class SyscallCounter:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self):
+        self.calls = 0                    # System calls counted so far
+        self.thread = threading.current_thread() # Others, like simulators,
+                                          # are not counted
+        self.saved = []                   # (module, name, function) patched
+
+    # --------------------------------------------------------------------------
+    # Start counting calls to the wrapped functions
+    def start(self):
+        for (module, name) in ((os, "read"), (os, "write"),
+                               (select, "select"), (fcntl, "ioctl")):
+            function = getattr(module, name)
+            self.saved.append((module, name, function))
+            setattr(module, name, self.wrap(function))
+
+    # --------------------------------------------------------------------------
+    # Wrap a function to count its calls from this thread
+    def wrap(self, function):
+        def counted(*args):
+            if threading.current_thread() is self.thread:
+                self.calls = self.calls + 1
+            return function(*args)
+        return counted
+
+    # --------------------------------------------------------------------------
+    # Stop counting and restore the wrapped functions
+    def stop(self):
+        for (module, name, function) in self.saved:
+            setattr(module, name, function)
+        self.saved = []
+
+# ------------------------------------------------------------------------------
+# Compare serial reads and decode throughput of the old frame reads and the
+# buffered packet reader, and check recovery from a corrupted stream
+def benchmark_decoder(frames=2000, counts=(0, 5, 16)):
+    print("Frame decoding (%d frames)" % frames)
+    for contacts in counts:
+        frame = [(k, sensel.SENSEL_EVENT_CONTACT_MOVE, 10.0 * k, 20.0, 100 + k,
+                  10) for k in range(contacts)]
+        sim = sensel_simulator.SimulatedSensel(frame_rate=None)
+        device = open_simulated(sim)
+        for (name, read) in (("old", legacy_read_frame),
+                             ("buffered", sensel.SenselDevice.readContacts)):
+            for f in range(frames):
+                sim.add_frame(frame)
+            start = timeit.default_timer()
+            for f in range(frames):
+                if len(read(device)) != contacts:
+                    raise AssertionError("Frame decoded wrongly")
+            elapsed = timeit.default_timer() - start
+            for f in range(frames):
+                sim.add_frame(frame)
+            counter = SyscallCounter()    # Counted apart from the timing
+            counter.start()
+            for f in range(frames):
+                read(device)
+            counter.stop()
+            print("  %2d contacts %-8s %5.2f syscalls/frame, %7.1f frames/s" %
+                  (contacts, name, float(counter.calls) / frames,
+                   frames / elapsed))
+        device.stopScanning()
+        device.closeConnection()
+        sim.stop()
+
+    # Split writes into small chunks and corrupt every fourth response with
+    # noise and a rejected frame whose bytes look like single byte packets
+    sim = sensel_simulator.SimulatedSensel(frame_rate=None)
+    sim.write_chunk = 7
+    device = open_simulated(sim)
+    garbage = sensel_simulator.pack_packet(sensel.SENSEL_PT_FRAME,
+            bytearray([4, 0, 1]) + sensel_simulator.pack_contact(
+                    sensel.SENSEL_PT_WRITE_ACK, sensel.SENSEL_PT_FRAME_NACK,
+                    sensel.SENSEL_PT_READ_NACK, 9, 11, 12, 13))
+    garbage[-1] = garbage[-1] ^ 0xFF      # Bad checksum
+    for f in range(200):
+        if f % 4 == 0:
+            sim.add_noise(bytearray([0x42, 0x99]) + garbage)
+        sim.add_frame([(0, sensel.SENSEL_EVENT_CONTACT_MOVE, 5.0, 5.0, f, 1)])
+    level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.CRITICAL) # Expected checksum errors
+    for f in range(200):
+        if device.readContacts()[0].total_force != f:
+            raise AssertionError("Frame lost after corruption")
+        device.setLEDBrightnessArr([f % 100] * 16) # Writes stay in step
+    logging.getLogger().setLevel(level)
+    reader = device.packet_reader
+    print("  corrupted stream: 200 frames recovered, %d checksum errors, "
+          "%d bytes skipped" % (reader.checksum_errors, reader.skipped_bytes))
+
+    # A rejected frame that is the whole response times out, and the reads
+    # after it are back in step
+    garbage = sensel_simulator.pack_packet(sensel.SENSEL_PT_FRAME,
+            bytearray([4, 0, 0, sensel.SENSEL_PT_WRITE_ACK,
+                       sensel.SENSEL_PT_FRAME_NACK]))
+    garbage[-1] = garbage[-1] ^ 0xFF
+    os.write(sim.master, bytes(garbage))  # Sent with no request
+    logging.getLogger().setLevel(logging.CRITICAL)
+    try:
+        device.packet_reader.readPacket()
+        raise AssertionError("Rejected frame bytes read as a packet")
+    except sensel.SenselSerialReadError:
+        pass
+    logging.getLogger().setLevel(level)
+    for f in range(20):
+        sim.add_frame([(0, sensel.SENSEL_EVENT_CONTACT_MOVE, 5.0, 5.0, f, 1)])
+        if device.readContacts()[0].total_force != f:
+            raise AssertionError("Reads out of step after a rejected frame")
+        device.setLEDBrightnessArr([0] * 16)
+    print("  rejected frame alone: timed out once, then back in step")
+    device.stopScanning()
+    device.closeConnection()
+    sim.stop()
+
+# ------------------------------------------------------------------------------
+# Move a cursor the old way: per event, by the motion since the last accepted
+# sample, dropping samples that jumped further than the deadband. Returns the
+# cursor after each sample and the number of cursor moves.
+def legacy_pointer(samples, multiplier=5.0, deadband=10):
+    (cursor, last) = ([1000, 1000], samples[0][1:])
+    positions = []
+    updates = 0
+    for (t, x, y) in samples[1:]:
+        if sensel_lexicon.distance((x, y), last) < deadband:
+            cursor = [int(cursor[0] + (x - last[0]) * multiplier),
+                      int(cursor[1] + (y - last[1]) * multiplier)]
+            last = (x, y)
+            updates = updates + 1
+        positions.append((t, cursor[0], cursor[1]))
+    return (positions, updates)
+
+# ------------------------------------------------------------------------------
+# Move a cursor with a pointer pipeline, one flush per frame
+def filtered_pointer(samples, pipeline):
+    backend = pipeline.backend
+    backend.position = [1000, 1000]
+    pipeline.start(0, samples[0][1], samples[0][2], samples[0][0])
+    positions = []
+    for (t, x, y) in samples[1:]:
+        pipeline.move(0, x, y, t)
+        pipeline.flush()
+        positions.append((t, backend.position[0], backend.position[1]))
+    return positions
+
+# ------------------------------------------------------------------------------
+# Measure cursor jitter (pixels) while held still, the delay (ms) that best
+# aligns the cursor with the ideal path while moving, and the fraction of each
+# stroke's length the cursor travelled by the start of the next one
+def score_pointer(positions, ideal, strokes, gain):
+    (x0, y0) = ideal(0)
+    still = [(x, y) for (t, x, y) in positions if 0.2 <= t < strokes[0][0]]
+    (mx, my) = (np.mean([p[0] for p in still]), np.mean([p[1] for p in still]))
+    jitter = math.sqrt(np.mean([(x - mx) ** 2 + (y - my) ** 2
+                                for (x, y) in still]))
+    moving = [p for p in positions
+              if any([s <= p[0] < e for (s, e) in strokes])]
+    best = None
+    for delay in range(0, 101):
+        error = 0
+        for (t, x, y) in moving:
+            (ix, iy) = ideal(t - delay / 1000.0)
+            error = error + (x - mx - (ix - x0) * gain) ** 2 + \
+                    (y - my - (iy - y0) * gain) ** 2
+        if best is None or error < best[0]:
+            best = (error, delay)
+    travel = 0
+    length = 0
+    times = [s for (s, e) in strokes] + [positions[-1][0]]
+    at = lambda time: [p for p in positions if p[0] >= time][0]
+    for i in range(len(strokes)):
+        (a, b) = (at(times[i]), at(times[i+1]))
+        (ia, ib) = (ideal(times[i]), ideal(times[i+1]))
+        (dx, dy) = (ib[0] - ia[0], ib[1] - ia[1])
+        d = math.sqrt(dx * dx + dy * dy)
+        travel = travel + ((b[1] - a[1]) * dx + (b[2] - a[2]) * dy) / d
+        length = length + d * gain
+    return (jitter, best[1], travel / length)
+
+# ------------------------------------------------------------------------------
+# Compare the old per-event cursor moves with the pointer pipeline on replayed
+# trackpad traces: slow, medium and fast strokes, and a flick
+def benchmark_pointer(traces=5, frame_rate=125, noise=0.1):
+    strokes = [(60, 0, 0.6), (-60, 0, 0.6), (0, 40, 0.4), (0, -40, 0.4),
+               (30, 30, 0.25), (-30, -30, 0.25), (80, 0, 0.08),
+               (-80, 0, 0.08)]
+    print("Trackpad pointer (%d traces at %d Hz, %.2f mm noise)" %
+          (traces, frame_rate, noise))
+    rng = random.Random(1)
+    recorded = [make_pointer_trace(strokes, rng, frame_rate, noise)
+                for i in range(traces)]
+    flat = ((0, 5.0),)                    # The old fixed multiplier
+    modes = [("legacy", None), ("filtered", flat),
+             ("accelerated", ((0, 5.0), (50, 5.0), (300, 15.0)))]
+    for (name, acceleration) in modes:
+        results = []
+        updates = 0
+        elapsed = 0
+        for (samples, ideal, times) in recorded:
+            if acceleration is None:
+                start = timeit.default_timer()
+                (positions, moved) = legacy_pointer(samples)
+                elapsed = elapsed + timeit.default_timer() - start
+                updates = updates + moved
+            else:
+                pipeline = sensel_pointer.PointerPipeline(
+                        sensel_pointer.RecordingBackend(), acceleration)
+                start = timeit.default_timer()
+                positions = filtered_pointer(samples, pipeline)
+                elapsed = elapsed + timeit.default_timer() - start
+                updates = updates + pipeline.updates
+            if acceleration is None or acceleration == flat:
+                results.append(score_pointer(positions, ideal, times, 5.0))
+        events = sum([len(r[0]) - 1 for r in recorded])
+        if results:
+            (jitter, delay, travel) = np.mean(results, 0)
+            print("  %-11s jitter %5.2f px, lag %5.1f ms, travel %5.1f%%, "
+                  "%4.2f updates/frame, %5.2f us/event" %
+                  (name, jitter, delay, 100 * travel, float(updates) / events,
+                   1e6 * elapsed / events))
+        else:
+            print("  %-11s %43s %4.2f updates/frame, %5.2f us/event" %
+                  (name, "", float(updates) / events, 1e6 * elapsed / events))
+
+# ------------------------------------------------------------------------------
+# Play generated sessions through a simulated device at the scan rate and as
+# fast as they can be read
+def benchmark_load(lexicon, gestures=24, counts=(1, 4)):
+    print("Load test (%d generated gestures per session)" % gestures)
+    for frame_rate in (125, None):
+        for count in counts:
+            test = sensel_load.LoadTest(lexicon, frame_rate, count, gestures)
+            test.run()
+            print("  %-4s Hz, %d contacts: %s" % (frame_rate or "max", count,
+                                                 test.report()))
+
+# ------------------------------------------------------------------------------
+# Load the recognition service from several clients at once, with requests
+# scored one at a time and in batches, and check its answers
+def benchmark_service(lexicon, samples, counts=(1, 4, 16), requests=40):
+    print("Recognition service (%d requests per client)" % requests)
+    expected = [lexicon.recognize(g)[1][0][1] for (i, g) in samples]
+    for (window, max_batch) in ((0.0, 1), (0.0, 64), (0.002, 64)):
+        server = sensel_service.RecognitionServer(lexicon, ("127.0.0.1", 0),
+                                                  window, max_batch)
+        server.start()
+        for count in counts:
+            clients = [sensel_service.RecognitionClient(server.address)
+                       for c in range(count)]
+            latencies = []
+            wrong = []
+
+            def run(client, first):
+                for k in range(first, first + requests):
+                    (index, gesture) = samples[k % len(samples)]
+                    start = timeit.default_timer()
+                    (vector, options) = client.recognize(gesture)
+                    latencies.append(timeit.default_timer() - start)
+                    if abs(options[0][1] - expected[k % len(samples)]) > 1e-3:
+                        wrong.append(k)
+
+            threads = [threading.Thread(target=run,
+                                        args=(clients[c], c * requests))
+                       for c in range(count)]
+            batches = server.batches
+            start = timeit.default_timer()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = timeit.default_timer() - start
+            for client in clients:
+                client.close()
+            if wrong:
+                raise AssertionError("Service answers differ from lexicon")
+            latencies.sort()
+            print("  batch %2d, wait %.3f s, %2d clients: %6.1f requests/s, "
+                  "p50 %6.2f ms, p99 %6.2f ms, %4.1f per batch" %
+                  (max_batch, window, count,
+                  len(latencies) / elapsed,
+                  1000 * latencies[len(latencies) // 2],
+                  1000 * latencies[int(0.99 * (len(latencies) - 1))],
+                  float(len(latencies)) / (server.batches - batches)))
+        server.stop()
+
+# ------------------------------------------------------------------------------
+# Compare the serror and DTW matchers, with and without the coarse cascade
+def benchmark_matchers(lexicon, samples):
+    print("Matchers (%d gestures)" % len(samples))
+    matcher = lexicon.matcher
+    cascade = lexicon.cascade
+    for c in (True, False):
+        lexicon.cascade = c
+        for m in ("serror", "dtw"):
+            lexicon.set_matcher(m)
+            lexicon.dtw_evaluations = 0
+            (accuracy, latency) = measure(lexicon, samples)
+            warped = ""
+            if m == "dtw":
+                warped = ", %.1f words warped per gesture" % \
+                        (float(lexicon.dtw_evaluations) / len(samples))
+            print("  %-6s cascade %-5s top-1 %5.1f%%  %7.3f ms%s" %
+                  (m, c, 100 * accuracy, latency, warped))
+    lexicon.cascade = cascade
+    lexicon.set_matcher(matcher)
+
+# ------------------------------------------------------------------------------
+# Adapt templates to a user who draws squashed, slightly rotated gestures, and
+# check that the adaptation survives a reload from its log
+def benchmark_personalization(lexicon, num_words=200, repeats=5, tests=400):
+    log_file = os.path.join(tempfile.mkdtemp(), "personal.log")
+    words = []
+    for w in sensel_lexicon.read_words('words.txt'):
+        if w not in words and len(w) > 1:
+            words.append(w)
+        if len(words) == num_words:
+            break
+    rng = random.Random(1)
+    style = {"rotation": 0.15, "y_scale": 0.6}
+    test = []
+    for i in range(tests):
+        w = rng.choice(words)
+        test.append((lexicon.get_word_index(w),
+                     make_gesture(lexicon, w, rng, **style)))
+
+    # Work on a copy of the templates so other benchmarks are not affected
+    saved = dict([(r, t.copy()) for (r, t) in lexicon.trajectories.items()])
+    before = measure(lexicon, test)[0]
+    personal = sensel_personalization.PersonalTemplates(lexicon, log_file)
+    elapsed = 0.0
+    for j in range(repeats):
+        for w in words:
+            gesture = make_gesture(lexicon, w, rng, **style)
+            start = timeit.default_timer()
+            personal.accept(lexicon.get_word_index(w), gesture)
+            elapsed = elapsed + timeit.default_timer() - start
+    after = measure(lexicon, test)[0]
+    adapted = dict([(r, t.copy()) for (r, t) in lexicon.trajectories.items()])
+
+    # Reload the log into pristine templates
+    for r in saved:
+        lexicon.trajectories[r][:] = saved[r]
+    start = timeit.default_timer()
+    sensel_personalization.PersonalTemplates(lexicon, log_file)
+    load = timeit.default_timer() - start
+    reloaded = measure(lexicon, test)[0]
+    drift = max([float(np.max(np.abs(lexicon.trajectories[r] - adapted[r])))
+                 for r in saved])
+    for r in saved:
+        lexicon.trajectories[r][:] = saved[r]
+    print("Personalization (%d words x %d accepted gestures)" %
+          (num_words, repeats))
+    print("  accept %.1f us per word, log reload %.1f ms (%d entries)" %
+          (1e6 * elapsed / (num_words * repeats), 1000 * load,
+           personal.log_entries))
+    print("  top-1 %.1f%% before, %.1f%% adapted, %.1f%% reloaded "
+          "(max drift %.4f)" % (100 * before, 100 * after, 100 * reloaded,
+                                drift))
+
+# === MAIN =====================================================================
+# Program entrance point
+# ==============================================================================
+
+if __name__ == "__main__":
+    start = timeit.default_timer()
+    lexicon = sensel_lexicon.GestureLexicon()
+    print("Lexicon built in %.3f s" % (timeit.default_timer() - start))
+    samples = make_samples(lexicon, 500)
+    benchmark_resolutions(lexicon, samples)
+    benchmark_features(lexicon)
+    benchmark_matchers(lexicon, samples)
+    benchmark_dispatch(lexicon, samples)
+    benchmark_service(lexicon, samples)
+    benchmark_personalization(lexicon)
+    benchmark_zones()
+    benchmark_devices()
+    benchmark_polling()
+    benchmark_decoder()
+    benchmark_pointer()
+    benchmark_load(lexicon)
+    sizes = [int(a) for a in sys.argv[1:]] or [5000, 50000, 500000]
+    benchmark_sharding(sizes)
+    benchmark_quantization(sizes)
+
+# Finis
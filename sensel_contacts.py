@@ -0,0 +1,192 @@
+# ==============================================================================
+# SENSEL CONTACT HANDLING
+#
+# Sorts the contacts of each frame by the overlay zone they started in: traces
+# keyboard gestures and queues them for matching when they end, pairs fingers
+# that touch down together as two-finger commands, feeds trackpad motion to
+# the pointer and presses buttons. Clicks, commands and button actions are
+# left to callbacks, so this runs without Windows.
+# ==============================================================================
+
+import math
+import sensel
+
+# === Contact Handler ==========================================================
+# Per-contact state across the frames of one or more devices
+# ==============================================================================
+
+class ContactHandler:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, zone_map, max_contacts, num_devices, dispatcher,
+                 pointer, features=None, device_width=230.0):
+
+        # Define "magic number" parameters
+        self.deadband = 10                # Largest trackpad tap movement (mm)
+        self.chord_frames = 5             # Max start gap of two-finger commands
+        self.chord_max_frames = 60        # Longest two-finger command (frames)
+        self.max_led_level = 100          # Value for full power Sensel LEDs
+        self.num_leds = 16                # Number of LEDs on the Sensel
+
+        # Define more variables
+        num_contacts = max_contacts * num_devices
+        self.zone_map = zone_map          # Zone lookup grid
+        self.max_contacts = max_contacts  # Contact ids of each device
+        self.dispatcher = dispatcher      # Matches finished gestures
+        self.pointer = pointer            # Turns trackpad motion into cursor
+        self.features = features          # Contact force & speed samples
+        self.device_width = device_width  # For the LED under a contact (mm)
+        self.traces = [[] for i in range(num_contacts)] # Contact samples,
+                                          # a new list for each gesture
+        self.contact_types = [0] * num_contacts
+        self.contact_zones = [None] * num_contacts
+        self.contact_starts = [0] * num_contacts # Start frames
+        self.chords = [None] * num_contacts # Partner (movement, contact,
+                                          # gesture) of two-finger commands
+        self.frames = [0] * num_devices   # Frames handled from each device
+        self.on_click = None              # Called on a trackpad tap
+        self.on_chord = None              # Called with the (dx, dy) movement
+                                          # of a two-finger command
+        self.on_button = None             # Called with a pressed button zone
+        self.on_submit = None             # Called with each contact whose
+                                          # gesture is queued for matching
+
+    # --------------------------------------------------------------------------
+    # Handle the contacts of a frame read at time t from a device, giving
+    # their ids a block per device. Returns the LED levels to show.
+    def handle_frame(self, t, device_index, contacts):
+        self.frames[device_index] = self.frames[device_index] + 1
+        first_id = device_index * self.max_contacts
+
+        # Initialize array
+        led_array = [0] * self.num_leds
+
+        # Iterate through contacts
+        for c in contacts:
+            c.id = first_id + c.id    # Unique across devices
+            if c.type == sensel.SENSEL_EVENT_CONTACT_INVALID:
+                pass
+            elif c.type == sensel.SENSEL_EVENT_CONTACT_START:
+                zone = self.zone_map.get_zone(c.x_pos_mm, c.y_pos_mm)
+                zone_type = zone["type_id"] if zone is not None else 0
+                self.contact_zones[c.id] = zone
+                if zone_type == 1:
+                    led_array[self.get_led_at(c.x_pos_mm)] = self.max_led_level
+                    self.traces[c.id] = []
+                    self.traces[c.id].append((c.x_pos_mm, c.y_pos_mm))
+                    self.contact_types[c.id] = 1
+                    self.contact_starts[c.id] = self.frames[device_index]
+                    self.chords[c.id] = None
+                    if self.features is not None:
+                        self.features.start(c.id)
+                        self.features.add(c)
+                if zone_type == 2:
+                    led_array[self.get_led_at(c.x_pos_mm)] = self.max_led_level
+                    self.traces[c.id] = []
+                    self.traces[c.id].append((c.x_pos_mm, c.y_pos_mm))
+                    self.pointer.start(c.id, c.x_pos_mm, c.y_pos_mm, t)
+                    self.contact_types[c.id] = 2
+                if zone_type == 3:
+                    led_array[self.get_led_at(c.x_pos_mm)] = self.max_led_level
+                    self.contact_types[c.id] = 3
+            elif c.type == sensel.SENSEL_EVENT_CONTACT_MOVE:
+                if self.contact_types[c.id] == 1:
+                    led_array[self.get_led_at(c.x_pos_mm)] = self.max_led_level
+                    self.traces[c.id].append((c.x_pos_mm, c.y_pos_mm))
+                    if self.features is not None:
+                        self.features.add(c)
+                if self.contact_types[c.id] == 2:
+                    led_array[self.get_led_at(c.x_pos_mm)] = self.max_led_level
+                    self.pointer.move(c.id, c.x_pos_mm, c.y_pos_mm, t)
+            elif c.type == sensel.SENSEL_EVENT_CONTACT_END:
+                if self.contact_types[c.id] == 2 and distance((c.x_pos_mm, c.y_pos_mm), self.traces[c.id][0]) < self.deadband:
+                    if self.on_click is not None:
+                        self.on_click()
+                if self.contact_types[c.id] == 2:
+                    self.pointer.end(c.id)
+                if self.contact_types[c.id] == 3:
+                    if self.on_button is not None:
+                        self.on_button(self.contact_zones[c.id])
+                if self.contact_types[c.id] == 1:
+                    self.end_keyboard_contact(c)
+                self.traces[c.id] = []
+                self.contact_types[c.id] = 0
+
+        # Move the cursor once for all of the frame's trackpad motion
+        self.pointer.flush()
+        return led_array
+
+    # --------------------------------------------------------------------------
+    # Finish a keyboard contact: pair it with another short contact that
+    # touched down on the same device at the same time as a two-finger
+    # command, or queue it for matching
+    def end_keyboard_contact(self, contact):
+        contact_id = contact.id
+        first_id = contact_id - contact_id % self.max_contacts
+        frame = self.frames[contact_id // self.max_contacts]
+        short = frame - self.contact_starts[contact_id] <= self.chord_max_frames
+        (x0, y0) = self.traces[contact_id][0]
+        (x1, y1) = self.traces[contact_id][-1]
+        movement = (x1 - x0, y1 - y0)
+        gesture = self.get_gesture(contact_id)
+
+        # The partner already lifted: run the command with both movements,
+        # or match both gestures if this one went on too long for a command
+        if self.chords[contact_id] is not None:
+            ((dx, dy), partner, partner_gesture) = self.chords[contact_id]
+            self.chords[contact_id] = None
+            if short:
+                if self.on_chord is not None:
+                    self.on_chord(((movement[0] + dx) / 2.0,
+                                   (movement[1] + dy) / 2.0))
+                return
+            self.submit(partner, partner_gesture)
+
+        # A short partner is still down: leave the command to it
+        for i in range(first_id, first_id + self.max_contacts):
+            if short and i != contact_id and self.contact_types[i] == 1 and \
+                    abs(self.contact_starts[i] -
+                        self.contact_starts[contact_id]) <= self.chord_frames \
+                    and frame - self.contact_starts[i] <= self.chord_max_frames:
+                self.chords[i] = (movement, contact, gesture)
+                return
+
+        self.submit(contact, gesture)
+
+    # --------------------------------------------------------------------------
+    # Get the path and key fractions of a keyboard contact to match
+    def get_gesture(self, contact_id):
+        if self.features is not None:
+            return self.features.get_segmented_path(contact_id)
+        return (self.traces[contact_id], None)
+
+    # --------------------------------------------------------------------------
+    # Queue the gesture of a contact for matching
+    def submit(self, contact, gesture):
+        self.dispatcher.submit(*gesture)
+        if self.on_submit is not None:
+            self.on_submit(contact)
+
+    # --------------------------------------------------------------------------
+    # Get the number of keyboard, trackpad and button contacts still down
+    def count_active(self):
+        return len([k for k in self.contact_types if k != 0])
+
+    # --------------------------------------------------------------------------
+    # Get the index of the LED at the given x position on the board
+    def get_led_at(self, pos):
+        return int(min(max(math.floor(
+                        self.num_leds * pos / self.device_width), 0),
+                       self.num_leds - 1))
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# UTILITY ROUTINES
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# ------------------------------------------------------------------------------
+# Find the distance between two points
+def distance(p1, p2):
+    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+
+# Finis
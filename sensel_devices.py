@@ -0,0 +1,131 @@
+# ==============================================================================
+# SENSEL DEVICE STREAM
+#
+# Reads several Sensel devices at once, one acquisition thread per device,
+# and merges their contacts into a single stream of timestamped events. Reads
+# are paced at the scan rate of each device, and slow down while it is idle.
+# ==============================================================================
+
+import sys
+PY3 = sys.version > '3'
+
+import logging
+import threading
+import time
+import sensel
+if PY3:
+    import queue
+else:
+    import Queue as queue
+
+# === Poll Scheduler ===========================================================
+# Frame read pacing with an idle backoff
+# ==============================================================================
+
+class PollScheduler:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, frame_rate, idle_rate=10, idle_after=2.0):
+        self.active_period = 1.0 / max(frame_rate, 1) # Seconds between reads
+        self.idle_period = 1.0 / idle_rate # Seconds between reads when idle
+        self.idle_after = idle_after      # Quiet seconds before backing off
+        self.idle = False                 # Backed off to the idle rate
+        self.last_contact = time.time()   # Time contacts were last seen
+        self.next_read = 0                # Earliest time of the next read
+
+    # --------------------------------------------------------------------------
+    # Sleep until the next read is due
+    def wait(self):
+        delay = self.next_read - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    # --------------------------------------------------------------------------
+    # Schedule the next read after a frame with or without contacts. The first
+    # contact returns to the full rate at once.
+    def update(self, has_contacts):
+        now = time.time()
+        if has_contacts:
+            self.last_contact = now
+            self.idle = False
+        elif not self.idle and now - self.last_contact >= self.idle_after:
+            self.idle = True
+        period = self.idle_period if self.idle else self.active_period
+        self.next_read = max(self.next_read + period, now) # Never catch up
+
+# === Device Stream ============================================================
+# Per-device reader threads feeding one event queue
+# ==============================================================================
+
+class DeviceStream:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, devices, pace=True, idle_rate=10, idle_after=2.0):
+        self.devices = devices            # Open, scanning SenselDevices
+        self.schedulers = [None] * len(devices) # Read pacing of each device
+        if pace:
+            for i in range(len(devices)):
+                frame_rate = devices[i].getFrameRate() or 125
+                self.schedulers[i] = PollScheduler(frame_rate, idle_rate,
+                                                   idle_after)
+        self.events = queue.Queue()       # (time, device index, contacts)
+        self.lock = threading.Lock()      # Keeps event times in queue order
+        self.frames = [0] * len(devices)  # Frames read from each device
+        self.errors = [0] * len(devices)  # Failed reads of each device
+        self.running = False
+        self.readers = []
+
+    # --------------------------------------------------------------------------
+    # Start a reader thread for each device
+    def start(self):
+        self.running = True
+        for i in range(len(self.devices)):
+            reader = threading.Thread(target=self.read, args=(i,))
+            reader.daemon = True
+            reader.start()
+            self.readers.append(reader)
+
+    # --------------------------------------------------------------------------
+    # Read frames from one device until told to stop
+    def read(self, device_index):
+        device = self.devices[device_index]
+        scheduler = self.schedulers[device_index]
+        while self.running:
+            if scheduler is not None:
+                scheduler.wait()
+            try:
+                contacts = device.readContacts()
+            except (sensel.SenselError, IOError, OSError) as e:
+                self.errors[device_index] = self.errors[device_index] + 1
+                logging.warning("Device %d read failed: %s" %
+                                (device_index, e))
+                time.sleep(0.1)
+                continue
+            self.frames[device_index] = self.frames[device_index] + 1
+            if scheduler is not None:
+                scheduler.update(bool(contacts))
+            if contacts:
+                self.lock.acquire()
+                self.events.put((time.time(), device_index, contacts))
+                self.lock.release()
+
+    # --------------------------------------------------------------------------
+    # Get the next (time, device index, contacts) event, or None if none
+    # arrives within the timeout
+    def get(self, timeout=None):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    # --------------------------------------------------------------------------
+    # Stop the reader threads. Each finishes the frame it is reading.
+    def stop(self):
+        self.running = False
+        for reader in self.readers:
+            reader.join()
+        self.readers = []
+
+# Finis
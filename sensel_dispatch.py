@@ -0,0 +1,101 @@
+# ==============================================================================
+# SENSEL GESTURE DISPATCH
+#
+# Recognizes finished gestures on worker threads so that fingers are still
+# traced while earlier gestures are matched, and hands the results back in the
+# order the gestures ended. Matching holds the interpreter lock for most of its
+# time, so extra workers have not been found to match any faster.
+# ==============================================================================
+
+import sys
+PY3 = sys.version > '3'
+
+import logging
+import threading
+if PY3:
+    import queue
+else:
+    import Queue as queue
+
+# === Gesture Dispatcher =======================================================
+# Worker threads matching gestures, with an in-order result buffer
+# ==============================================================================
+
+class GestureDispatcher:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, lexicon, num_workers=1):
+        self.lexicon = lexicon            # Lexicon the gestures are matched in
+        self.requests = queue.Queue()     # (sequence, path, key fractions)
+        self.results = {}                 # Sequence -> (vector, options, path)
+        self.lock = threading.Lock()      # Guards results and errors
+        self.next_submit = 0              # Sequence of the next gesture to end
+        self.next_result = 0              # Sequence of the next result out
+        self.errors = 0                   # Gestures whose matching failed
+        self.workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self.work)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    # --------------------------------------------------------------------------
+    # Queue a finished gesture for matching. The path is not copied, so the
+    # caller must not change it afterwards; contact traces start a new list
+    # for each gesture.
+    def submit(self, path, key_fractions=None):
+        seq = self.next_submit
+        self.next_submit = seq + 1
+        self.requests.put((seq, path, key_fractions))
+        return seq
+
+    # --------------------------------------------------------------------------
+    # Match queued gestures until told to stop. A gesture whose matching
+    # fails, as when a recognition service drops the connection, gets no
+    # vector and no options, so that later gestures are still returned.
+    def work(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            (seq, path, key_fractions) = request
+            try:
+                (vector, options) = self.lexicon.recognize(path, None,
+                                                           key_fractions)
+            except Exception as e:
+                logging.warning("Gesture %d matching failed: %s" % (seq, e))
+                (vector, options) = (None, [])
+                self.lock.acquire()
+                self.errors = self.errors + 1
+                self.lock.release()
+            self.lock.acquire()
+            self.results[seq] = (vector, options, path)
+            self.lock.release()
+
+    # --------------------------------------------------------------------------
+    # Get the (vector, options, path) results ready so far, in gesture end
+    # order. Failed gestures come with empty options.
+    def poll(self):
+        ready = []
+        self.lock.acquire()
+        while self.next_result in self.results:
+            ready.append(self.results.pop(self.next_result))
+            self.next_result = self.next_result + 1
+        self.lock.release()
+        return ready
+
+    # --------------------------------------------------------------------------
+    # Get the number of gestures submitted but not yet returned by poll
+    def pending(self):
+        return self.next_submit - self.next_result
+
+    # --------------------------------------------------------------------------
+    # Stop the worker threads
+    def stop(self):
+        for worker in self.workers:
+            self.requests.put(None)
+        for worker in self.workers:
+            worker.join()
+
+# Finis
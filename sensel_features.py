@@ -0,0 +1,128 @@
+# ==============================================================================
+# SENSEL GESTURE FEATURES
+#
+# Records the force and speed of every contact sample and finds the key points
+# of a gesture: corners, and dwell points where the finger slows down or
+# presses harder over a letter.
+# ==============================================================================
+
+import math
+import numpy as np
+
+# === Gesture Features =========================================================
+# Per-contact samples and key point detection
+# ==============================================================================
+
+class GestureFeatures:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, max_contacts):
+
+        # Define "magic number" parameters
+        self.dwell_speed_ratio = 0.5      # Dwells are slower than this x median
+        self.dwell_force_ratio = 1.3      # Or harder than this x median force
+        self.corner_angle = math.pi / 4   # Minimum turn of a corner (rad)
+        self.corner_span = 3              # Samples either side of a corner
+        self.min_key_spacing = 10         # Minimum distance between keys (mm),
+                                          # no less than the lexicon deadband
+                                          # so that none are filtered out
+
+        # Record (x, y, force, speed) samples of every contact
+        self.traces = [[] for i in range(max_contacts)]
+        self.last = [(0.0, 0.0)] * max_contacts # Last position of contacts
+
+    # --------------------------------------------------------------------------
+    # Forget the samples of a contact, starting a new list so that samples
+    # handed out before are kept
+    def start(self, contact_id):
+        self.traces[contact_id] = []
+
+    # --------------------------------------------------------------------------
+    # Record a contact sample
+    def add(self, contact):
+        i = contact.id
+        speed = 0.0
+        if len(self.traces[i]) > 0:
+            (px, py) = self.last[i]
+            speed = math.sqrt((contact.x_pos_mm - px)**2 +
+                              (contact.y_pos_mm - py)**2)
+        self.traces[i].append((contact.x_pos_mm, contact.y_pos_mm,
+                               contact.total_force, speed))
+        self.last[i] = (contact.x_pos_mm, contact.y_pos_mm)
+
+    # --------------------------------------------------------------------------
+    # Get the recorded (x, y, force, speed) samples of a contact as an array
+    def get_samples(self, contact_id):
+        return np.array(self.traces[contact_id], dtype=float).reshape(-1, 4)
+
+    # --------------------------------------------------------------------------
+    # Find the sample indices of the start, corners, dwells and end of a contact
+    def get_key_indices(self, contact_id):
+        samples = self.get_samples(contact_id)
+        n = len(samples)
+        if n < 3:
+            return list(range(n))
+        interior = np.zeros(n, bool)
+        interior[1:-1] = True
+
+        # Dwell points: local speed minima and force maxima
+        speed = np.convolve(samples[:, 3], np.ones(3) / 3, 'same')
+        force = samples[:, 2]
+        slow = speed < self.dwell_speed_ratio * np.median(speed[1:])
+        hard = force > self.dwell_force_ratio * np.median(force)
+        keys = interior & (is_local_extreme(-speed) & slow |
+                           is_local_extreme(force) & hard)
+
+        # Corners: local maxima of the turn between the path before and after
+        k = self.corner_span
+        if n > 2 * k:
+            before = samples[k:-k, :2] - samples[:-2*k, :2]
+            after = samples[2*k:, :2] - samples[k:-k, :2]
+            turn = np.zeros(n)
+            turn[k:-k] = np.abs(np.arctan2(
+                    before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0],
+                    np.sum(before * after, axis=1)))
+            keys = keys | interior & is_local_extreme(turn) & \
+                    (turn > self.corner_angle)
+
+        # Drop key points too close to the previous one
+        xy = samples[:, :2]
+        indices = [0]
+        for i in np.nonzero(keys)[0]:
+            if np.hypot(*(xy[i] - xy[indices[-1]])) >= self.min_key_spacing:
+                indices.append(int(i))
+        while np.hypot(*(xy[-1] - xy[indices[-1]])) < self.min_key_spacing \
+                and len(indices) > 1:
+            indices.pop()
+        indices.append(n - 1)
+        return indices
+
+    # --------------------------------------------------------------------------
+    # Segment a contact's path at its key points, returning the polyline through
+    # them and the fraction of the polyline's length at which each lies. The
+    # polyline is what gets matched, so the fractions are measured along it.
+    def get_segmented_path(self, contact_id):
+        samples = self.get_samples(contact_id)
+        points = samples[self.get_key_indices(contact_id), :2]
+        dist = np.zeros(len(points))
+        dist[1:] = np.cumsum(np.hypot(*np.diff(points, axis=0).T))
+        total = dist[-1] if len(dist) and dist[-1] > 0 else 1.0
+        path = [tuple(p) for p in points.tolist()]
+        return (path, (dist / total).tolist())
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# UTILITY ROUTINES
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# ------------------------------------------------------------------------------
+# Flag the values no smaller than either neighbour, and larger than one of them
+def is_local_extreme(values):
+    result = np.zeros(len(values), bool)
+    if len(values) > 2:
+        mid = values[1:-1]
+        result[1:-1] = (mid >= values[:-2]) & (mid >= values[2:]) & \
+                ((mid > values[:-2]) | (mid > values[2:]))
+    return result
+
+# Finis
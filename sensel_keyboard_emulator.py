@@ -6,12 +6,19 @@
 # ==============================================================================
 
 import sensel
+import sensel_contacts
+import sensel_features
+import sensel_lexicon
+import sensel_personalization
+import sensel_pointer
+import sensel_service
+import sensel_devices
+import sensel_dispatch
+import sensel_zones
 import pygame
-import string
-import numpy as np
 import math
 import sys
-import re
+import socket
 import webbrowser
 import win32api # For mouse movement emulation
 import win32con # For mouse button emulation
@@ -34,31 +41,62 @@ class SenselKeyboardEmulator:
 
         # Define "magic number" parameters
         self.deadband = 10                # Minimum noticed gesture length (mm)
-        self.vector_resolution = 20       # Segments in a comparison vector
+        self.vector_resolutions = (8, 16, 32) # Segments in comparison vectors
         self.screen_size = (500, 500)     # Size of GUI
         self.use_gui = True               # Activate the GUI
         self.max_led_level = 100          # Value for full power Sensel LEDs
         self.use_optimized_layout = False # Use optimized keyboard layout
+        self.layout_file = None           # Layout JSON file (overrides above)
         self.num_options = 7              # Compute this many best words
-        self.mouse_multiplier = 5.0
-        self.backspace_min_dist = 20
-        self.keyboard = (5, 151, 1, 118)
-        self.trackpad = (161, 224, 1, 85)
-        self.buttons = (161, 224, 92, 118)
+        self.matcher = "serror"           # Matching engine, "serror" or "dtw"
+        self.quantization = None          # "int16" for compact templates
+        self.personal_file = 'personal_templates.log' # Adapted templates log
+        self.service_address = None       # Recognition service ("127.0.0.1",
+                                          # port), or None to match here
+        self.use_contact_features = False # Use force and speed key points
+        self.pointer_acceleration = ((0, 5.0), (50, 5.0), (300, 15.0))
+                                          # (mm/s, pixels per mm) trackpad gain
+        self.pointer_cutoff = 1.0         # Trackpad filter cutoff when still (Hz)
+        self.pointer_beta = 0.05          # Filter cutoff increase per mm/s
+        self.backspace_min_dist = 20      # Two-finger swipe for backspace (mm)
+        self.scroll_multiplier = 4.0      # Wheel units per two-finger mm
+        self.chord_frames = 5             # Max start gap of two-finger commands
+        self.chord_max_frames = 60        # Longest two-finger command (frames)
+        self.num_workers = 1              # Threads matching gestures
+        self.zone_file = 'overlay_zones.json' # Zones of the overlay
+        self.com_ports = [None]           # Port of each device, None to detect
+        self.idle_after = 2.0             # Quiet seconds before polling slowly
+        self.idle_rate = 10               # Frame reads per second when idle
 
         # Define more variables
         self.running = True               # Will flag the program to stop
-        self.word_list = []               # List of known words & their vectors
+        self.lexicon = None               # Known words & their vectors
+        self.recognizer = None            # Lexicon or recognition service
+        self.personal = None              # Adapts word templates to the user
+        self.pending_accept = None        # (Word index, path) of the last word
         self.num_leds = 16                # Number of LEDs on the Sensel
         self.device_width = 1             # Initialize to non zero value
         self.device_height = 1            # Initialize to non zero value
         self.prev_word_len = 0
+        self.zones = []                   # Zone definitions from zone_file
+        self.zone_map = None              # Zone lookup grid, built in run()
+        self.features = None              # Contact force & speed samples
+        self.dispatcher = None            # Matches gestures on worker threads
+        self.devices = []                 # Connected Sensel devices
+        self.stream = None                # Merged contacts of all devices
+        self.pointer = None               # Turns trackpad motion into cursor
+        self.contacts = None              # Traces and acts on contacts
 
         # Initialize subcomponents
         if self.use_gui:
             self.init_gui()               # Start the GUI
+        self.init_zones()                 # Load the overlay zones
         self.init_word_vectors()          # Generate the word list
         self.shell = win32com.client.Dispatch("WScript.Shell") # For keypress
+        self.actions = {                  # Button zone actions
+            "open_url": webbrowser.open,
+            "send_keys": self.shell.SendKeys,
+        }
 
     # --------------------------------------------------------------------------
     # Initialize the GUI
@@ -67,164 +105,55 @@ class SenselKeyboardEmulator:
         self.screen = pygame.display.set_mode(self.screen_size)
 
     # --------------------------------------------------------------------------
-    # Initialize the list of known words
-    def init_word_vectors(self):
-
-        # Calculate ideal letter coordinates
-        letter_coords = {}
-        for c in "abcdefghijklmnopqrstuvwxyz":
-            letter_coords[c] = self.get_letter_coords(c)
-
-        # Calculate comparison vector for all known words
+    # Load the overlay zones
+    def init_zones(self):
         try:
-            word_file = open('words.txt', 'r')
-        except IOError:
-            print("Error! Could not open known words file!")
+            self.zones = sensel_zones.load_zones(self.zone_file)
+        except (IOError, ValueError, KeyError):
+            print("Error! Could not load zone file!")
             self.stop()
-        word = re.sub(r'[^a-z]', '', word_file.readline().lower())
-        i = 1
-        while word:
-            word_coords = []
-            for c in word:
-                word_coords.append(letter_coords[c])
-            word_vector = self.process_word(word_coords)
-            self.word_list.append((word_vector, word))
-            word = re.sub(r'[^a-z]', '', word_file.readline().lower())
-            i = i + 1
-        word_file.close()
-
-    # --------------------------------------------------------------------------
-    # Define the coordinates of letters on a keyboard
-    def get_letter_coords(self, c):
-
-        # Define keyboard geometry
-        if self.use_optimized_layout == True:
-            r1 = "dghpasjrkn"
-            r2 = "iqvuwclxm"
-            r3 = "tybezfo"
-            key_spacing = 3
-            r2_offset = 1.5
-            r3_offset = 4.5
-        else: # Default to QWERTY layout
-            r1 = "qwertyuiop"
-            r2 = "asdfghjkl"
-            r3 = "zxcvbnm"
-            key_spacing = 3
-            r2_offset = 1
-            r3_offset = 2
-
-        # Find letter location
-        pos = str.find(r1, c)
-        if not pos == -1:
-            return (pos * key_spacing * self.deadband, 0.0)
-        pos = str.find(r2, c)
-        if not pos == -1:
-            return ((pos * key_spacing + r2_offset) *
-                        self.deadband, key_spacing * self.deadband)
-        pos = str.find(r3, c)
-        if not pos == -1:
-            return ((pos * key_spacing + r3_offset) *
-                        self.deadband, 2 * key_spacing * self.deadband)
-        return (0,0)
-
-    # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
-    # VECTOR-BASED WORD RECOGNITION ROUTINES
-    # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
-
-    # --------------------------------------------------------------------------
-    # Calculate the vector of a given coordinate sequence
-    def process_word(self, coords):
-
-        # Remove coordinates that are too close together
-        i = 0
-        while i < len(coords):
-            if i > 0 and self.distance(coords[i], coords[i-1]) < self.deadband:
-                coords.pop(i)
-            else:
-                i = i + 1
-
-        # Find the total lenth of the traced path
-        i = 1
-        length = 0;
-        while i < len(coords):
-            length = length + self.distance(coords[i], coords[i-1]);
-            i = i + 1
-
-        # Create the vector from the angles of the path at constant intervals
-        vector = [0] * self.vector_resolution
-        if not length == 0:
-            dist_increment = length / (self.vector_resolution - 1)
-            current_dist = 0 # Keep track of current distance along path
-            current_index = 1 # Keep track of place in vector
-            vector[0] = self.make_positive(math.atan2(coords[1][1]-coords[0][1],
-                                                   coords[1][0]-coords[0][0]))
-            i = 1
-            while i < len(coords):
-                current_dist = current_dist + \
-                                    self.distance(coords[i], coords[i-1])
-                while current_dist >= current_index * dist_increment \
-                        and current_index < self.vector_resolution - 1:
-                    vector[current_index] = self.make_positive(
-                            math.atan2(coords[i][1]-coords[i-1][1],
-                                       coords[i][0]-coords[i-1][0]))
-                    current_index = current_index + 1
-                i = i + 1
-            i = len(coords) - 1
-            vector[self.vector_resolution - 1] = self.make_positive(
-                            math.atan2(coords[i][1]-coords[i-1][1],
-                                       coords[i][0]-coords[i-1][0]))
-        return vector
-
-    # --------------------------------------------------------------------------
-    # Calculate the squared error between two vector paths on the xy plane
-    def serror(self, v1, v2):
-        i = 0
-        px1 = 0
-        py1 = 0
-        px2 = 0
-        py2 = 0
-        err = 0
-        while i < len(v1):
-            nx1 = px1 + math.cos(v1[i])
-            ny1 = py1 + math.sin(v1[i])
-            nx2 = px2 + math.cos(v2[i])
-            ny2 = py2 + math.sin(v2[i])
-            err = err + (py1-py2)**2 + (px1-px2)**2
-            px1 = nx1
-            py1 = ny1
-            px2 = nx2
-            py2 = ny2
-            i = i + 1
-        return err
 
     # --------------------------------------------------------------------------
-    # Calculate the cosine similarity between two vectors (DEPRECATED)
-    def similarity(self, v1, v2):
-        result = np.dot(v1, v2)
-        n1 = np.linalg.norm(v1)
-        if not np.count_nonzero(v1) == 0:
-            result = result / n1
-        n2 = np.linalg.norm(v2)
-        if not n2 == np.count_nonzero(v2) == 0:
-            result = result / n2
-        if np.count_nonzero(v1) == 0 and np.count_nonzero(v2) == 0:
-            result = 1
-        return result
-
-    # --------------------------------------------------------------------------
-    # Find the closest match to the given word vector
-    def get_closest_word(self, vector):
-
-        closest_options = []
-        i = len(self.word_list)-1
-        while i >= 0:
-            temp_sim_val = self.serror(vector, self.word_list[i][0])
-            closest_options.append((i, temp_sim_val))
-            closest_options.sort(key=lambda tup: tup[1])
-            if len(closest_options) > self.num_options:
-                closest_options.pop(len(closest_options)-1)
-            i = i - 1
-        return closest_options
+    # Initialize the list of known words
+    def init_word_vectors(self):
+        layout = None
+        if self.layout_file is not None:
+            try:
+                layout = sensel_lexicon.load_layout(self.layout_file)
+            except (IOError, ValueError, KeyError):
+                print("Error! Could not load keyboard layout file!")
+                self.stop()
+        # Share the warm lexicon of a running recognition service, keeping
+        # only the letter layout here for drawing
+        if self.service_address is not None:
+            self.lexicon = sensel_lexicon.GestureLexicon(None, self.deadband,
+                    self.vector_resolutions, self.use_optimized_layout,
+                    self.num_options, layout)
+            try:
+                self.recognizer = sensel_service.RecognitionClient(
+                        self.service_address)
+            except socket.error:
+                print("Error! Could not connect to recognition service!")
+                self.stop()
+        else:
+            try:
+                self.lexicon = sensel_lexicon.GestureLexicon('words.txt',
+                        self.deadband, self.vector_resolutions,
+                        self.use_optimized_layout, self.num_options, layout)
+                self.lexicon.set_matcher(self.matcher)
+                self.lexicon.set_quantization(self.quantization)
+                if self.personal_file is not None:
+                    self.personal = sensel_personalization.PersonalTemplates(
+                            self.lexicon, self.personal_file)
+            except IOError:
+                print("Error! Could not open known words file!")
+                self.stop()
+            self.recognizer = self.lexicon
+        for zone in self.zones:
+            if zone["type"] == "keyboard":
+                self.recognizer.gesture_scale = \
+                        self.lexicon.get_layout_width() / \
+                        float(zone["rect"][1] - zone["rect"][0])
 
     # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
     # MAIN ROUTINE
@@ -234,35 +163,64 @@ class SenselKeyboardEmulator:
     # The main program loop
     def run(self):
 
-        # Connect to the Sensel device
-        device = sensel.SenselDevice()
-        if device.openConnection():
-            print("Connected to Sensel.");
-        else:
-            print("Error! Could not connect to Sensel board!")
-            self.stop()
-        device.setFrameContentControl(sensel.SENSEL_FRAME_CONTACTS_FLAG)
-        device.startScanning()
-
-        # Initialize Sensel property variables
+        # Connect to the Sensel devices
+        for com_port in self.com_ports:
+            device = sensel.SenselDevice()
+            if device.openConnection(com_port):
+                print("Connected to Sensel %d." % len(self.devices))
+            else:
+                print("Error! Could not connect to Sensel board!")
+                self.stop()
+            device.setFrameContentControl(sensel.SENSEL_FRAME_CONTACTS_FLAG)
+            device.startScanning()
+            self.devices.append(device)
+
+        # Initialize Sensel property variables. All devices share the overlay
+        # of the first, and each gets its own block of contact ids.
+        device = self.devices[0]
         (self.device_width, self.device_height) = \
                 device.getSensorActiveAreaDimensionsUM()
         self.device_width = self.device_width / 1000 # Convert to mm
         self.device_height = self.device_height / 1000 # Convert to mm
-        self.device_max_contacts = max(device.getMaxContacts(), 1)
+        self.device_max_contacts = max([max(d.getMaxContacts(), 1)
+                                        for d in self.devices])
+        num_contacts = self.device_max_contacts * len(self.devices)
+        self.zone_map = sensel_zones.ZoneMap(self.zones, self.device_width,
+                                             self.device_height)
         
-        self.current_contacts = [[]] * self.device_max_contacts
-        self.contact_types = [[]] * self.device_max_contacts
-        self.num_contact_types = [0,0,0,0]
-
-        print("==============================================================");
-        print("Device info: %s" % device.getDeviceInfo())
-        print("Device dimensions: (%d, %d)" % (self.device_width,
-                                               self.device_height))
-        print("Max contacts: %d" % self.device_max_contacts)
-        print("Serial number: %s" % device.getSerialNumber())
-        print("Battery voltage (mV): %d" % device.getBatteryVoltagemV())
+        self.dispatcher = sensel_dispatch.GestureDispatcher(self.recognizer,
+                                                            self.num_workers)
+        if self.use_contact_features:
+            self.features = sensel_features.GestureFeatures(num_contacts)
+            self.features.min_key_spacing = self.deadband
+        self.pointer = sensel_pointer.PointerPipeline(
+                sensel_pointer.Win32CursorBackend(), self.pointer_acceleration,
+                self.pointer_cutoff, self.pointer_beta)
+        self.contacts = sensel_contacts.ContactHandler(self.zone_map,
+                self.device_max_contacts, len(self.devices), self.dispatcher,
+                self.pointer, self.features, self.device_width)
+        self.contacts.deadband = self.deadband
+        self.contacts.chord_frames = self.chord_frames
+        self.contacts.chord_max_frames = self.chord_max_frames
+        self.contacts.max_led_level = self.max_led_level
+        self.contacts.num_leds = self.num_leds
+        self.contacts.on_click = self.click
+        self.contacts.on_chord = self.run_chord
+        self.contacts.on_button = self.run_action
+
+        for device in self.devices:
+            print("==========================================================");
+            print("Device info: %s" % device.getDeviceInfo())
+            print("Device dimensions: (%d, %d)" % (self.device_width,
+                                                   self.device_height))
+            print("Max contacts: %d" % device.getMaxContacts())
+            print("Serial number: %s" % device.getSerialNumber())
+            print("Battery voltage (mV): %d" % device.getBatteryVoltagemV())
         print("==============================================================");
+        self.stream = sensel_devices.DeviceStream(self.devices, True,
+                                                  self.idle_rate,
+                                                  self.idle_after)
+        self.stream.start()
         
         # Main loop
         while self.running:
@@ -273,109 +231,81 @@ class SenselKeyboardEmulator:
                     if event.type == pygame.QUIT:
                         self.running = False
 
-            # Read contacts from Sensel
-            contacts = device.readContacts()
-            if len(contacts) == 0:
+            # Type the words of gestures matched so far, in end order
+            for (vi, options, path) in self.dispatcher.poll():
+                self.type_word(vi, options, path)
+
+            # Read contacts from the Sensels
+            event = self.stream.get(0.01)
+            if event is None:
                 continue
+            (t, device_index, contacts) = event
 
-            # Initialize array
-            led_array = [0] * self.num_leds
-
-            has_back = False
-
-            # Iterate through contacts
-            for c in contacts:
-                if c.type == sensel.SENSEL_EVENT_CONTACT_INVALID:
-                    pass 
-                elif c.type == sensel.SENSEL_EVENT_CONTACT_START:
-                    if self.in_keyboard((c.x_pos_mm, c.y_pos_mm)):
-                        self.num_contact_types[1] = self.num_contact_types[1] + 1
-                        led_array[self.get_led_at(c.x_pos_mm)] = self.max_led_level
-                        self.current_contacts[c.id].append((c.x_pos_mm, c.y_pos_mm))
-                        self.contact_types[c.id] = 1
-                    if self.in_trackpad((c.x_pos_mm, c.y_pos_mm)):
-                        led_array[self.get_led_at(c.x_pos_mm)] = self.max_led_level
-                        self.current_contacts[c.id].append((c.x_pos_mm, c.y_pos_mm))
-                        self.current_contacts[c.id].append((c.x_pos_mm, c.y_pos_mm))
-                        self.contact_types[c.id] = 2
-                        self.num_contact_types[2] = self.num_contact_types[2] + 1
-                    if self.in_buttons((c.x_pos_mm, c.y_pos_mm)):
-                        led_array[self.get_led_at(c.x_pos_mm)] = self.max_led_level
-                        self.contact_types[c.id] = 3
-                        self.num_contact_types[3] = self.num_contact_types[3] + 1
-                elif c.type == sensel.SENSEL_EVENT_CONTACT_MOVE:
-                    if self.contact_types[c.id] == 1:
-                        led_array[self.get_led_at(c.x_pos_mm)] = self.max_led_level
-                        self.current_contacts[c.id].append((c.x_pos_mm, c.y_pos_mm))
-                    if self.contact_types[c.id] == 2 and self.distance((c.x_pos_mm, c.y_pos_mm), self.current_contacts[c.id][1]) < self.deadband:
-                        led_array[self.get_led_at(c.x_pos_mm)] = self.max_led_level
-                        dx = c.x_pos_mm - (self.current_contacts[c.id][1][0])
-                        dy = c.y_pos_mm - self.current_contacts[c.id][1][1]
-                        self.current_contacts[c.id].pop(1)
-                        self.current_contacts[c.id].append((c.x_pos_mm, c.y_pos_mm))
-                        curr = win32api.GetCursorPos()
-                        nx = int(curr[0]+dx*self.mouse_multiplier)
-                        ny = int(curr[1]+dy*self.mouse_multiplier)
-                        win32api.SetCursorPos((nx, ny))
-                elif c.type == sensel.SENSEL_EVENT_CONTACT_END:
-                    if self.contact_types[c.id] == 2 and self.distance((c.x_pos_mm, c.y_pos_mm), self.current_contacts[c.id][0]) < self.deadband:
-                        curr = win32api.GetCursorPos()
-                        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN,curr[0],curr[1],0,0)
-                        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP,curr[0],curr[1],0,0)
-                    if self.contact_types[c.id] == 3:
-                        if c.x_pos_mm < 193:
-                            webbrowser.open("https://www.google.com/")
-                        else:
-                            self.shell.SendKeys("{ENTER}")
-                    if self.contact_types[c.id] == 1:
-                        if self.num_contact_types[1] <= 1 or True:
-                            vi = self.process_word(self.current_contacts[c.id])
-                            self.current_contacts[c.id] = [];
-                            if self.use_gui:
-                                self.clear_screen()
-                            options = self.get_closest_word(vi)
-                            i = 0
-                            c_inc = int(math.floor(255/self.num_options))
-                            while i < len(options):
-                                vf = self.word_list[options[i][0]][0]
-                                if self.use_gui:
-                                    self.draw_vector(vf, (i*c_inc,i*c_inc,i*c_inc))
-                                print("%s - %f" % (self.word_list[options[i][0]][1],
-                                           options[i][1]))
-                                self.prev_word_len = len(self.word_list[options[i][0]][1])+1
-                                i = i + 1
-                            if self.use_gui:
-                                self.draw_vector(vi, (255,0,0))
-                            print("====================")
-                            self.shell.SendKeys(self.word_list[options[0][0]][1]+ " ")
-                        else:
-                            has_back = True
-                            for i in range(len(self.current_contacts)):
-                                if self.contact_types[i] == 1:
-                                    dist = self.current_contacts[i][0][1]-self.current_contacts[i][len(self.current_contacts[i])-1][1]
-                                    win32api.mouse_event(MOUSEEVENTF_WHEEL, x, y, 1, 0)
-                                    print "A"
-                                    if dist < self.backspace_min_dist:
-                                        back_flag = False;
-                                    self.contact_types[i] = 0
-                                    self.current_contacts[i] = []
-                                    self.num_contact_types[1] = 0
-                                    
-
-                            
-                    self.current_contacts[c.id] = []
-                    self.contact_types[c.id] = 0
-                else:
-                    event = "Error! Unknown contact type!";
+            # Trace, match and act on the contacts, lighting the LEDs under
+            # them
+            led_array = self.contacts.handle_frame(t, device_index, contacts)
 
             # Set lights
-            device.setLEDBrightnessArr(led_array);
-
-        # Disconnect from the Sensel
-        device.stopScanning();
-        device.closeConnection();
+            self.devices[device_index].setLEDBrightnessArr(led_array);
+
+        # Disconnect from the Sensels
+        self.dispatcher.stop()
+        self.stream.stop()
+        for device in self.devices:
+            device.stopScanning();
+            device.closeConnection();
         self.stop()
         
+    # --------------------------------------------------------------------------
+    # Click where the cursor is, on a trackpad tap
+    def click(self):
+        curr = win32api.GetCursorPos()
+        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN,curr[0],curr[1],0,0)
+        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP,curr[0],curr[1],0,0)
+
+    # --------------------------------------------------------------------------
+    # Scroll on a vertical two-finger swipe, or delete the last word on a swipe
+    # to the left
+    def run_chord(self, movement):
+        (dx, dy) = movement
+        if abs(dy) > abs(dx):
+            win32api.mouse_event(MOUSEEVENTF_WHEEL, 0, 0,
+                                 int(-dy * self.scroll_multiplier), 0)
+        elif dx < -self.backspace_min_dist and self.prev_word_len > 0:
+            self.shell.SendKeys("{BACKSPACE %d}" % self.prev_word_len)
+            self.prev_word_len = 0
+            self.pending_accept = None
+
+    # --------------------------------------------------------------------------
+    # Show the best matches of a gesture and type the closest word. The word
+    # typed before it was kept, so its gesture adapts that word's template.
+    # Gestures that could not be matched type nothing.
+    def type_word(self, vi, options, path):
+        if not options:
+            print("Error! Could not match gesture!")
+            return
+        if self.personal is not None and self.pending_accept is not None:
+            self.personal.accept(*self.pending_accept)
+        if self.use_gui:
+            self.clear_screen()
+        i = 0
+        c_inc = int(math.floor(255/self.num_options))
+        words = self.recognizer.words
+        while i < len(options):
+            vf = self.lexicon.resample_path(
+                    self.lexicon.get_word_path(words[options[i][0]]), len(vi))
+            if self.use_gui:
+                self.draw_vector(vf, (i*c_inc,i*c_inc,i*c_inc))
+            print("%s - %f" % (words[options[i][0]], options[i][1]))
+            i = i + 1
+        if self.use_gui:
+            self.draw_vector(vi, (255,0,0))
+        print("====================")
+        word = words[options[0][0]]
+        self.prev_word_len = len(word) + 1
+        self.pending_accept = (options[0][0], path)
+        self.shell.SendKeys(word + " ")
+
     # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
     # UTILITY ROUTINES
     # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -391,7 +321,7 @@ class SenselKeyboardEmulator:
     # Draw a vector on the GUI with the given color
     def draw_vector(self, vector, color):
         if self.use_gui:
-            length_increment = self.screen_size[0] / self.vector_resolution * .5
+            length_increment = self.screen_size[0] / len(vector) * .5
             px = self.screen_size[0] / 2
             py = self.screen_size[1] / 2
             for i in range(len(vector) - 1):
@@ -403,50 +333,12 @@ class SenselKeyboardEmulator:
             pygame.display.update()
 
     # --------------------------------------------------------------------------
-    # Find the distance between two points
-    def distance(self, p1, p2):
-        return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
-
-    # --------------------------------------------------------------------------
-    # Find the squared distance between two points
-    def distance_squared(self, p1, p2):
-        return (p1[0] - p2[0])**2 + (p1[1] - p2[1])**2
-
-    # --------------------------------------------------------------------------
-    # Get the index of the LED at the given x position on the board
-    def get_led_at(self, pos):
-        return int(self.coerce(math.floor(
-                        self.num_leds * pos / self.device_width), 0, 15))
-
-    # --------------------------------------------------------------------------
-    # Fit a value into a specified range
-    def coerce(self, val, min_val, max_val):
-        return min(max(val, min_val), max_val)
-
-    # --------------------------------------------------------------------------
-    # Make radian angles positive
-    def make_positive(self, theta):
-        while theta < 0:
-            theta = theta + 2 * math.pi
-        return theta
-
-    # --------------------------------------------------------------------------
-    # Determine whether point is in keyboard area
-    def in_keyboard(self, p):
-        return self.keyboard[0] < p[0] < self.keyboard[1] and \
-                self.keyboard[2] < p[1] < self.keyboard[3];
-
-    # --------------------------------------------------------------------------
-    # Determine whether point is in trackpad area
-    def in_trackpad(self, p):
-        return self.trackpad[0] < p[0] < self.trackpad[1] and \
-                self.trackpad[2] < p[1] < self.trackpad[3];
-    
-    # --------------------------------------------------------------------------
-    # Determine whether point is in buttons area
-    def in_buttons(self, p):
-        return self.buttons[0] < p[0] < self.buttons[1] and \
-                self.buttons[2] < p[1] < self.buttons[3];
+    # Run the configured action of a button zone
+    def run_action(self, zone):
+        if zone.get("action") in self.actions:
+            self.actions[zone["action"]](zone.get("argument"))
+        else:
+            print("Error! Unknown action for zone %s!" % zone.get("name"))
 
     # --------------------------------------------------------------------------
     # Exit the program
@@ -0,0 +1,221 @@
+# ==============================================================================
+# SENSEL KEYBOARD LAYOUT OPTIMIZER
+#
+# Searches letter layouts for ones whose word gestures are easiest to tell
+# apart. Independent simulated annealing chains run in a process pool and the
+# best layout found is written as a layout file loadable by the emulator.
+#
+# Example: python sensel_layout_optimizer.py -o layout.json --processes 4
+# ==============================================================================
+
+import argparse
+import math
+import multiprocessing
+import random
+import timeit
+import numpy as np
+import sensel_lexicon
+
+# === Layout Evaluator =========================================================
+# Scores the whole-lexicon confusion of a letter layout in one vectorized pass
+# ==============================================================================
+
+class LayoutEvaluator:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, words, base_layout, num_words=1000, resolution=16,
+                 temperature=4.0, deadband=10):
+
+        # Define "magic number" parameters
+        self.resolution = resolution      # Segments in a comparison vector
+        self.temperature = temperature    # Squared error of "confusable" words
+
+        # Keep the most frequent distinct words, weighted by Zipf's law
+        seen = set()
+        kept = []
+        for w in words:
+            if w not in seen:
+                seen.add(w)
+                kept.append(w)
+            if len(kept) == num_words:
+                break
+        self.words = kept
+        self.weights = 1.0 / np.arange(1, len(kept) + 1)
+        self.weights = self.weights / np.sum(self.weights)
+
+        # Store words as letter indices, dropping repeated letters, which
+        # filter_path would remove as they sit on the same key
+        max_len = 2
+        letters = []
+        for w in kept:
+            idx = [ord(w[0]) - ord('a')]
+            for c in w[1:]:
+                if ord(c) - ord('a') != idx[-1]:
+                    idx.append(ord(c) - ord('a'))
+            letters.append(idx)
+            max_len = max(max_len, len(idx))
+        self.letters = np.zeros((len(kept), max_len), int)
+        self.counts = np.zeros(len(kept), int)
+        for i in range(len(letters)):
+            self.letters[i, :len(letters[i])] = letters[i]
+            self.letters[i, len(letters[i]):] = letters[i][-1]
+            self.counts[i] = len(letters[i])
+
+        # Calculate the coordinates of every key slot of the base geometry
+        self.rows = [len(r) for r in base_layout["rows"]]
+        self.row_offsets = list(base_layout["row_offsets"])
+        self.key_spacing = base_layout["key_spacing"]
+        self.slots = []
+        for i in range(len(self.rows)):
+            for pos in range(self.rows[i]):
+                self.slots.append(((pos * self.key_spacing +
+                                    self.row_offsets[i]) * deadband,
+                                   i * self.key_spacing * deadband))
+        self.slots = np.array(self.slots, float)
+
+    # --------------------------------------------------------------------------
+    # Calculate the frequency-weighted confusion of a layout given as a string
+    # holding the letter of each slot, row after row
+    def get_cost(self, layout):
+        coords = np.zeros((26, 2))
+        for i in range(len(layout)):
+            coords[ord(layout[i]) - ord('a')] = self.slots[i]
+        vectors = sensel_lexicon.resample_points(coords[self.letters],
+                                                 self.counts, self.resolution)
+
+        # Build the xy trajectories compared by serror
+        steps = np.concatenate((np.cos(vectors), np.sin(vectors)), axis=1)
+        points = np.concatenate((np.cumsum(steps[:, :self.resolution], 1),
+                                 np.cumsum(steps[:, self.resolution:], 1)),
+                                axis=1) - steps
+
+        # Sum the similarity of every word to every other word
+        sq = np.sum(points * points, axis=1)
+        err = sq[:, np.newaxis] + sq[np.newaxis, :] - \
+                2 * np.dot(points, points.T)
+        np.fill_diagonal(err, np.inf)
+        confusion = np.sum(np.exp(-np.maximum(err, 0) / self.temperature),
+                           axis=1)
+        return float(np.dot(self.weights, confusion))
+
+    # --------------------------------------------------------------------------
+    # Convert a slot string back into a layout definition
+    def get_layout(self, layout):
+        rows = []
+        start = 0
+        for n in self.rows:
+            rows.append(layout[start:start+n])
+            start = start + n
+        return {"rows": rows, "row_offsets": self.row_offsets,
+                "key_spacing": self.key_spacing}
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# SIMULATED ANNEALING
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+_evaluator = None # Evaluator of each pool process
+
+# ------------------------------------------------------------------------------
+# Build the evaluator once in each pool process
+def _init_worker(words, base_layout, num_words, resolution):
+    global _evaluator
+    _evaluator = LayoutEvaluator(words, base_layout, num_words, resolution)
+
+# ------------------------------------------------------------------------------
+# Run one annealing chain of letter swaps, returning the best layout found
+def anneal(evaluator, layout, steps, seed, t_start=0.02, t_end=0.0002):
+    rng = random.Random(seed)
+    layout = list(layout)
+    rng.shuffle(layout)
+    cost = evaluator.get_cost(layout)
+    scale = cost
+    best = (cost, "".join(layout))
+    start = timeit.default_timer()
+    for i in range(steps):
+        t = t_start * (t_end / t_start) ** (i / float(steps)) * scale
+        (a, b) = rng.sample(range(len(layout)), 2)
+        layout[a], layout[b] = layout[b], layout[a]
+        new_cost = evaluator.get_cost(layout)
+        if new_cost <= cost or rng.random() < math.exp((cost - new_cost) / t):
+            cost = new_cost
+            if cost < best[0]:
+                best = (cost, "".join(layout))
+        else:
+            layout[a], layout[b] = layout[b], layout[a]
+    elapsed = timeit.default_timer() - start
+    return (best[0], best[1], steps + 1, elapsed)
+
+# ------------------------------------------------------------------------------
+# Run a chain in a pool process
+def _run_chain(args):
+    (layout, steps, seed) = args
+    return anneal(_evaluator, layout, steps, seed)
+
+# ------------------------------------------------------------------------------
+# Run one chain per seed across a pool, returning results and wall-clock time
+def optimize(words, base_layout, processes, chains, steps, num_words,
+             resolution, seed=1):
+    layout = "".join(base_layout["rows"])
+    pool = multiprocessing.Pool(processes, _init_worker,
+                                (words, base_layout, num_words, resolution))
+    start = timeit.default_timer()
+    results = pool.map(_run_chain, [(layout, steps, seed + i)
+                                    for i in range(chains)])
+    elapsed = timeit.default_timer() - start
+    pool.close()
+    pool.join()
+    return (results, elapsed)
+
+# === MAIN =====================================================================
+# Program entrance point
+# ==============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=
+            "Search keyboard layouts for separable word gestures")
+    parser.add_argument("-o", "--output", default="optimized_layout.json")
+    parser.add_argument("--words", default="words.txt")
+    parser.add_argument("--base", help="layout file giving the row geometry")
+    parser.add_argument("--processes", type=int,
+                        default=multiprocessing.cpu_count())
+    parser.add_argument("--chains", type=int, help="defaults to --processes")
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--num-words", type=int, default=1000)
+    parser.add_argument("--resolution", type=int, default=16)
+    parser.add_argument("--scaling", action="store_true",
+                        help="only report throughput for 1..N processes")
+    args = parser.parse_args()
+
+    words = sensel_lexicon.read_words(args.words)
+    base = sensel_lexicon.QWERTY_LAYOUT
+    if args.base:
+        base = sensel_lexicon.load_layout(args.base)
+
+    if args.scaling:
+        n = 1
+        while n <= args.processes:
+            (results, elapsed) = optimize(words, base, n, n, args.steps,
+                                          args.num_words, args.resolution)
+            evals = sum([r[2] for r in results])
+            print("%2d processes: %8.1f evaluations/s, %6.2f s wall clock" %
+                  (n, evals / elapsed, elapsed))
+            n = n * 2
+    else:
+        evaluator = LayoutEvaluator(words, base, args.num_words,
+                                    args.resolution)
+        print("Base layout cost: %f" %
+              evaluator.get_cost("".join(base["rows"])))
+        (results, elapsed) = optimize(words, base, args.processes,
+                                      args.chains or args.processes,
+                                      args.steps, args.num_words,
+                                      args.resolution)
+        for r in results:
+            print("Chain cost %f (%.1f evaluations/s)" % (r[0], r[2] / r[3]))
+        best = min(results)
+        print("Best layout %s, cost %f" % (best[1], best[0]))
+        print("%.1f evaluations/s in %.2f s" %
+              (sum([r[2] for r in results]) / elapsed, elapsed))
+        sensel_lexicon.save_layout(evaluator.get_layout(best[1]), args.output)
+
+# Finis
@@ -0,0 +1,806 @@
+# ==============================================================================
+# SENSEL GESTURE LEXICON
+#
+# Stores the comparison vectors of all known words and finds the words whose
+# ideal letter paths are closest to a traced gesture.
+# ==============================================================================
+
+import math
+import re
+import json
+import threading
+import numpy as np
+
+# Keyboard layouts, with row offsets and key spacing in units of the deadband
+QWERTY_LAYOUT = {
+    "rows": ["qwertyuiop", "asdfghjkl", "zxcvbnm"],
+    "row_offsets": [0, 1, 2],
+    "key_spacing": 3,
+}
+OPTIMIZED_LAYOUT = {
+    "rows": ["dghpasjrkn", "iqvuwclxm", "tybezfo"],
+    "row_offsets": [0, 1.5, 4.5],
+    "key_spacing": 3,
+}
+
+# Largest int16 trajectory coordinate, so that differences fit in int16
+INT16_RANGE = 16383
+
+# === Gesture Lexicon ==========================================================
+# Holds a pyramid of word vectors at several resolutions
+# ==============================================================================
+
+class GestureLexicon:
+
+    # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+    # INITIALIZATION ROUTINES
+    # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, word_file='words.txt', deadband=10,
+                 resolutions=(8, 16, 32), use_optimized_layout=False,
+                 num_options=7, layout=None):
+
+        # Define "magic number" parameters
+        self.deadband = deadband          # Minimum noticed gesture length (mm)
+        self.layout = layout              # Keyboard layout definition
+        if self.layout is None and use_optimized_layout:
+            self.layout = OPTIMIZED_LAYOUT
+        elif self.layout is None:         # Default to QWERTY layout
+            self.layout = QWERTY_LAYOUT
+        self.num_options = num_options    # Compute this many best words
+        self.resolution_lengths = (40, 100) # Path lengths (mm) per resolution
+        self.cascade = True               # Prune at the lowest resolution first
+        self.cascade_candidates = 256     # Words kept by the coarse pass
+        self.gesture_scale = 2.0          # Layout units per gesture mm
+        self.shard_width = 3 * deadband   # Letter path length range of a shard
+        self.shard_tolerance = 2.0        # Relative path length mismatch, wide
+                                          # as users swipe at their own size
+        self.build_chunk = 8192           # Words vectorized at a time
+        self.key_weight = 2.0             # Extra error weight at key points
+        self.key_width = 0.05             # Path fraction weighted per key point
+        self.matcher = "serror"           # Matching engine, "serror" or "dtw"
+        self.dtw_band = 3                 # Sakoe-Chiba band half width (samples)
+        self.dtw_batch = 32               # Words warped at a time
+        self.dtw_evaluations = 0          # Full DTW runs so far, for profiling
+        self.quantization = None          # None or "int16" templates
+        self.rerank_candidates = 64       # Quantized matches re-ranked in float
+
+        # Define more variables
+        self.resolutions = tuple(sorted(resolutions)) # Vector resolutions
+        self.words = []                   # Known words, by letter path length
+        self.word_indices = {}            # Word -> index of its first entry
+        self.lengths = np.zeros(0, np.float32) # Letter path length of words
+        self.shards = []                  # (min length, max length, start, stop)
+        self.trajectories = {}            # Resolution -> word xy trajectories
+        self.codes = {}                   # Resolution -> quantized templates
+        self.envelopes = {}               # Resolution -> DTW (lower, upper)
+        self.lock = threading.RLock()     # Keeps template updates out of
+                                          # recognitions on other threads
+
+        # Calculate ideal letter coordinates
+        self.letter_coords = {}
+        for c in "abcdefghijklmnopqrstuvwxyz":
+            self.letter_coords[c] = self.get_letter_coords(c)
+
+        if word_file is not None:
+            self.set_words(read_words(word_file))
+
+    # --------------------------------------------------------------------------
+    # Replace the known words, sharding them by the length of their letter path
+    def set_words(self, words):
+
+        # Sort the words by path length, keeping file order for equal lengths
+        lengths = np.array([self.path_length(self.get_word_path(w))
+                            for w in words], np.float32)
+        order = np.argsort(lengths, kind='mergesort')
+        self.words = [words[i] for i in order]
+        self.lengths = lengths[order]
+        self.word_indices = {}
+        for i in range(len(self.words) - 1, -1, -1):
+            self.word_indices[self.words[i]] = i
+
+        # Group words whose path lengths lie within one shard width
+        self.shards = []
+        start = 0
+        while start < len(self.words):
+            stop = int(np.searchsorted(self.lengths,
+                            self.lengths[start] + self.shard_width, 'left'))
+            stop = max(stop, start + 1)
+            self.shards.append((float(self.lengths[start]),
+                                float(self.lengths[stop-1]), start, stop))
+            start = stop
+
+        self.trajectories = {}
+        self.codes = {}
+        self.envelopes = {}
+        self.set_resolutions(self.resolutions)
+
+    # --------------------------------------------------------------------------
+    # Build the word vectors for every resolution not already cached
+    def set_resolutions(self, resolutions):
+        for r in resolutions:
+            if r in self.trajectories or r in self.codes:
+                continue
+            trajectories = np.zeros((len(self.words), r, 2), np.float32)
+            for start in range(0, len(self.words), self.build_chunk):
+                paths = [self.get_word_path(w) for w in
+                         self.words[start:start+self.build_chunk]]
+                trajectories[start:start+len(paths)] = \
+                        self.get_trajectories(resample_paths(paths, r))
+            self.trajectories[r] = trajectories
+        self.resolutions = tuple(sorted(resolutions))
+        for r in list(self.trajectories.keys()):
+            if r not in self.resolutions:
+                del self.trajectories[r]
+        for r in list(self.codes.keys()):
+            if r not in self.resolutions:
+                del self.codes[r]
+        self.set_quantization(self.quantization)
+        self.set_matcher(self.matcher)
+
+    # --------------------------------------------------------------------------
+    # Store the word templates as float32 trajectories (None) or int16
+    # fixed-point trajectories ("int16")
+    def set_quantization(self, quantization):
+        if quantization not in (None, "int16"):
+            raise ValueError("Unknown quantization %s" % quantization)
+        if quantization is not None and self.matcher == "dtw":
+            raise ValueError("The DTW matcher needs float templates")
+        for r in list(self.codes.keys()): # Keeps the quantization error
+            self.trajectories[r] = self.get_templates(r)
+            del self.codes[r]
+        self.quantization = quantization
+        if quantization is not None:
+            for r in list(self.trajectories.keys()):
+                self.codes[r] = quantize_trajectories(self.trajectories.pop(r),
+                                                      quantization)
+
+    # --------------------------------------------------------------------------
+    # Select the matching engine, building the DTW envelopes if needed
+    def set_matcher(self, matcher):
+        if matcher not in ("serror", "dtw"):
+            raise ValueError("Unknown matcher %s" % matcher)
+        if matcher == "dtw" and self.quantization is not None:
+            raise ValueError("The DTW matcher needs float templates")
+        self.matcher = matcher
+        self.envelopes = {}
+        if matcher == "dtw":
+            for r in self.resolutions:
+                self.envelopes[r] = get_envelopes(self.trajectories[r],
+                                                  self.dtw_band)
+
+    # --------------------------------------------------------------------------
+    # Recalculate the DTW envelopes of one word after its template changed
+    def update_envelopes(self, resolution, index):
+        self.lock.acquire()
+        try:
+            if resolution in self.envelopes:
+                (lower, upper) = get_envelopes(
+                        self.trajectories[resolution][index:index+1],
+                        self.dtw_band)
+                self.envelopes[resolution][0][index] = lower[0]
+                self.envelopes[resolution][1][index] = upper[0]
+        finally:
+            self.lock.release()
+
+    # --------------------------------------------------------------------------
+    # Get the float trajectories of a slice or an index array of words
+    def get_templates(self, resolution, rows=None):
+        if resolution in self.trajectories:
+            if rows is None:
+                return self.trajectories[resolution]
+            return self.trajectories[resolution][rows]
+        codes = self.codes[resolution]
+        if rows is not None:
+            codes = codes[rows]
+        return dequantize_trajectories(codes, self.quantization)
+
+    # --------------------------------------------------------------------------
+    # Get a copy of the trajectory of one word
+    def get_template(self, resolution, index):
+        return self.get_templates(resolution, [index])[0]
+
+    # --------------------------------------------------------------------------
+    # Replace the trajectory of one word, waiting for any recognition in
+    # progress on another thread
+    def set_template(self, resolution, index, points):
+        self.lock.acquire()
+        try:
+            if resolution in self.trajectories:
+                self.trajectories[resolution][index] = points
+            else:
+                self.codes[resolution][index] = quantize_trajectories(
+                        np.asarray(points)[np.newaxis], self.quantization)[0]
+            self.update_envelopes(resolution, index)
+        finally:
+            self.lock.release()
+
+    # --------------------------------------------------------------------------
+    # Get the index of a word, or None if it is not known
+    def get_word_index(self, word):
+        return self.word_indices.get(word)
+
+    # --------------------------------------------------------------------------
+    # Get the filtered ideal letter path of a word
+    def get_word_path(self, word):
+        return self.filter_path([self.letter_coords[c] for c in word])
+
+    # --------------------------------------------------------------------------
+    # Get the width of the letter layout
+    def get_layout_width(self):
+        xs = [p[0] for p in self.letter_coords.values()]
+        return max(xs) - min(xs)
+
+    # --------------------------------------------------------------------------
+    # Define the coordinates of letters on a keyboard
+    def get_letter_coords(self, c):
+        rows = self.layout["rows"]
+        key_spacing = self.layout["key_spacing"]
+        for i in range(len(rows)):
+            pos = str.find(rows[i], c)
+            if not pos == -1:
+                return ((pos * key_spacing + self.layout["row_offsets"][i]) *
+                            self.deadband, i * key_spacing * self.deadband)
+        return (0,0)
+
+    # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+    # VECTOR-BASED WORD RECOGNITION ROUTINES
+    # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    # --------------------------------------------------------------------------
+    # Remove coordinates that are too close together
+    def filter_path(self, coords):
+        if isinstance(coords, np.ndarray):
+            coords = coords.tolist()      # Python floats compare faster
+        path = []
+        for p in coords:
+            if len(path) == 0 or distance(p, path[-1]) >= self.deadband:
+                path.append(p)
+        return path
+
+    # --------------------------------------------------------------------------
+    # Find the total length of a path
+    def path_length(self, path):
+        length = 0
+        for i in range(1, len(path)):
+            length = length + distance(path[i], path[i-1])
+        return length
+
+    # --------------------------------------------------------------------------
+    # Calculate the vector of a given coordinate sequence
+    def process_word(self, coords, resolution=None):
+        if resolution is None:
+            resolution = self.resolutions[-1]
+        return self.resample_path(self.filter_path(coords), resolution)
+
+    # --------------------------------------------------------------------------
+    # Create the vector from the angles of a filtered path at constant intervals
+    def resample_path(self, path, resolution):
+        length = self.path_length(path)
+        vector = [0] * resolution
+        if not length == 0:
+            dist_increment = length / float(resolution - 1)
+            current_dist = 0 # Keep track of current distance along path
+            current_index = 1 # Keep track of place in vector
+            vector[0] = make_positive(math.atan2(path[1][1]-path[0][1],
+                                                 path[1][0]-path[0][0]))
+            i = 1
+            while i < len(path):
+                current_dist = current_dist + distance(path[i], path[i-1])
+                while current_dist >= current_index * dist_increment \
+                        and current_index < resolution - 1:
+                    vector[current_index] = make_positive(
+                            math.atan2(path[i][1]-path[i-1][1],
+                                       path[i][0]-path[i-1][0]))
+                    current_index = current_index + 1
+                i = i + 1
+            i = len(path) - 1
+            vector[resolution - 1] = make_positive(
+                            math.atan2(path[i][1]-path[i-1][1],
+                                       path[i][0]-path[i-1][0]))
+        return vector
+
+    # --------------------------------------------------------------------------
+    # Convert angle vectors into the unit-step xy points compared by serror
+    def get_trajectories(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        steps = np.stack((np.cos(vectors), np.sin(vectors)), axis=-1)
+        points = np.cumsum(steps, axis=-2) - steps # Points before each step
+        return points
+
+    # --------------------------------------------------------------------------
+    # Calculate the squared error between two vector paths on the xy plane
+    def serror(self, v1, v2):
+        i = 0
+        px1 = 0
+        py1 = 0
+        px2 = 0
+        py2 = 0
+        err = 0
+        while i < len(v1):
+            nx1 = px1 + math.cos(v1[i])
+            ny1 = py1 + math.sin(v1[i])
+            nx2 = px2 + math.cos(v2[i])
+            ny2 = py2 + math.sin(v2[i])
+            err = err + (py1-py2)**2 + (px1-px2)**2
+            px1 = nx1
+            py1 = ny1
+            px2 = nx2
+            py2 = ny2
+            i = i + 1
+        return err
+
+    # --------------------------------------------------------------------------
+    # Calculate the cosine similarity between two vectors (DEPRECATED)
+    def similarity(self, v1, v2):
+        result = np.dot(v1, v2)
+        n1 = np.linalg.norm(v1)
+        if not np.count_nonzero(v1) == 0:
+            result = result / n1
+        n2 = np.linalg.norm(v2)
+        if not n2 == np.count_nonzero(v2) == 0:
+            result = result / n2
+        if np.count_nonzero(v1) == 0 and np.count_nonzero(v2) == 0:
+            result = 1
+        return result
+
+    # --------------------------------------------------------------------------
+    # Calculate the serror of a vector against a set of words in one pass
+    def get_errors(self, vector, rows=None, weights=None):
+        trajectories = self.get_templates(len(vector), rows)
+        diff = trajectories - self.get_trajectories(vector)
+        if weights is None:
+            return np.sum(np.sum(diff * diff, axis=2), axis=1)
+        return np.dot(np.sum(diff * diff, axis=2), weights)
+
+    # --------------------------------------------------------------------------
+    # Estimate the serror of a vector against a set of words from their
+    # quantized templates with integer arithmetic, which gives the serror up
+    # to rounding
+    def get_quantized_errors(self, vector, rows=None, weights=None):
+        r = len(vector)
+        codes = self.codes[r]
+        if rows is not None:
+            codes = codes[rows]
+        query = quantize_trajectories(self.get_trajectories(vector)[np.newaxis],
+                                      self.quantization)[0]
+        diff = codes - query              # Cannot overflow, see INT16_RANGE
+        errors = np.einsum('ijk,ijk->ij', diff, diff, dtype=np.int64)
+        scale = float(get_int16_scale(r))**2
+        if weights is None:
+            return np.sum(errors, axis=1) / scale
+        return np.dot(errors, weights) / scale
+
+    # --------------------------------------------------------------------------
+    # Calculate the serror of several vectors of one resolution against a
+    # slice of the lexicon in one matrix product, as (word, vector) errors
+    def get_batch_errors(self, vectors, rows, weights):
+        r = len(vectors[0])
+        trajectories = self.get_templates(r, rows).astype(np.float64)
+        queries = self.get_trajectories(vectors).astype(np.float64)
+        w = np.ones((len(vectors), r))
+        for i in range(len(vectors)):
+            if weights[i] is not None:
+                w[i] = weights[i]
+        # sum w |t - q|^2 = sum w |t|^2 - 2 sum w t.q + sum w |q|^2
+        errors = np.dot(np.sum(trajectories * trajectories, axis=2), w.T)
+        errors -= 2 * np.dot(trajectories.reshape(len(trajectories), 2 * r),
+                    (queries * w[:, :, np.newaxis]).reshape(len(vectors),
+                                                            2 * r).T)
+        errors += np.sum(np.sum(queries * queries, axis=2) * w, axis=1)
+        return np.maximum(errors, 0)
+
+    # --------------------------------------------------------------------------
+    # Find the closest matches of several vectors of one resolution, each
+    # among its own slice of the lexicon, scoring them together. Returns the
+    # (indices, errors) arrays of each, best first.
+    def get_closest_words(self, vectors, rows, num_options, weights):
+        start = min([s.start for s in rows])
+        stop = max([s.stop for s in rows])
+        errors = self.get_batch_errors(vectors, slice(start, stop), weights)
+        results = []
+        for i in range(len(vectors)):
+            column = errors[rows[i].start-start:rows[i].stop-start, i]
+            best = select_smallest(column, num_options)
+            results.append((best + rows[i].start, column[best]))
+        return results
+
+    # --------------------------------------------------------------------------
+    # Weight the vector samples near key points of a gesture, given as
+    # fractions of its path length
+    def get_sample_weights(self, key_fractions, resolution):
+        positions = np.arange(resolution) / float(resolution - 1)
+        weights = np.ones(resolution, np.float32)
+        for f in key_fractions:
+            weights = np.maximum(weights, 1 + self.key_weight *
+                        np.exp(-((positions - f) / self.key_width)**2))
+        return weights
+
+    # --------------------------------------------------------------------------
+    # Find the closest matches to the given word vector among a slice or an
+    # index array of the lexicon
+    def get_closest_word(self, vector, rows=None, num_options=None,
+                         weights=None):
+        if num_options is None:
+            num_options = self.num_options
+        if self.quantization is not None:
+            errors = self.get_quantized_errors(vector, rows, weights)
+            if self.rerank_candidates == 0:
+                best = select_smallest(errors, num_options)
+                indices = get_row_indices(rows, best)
+                return [(int(indices[i]), float(errors[best[i]]))
+                        for i in range(len(best))]
+            rows = get_row_indices(rows, select_smallest(errors,
+                        max(num_options, self.rerank_candidates)))
+        errors = self.get_errors(vector, rows, weights)
+        best = select_smallest(errors, num_options)
+        indices = get_row_indices(rows, best)
+        return [(int(indices[i]), float(errors[best[i]]))
+                for i in range(len(best))]
+
+    # --------------------------------------------------------------------------
+    # Find the closest matches by banded dynamic time warping of trajectories,
+    # warping words in order of their LB_Keogh lower bound until no remaining
+    # bound can beat the current options
+    def get_closest_word_dtw(self, vector, rows=None, num_options=None,
+                             weights=None):
+        if num_options is None:
+            num_options = self.num_options
+        query = self.get_trajectories(vector)
+        trajectories = self.trajectories[len(vector)]
+        (lower, upper) = self.envelopes[len(vector)]
+        if rows is not None:
+            trajectories = trajectories[rows]
+            lower = lower[rows]
+            upper = upper[rows]
+
+        # Squared distance of each query point to the word's envelope
+        below = np.maximum(lower - query, 0)
+        above = np.maximum(query - upper, 0)
+        bounds = np.sum(below * below + above * above, axis=2)
+        if weights is None:
+            bounds = np.sum(bounds, axis=1)
+        else:
+            bounds = np.dot(bounds, weights)
+
+        # Warp words in lower bound order, stopping once none can make the cut
+        order = np.argsort(bounds, kind='mergesort')
+        best = []
+        cutoff = np.inf
+        for start in range(0, len(order), self.dtw_batch):
+            batch = order[start:start+self.dtw_batch]
+            batch = batch[bounds[batch] < cutoff]
+            if len(batch) == 0:
+                break
+            errors = dtw_distances(query, trajectories[batch], self.dtw_band,
+                                   weights)
+            self.dtw_evaluations = self.dtw_evaluations + len(batch)
+            best.extend(zip(errors.tolist(), batch.tolist()))
+            best.sort()
+            best = best[:num_options]
+            if len(best) == num_options:
+                cutoff = best[-1][0]
+        indices = get_row_indices(rows, [b[1] for b in best])
+        return [(int(indices[i]), best[i][0]) for i in range(len(best))]
+
+    # --------------------------------------------------------------------------
+    # Get the rows of the shards whose path lengths fit a gesture path length.
+    # Gestures are drawn at whatever size suits the user, so the fit is loose:
+    # a third to three times the scaled length by default.
+    def get_candidate_rows(self, length, gesture_scale=None):
+        if gesture_scale is None:
+            gesture_scale = self.gesture_scale
+        length = length * gesture_scale
+        low = length / (1 + self.shard_tolerance)
+        high = length * (1 + self.shard_tolerance)
+        start = None
+        stop = None
+        for (min_len, max_len, shard_start, shard_stop) in self.shards:
+            if max_len >= low and min_len <= high:
+                if start is None:
+                    start = shard_start
+                stop = shard_stop
+        if start is None or stop - start < self.num_options:
+            return slice(0, len(self.words))
+        return slice(start, stop)
+
+    # --------------------------------------------------------------------------
+    # Pick the vector resolution suited to the length of a filtered path
+    def get_resolution(self, path):
+        length = self.path_length(path)
+        for i in range(len(self.resolution_lengths)):
+            if length < self.resolution_lengths[i] \
+                    and i < len(self.resolutions):
+                return self.resolutions[i]
+        return self.resolutions[-1]
+
+    # --------------------------------------------------------------------------
+    # Find the closest words to a traced gesture, returning its vector too.
+    # Key points of the gesture, as fractions of its length, weigh more. A
+    # gesture scale overrides the lexicon's. Templates are not updated while
+    # it runs.
+    def recognize(self, coords, resolution=None, key_fractions=None,
+                  gesture_scale=None):
+        self.lock.acquire()
+        try:
+            return self.recognize_locked(coords, resolution, key_fractions,
+                                         gesture_scale)
+        finally:
+            self.lock.release()
+
+    # --------------------------------------------------------------------------
+    # Recognize a gesture with the template lock held
+    def recognize_locked(self, coords, resolution=None, key_fractions=None,
+                         gesture_scale=None):
+        path = self.filter_path(coords)
+        if resolution is None:
+            resolution = self.get_resolution(path)
+        rows = self.get_candidate_rows(self.path_length(path), gesture_scale)
+        coarse = self.resolutions[0]
+        if self.cascade and resolution != coarse and \
+                rows.stop - rows.start > self.cascade_candidates:
+            weights = None
+            if key_fractions is not None:
+                weights = self.get_sample_weights(key_fractions, coarse)
+            options = self.get_closest_word(self.resample_path(path, coarse),
+                            rows, self.cascade_candidates, weights)
+            rows = np.array([o[0] for o in options])
+        vector = self.resample_path(path, resolution)
+        weights = None
+        if key_fractions is not None:
+            weights = self.get_sample_weights(key_fractions, resolution)
+        if self.matcher == "dtw":
+            return (vector, self.get_closest_word_dtw(vector, rows, None,
+                                                      weights))
+        return (vector, self.get_closest_word(vector, rows, None, weights))
+
+    # --------------------------------------------------------------------------
+    # Recognize several (coords, resolution, key fractions, gesture scale)
+    # gestures together, as recognize would one at a time. The serror passes
+    # of gestures at the same resolution are scored in one matrix product.
+    def recognize_batch(self, gestures):
+        self.lock.acquire()
+        try:
+            return self.recognize_batch_locked(gestures)
+        finally:
+            self.lock.release()
+
+    # --------------------------------------------------------------------------
+    # Recognize several gestures with the template lock held
+    def recognize_batch_locked(self, gestures):
+        if self.matcher == "dtw" or self.quantization is not None:
+            return [self.recognize_locked(c, r, k, s)
+                    for (c, r, k, s) in gestures]
+        coarse = self.resolutions[0]
+        gestures = [(self.filter_path(c), r, k, s) for (c, r, k, s) in gestures]
+        results = [None] * len(gestures)
+        pruned = []                       # (gesture, rows) to prune first
+        passes = {}                       # Resolution -> [(gesture, rows)]
+        for i in range(len(gestures)):
+            (path, resolution, key_fractions, scale) = gestures[i]
+            if resolution is None:
+                resolution = self.get_resolution(path)
+                gestures[i] = (path, resolution, key_fractions, scale)
+            rows = self.get_candidate_rows(self.path_length(path), scale)
+            if self.cascade and resolution != coarse and \
+                    rows.stop - rows.start > self.cascade_candidates:
+                pruned.append((i, rows))
+            else:
+                passes.setdefault(resolution, []).append((i, rows))
+
+        # Prune long gestures at the coarse resolution together, then rescore
+        # the candidates of each at its own resolution
+        if pruned:
+            (vectors, options) = self.score_batch(gestures, pruned, coarse,
+                                                  self.cascade_candidates)
+            for j in range(len(pruned)):
+                (path, resolution, key_fractions, scale) = \
+                        gestures[pruned[j][0]]
+                rows = options[j][0]
+                vector = self.resample_path(path, resolution)
+                weights = None
+                if key_fractions is not None:
+                    weights = self.get_sample_weights(key_fractions,
+                                                      resolution)
+                results[pruned[j][0]] = (vector, self.get_closest_word(vector,
+                                                 rows, None, weights))
+
+        # Score the other gestures of each resolution together
+        for (resolution, batch) in passes.items():
+            (vectors, options) = self.score_batch(gestures, batch, resolution,
+                                                  self.num_options)
+            for j in range(len(batch)):
+                (indices, errors) = options[j]
+                results[batch[j][0]] = (vectors[j], list(zip(indices.tolist(),
+                                                        errors.tolist())))
+        return results
+
+    # --------------------------------------------------------------------------
+    # Resample a batch of (gesture, rows) at one resolution and find the
+    # closest words of each in its rows
+    def score_batch(self, gestures, batch, resolution, num_options):
+        vectors = []
+        weights = []
+        for (i, rows) in batch:
+            (path, r, key_fractions, scale) = gestures[i]
+            vectors.append(self.resample_path(path, resolution))
+            weights.append(None)
+            if key_fractions is not None:
+                weights[-1] = self.get_sample_weights(key_fractions,
+                                                      resolution)
+        return (vectors, self.get_closest_words(vectors,
+                        [rows for (i, rows) in batch], num_options, weights))
+
+    # --------------------------------------------------------------------------
+    # Get the vector of a word at the given resolution
+    def get_word_vector(self, index, resolution=None):
+        if resolution is None:
+            resolution = self.resolutions[-1]
+        return self.resample_path(self.get_word_path(self.words[index]),
+                                  resolution)
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# UTILITY ROUTINES
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# ------------------------------------------------------------------------------
+# Read a list of known words, one per line, stopping at the first blank line
+def read_words(word_file):
+    words = []
+    f = open(word_file, 'r')
+    for line in f:
+        word = re.sub(r'[^a-z]', '', line.lower())
+        if not word:
+            break
+        words.append(word)
+    f.close()
+    return words
+
+# ------------------------------------------------------------------------------
+# Load a keyboard layout definition from a JSON file
+def load_layout(layout_file):
+    f = open(layout_file, 'r')
+    layout = json.load(f)
+    f.close()
+    if len(layout["rows"]) != len(layout["row_offsets"]):
+        raise ValueError("Layout needs one offset per row")
+    return layout
+
+# ------------------------------------------------------------------------------
+# Save a keyboard layout definition to a JSON file
+def save_layout(layout, layout_file):
+    f = open(layout_file, 'w')
+    json.dump(layout, f, indent=4, sort_keys=True)
+    f.write("\n")
+    f.close()
+
+# ------------------------------------------------------------------------------
+# Resample many filtered paths at once, matching GestureLexicon.resample_path
+def resample_paths(paths, resolution):
+    n = len(paths)
+    m = max([len(p) for p in paths] + [2])
+    points = np.zeros((n, m, 2))
+    counts = np.zeros(n, int)
+    for i in range(n):
+        if len(paths[i]) > 0:
+            points[i, :len(paths[i])] = paths[i]
+        counts[i] = len(paths[i])
+    return resample_points(points, counts, resolution)
+
+# ------------------------------------------------------------------------------
+# Resample zero-padded (paths, points, xy) arrays holding counts points each
+def resample_points(points, counts, resolution):
+
+    # Find the angle and cumulative length of every segment
+    n = points.shape[0]
+    m = points.shape[1]
+    seg = points[:, 1:] - points[:, :-1]
+    valid = np.arange(1, m)[np.newaxis, :] < counts[:, np.newaxis]
+    angles = np.arctan2(seg[:, :, 1], seg[:, :, 0])
+    angles = np.where(angles < 0, angles + 2 * math.pi, angles)
+    cum = np.cumsum(np.sqrt(np.sum(seg * seg, axis=2)) * valid, axis=1)
+    length = cum[:, -1]
+
+    # Take the angle of the first segment reaching each sample distance
+    vectors = np.zeros((n, resolution))
+    last = np.maximum(counts - 2, 0)
+    rows = np.arange(n)
+    targets = np.arange(1, resolution - 1)[np.newaxis, :] * \
+                (length / float(resolution - 1))[:, np.newaxis]
+    index = np.sum(cum[:, np.newaxis, :] < targets[:, :, np.newaxis], axis=2)
+    index = np.minimum(index, last[:, np.newaxis])
+    vectors[:, 1:resolution-1] = angles[rows[:, np.newaxis], index]
+    vectors[:, 0] = angles[:, 0]
+    vectors[:, resolution-1] = angles[rows, last]
+    vectors[length == 0] = 0
+    return vectors
+
+# ------------------------------------------------------------------------------
+# Get the fixed-point scale of int16 trajectories of a resolution. Points lie
+# within resolution - 1 unit steps of the origin.
+def get_int16_scale(resolution):
+    return INT16_RANGE // resolution
+
+# ------------------------------------------------------------------------------
+# Quantize (word, sample, xy) trajectories to int16 fixed point
+def quantize_trajectories(trajectories, quantization="int16"):
+    r = trajectories.shape[1]
+    return np.round(trajectories * get_int16_scale(r)).astype(np.int16)
+
+# ------------------------------------------------------------------------------
+# Get the float32 trajectories of quantized templates
+def dequantize_trajectories(codes, quantization="int16"):
+    return codes * np.float32(1.0 / get_int16_scale(codes.shape[1]))
+
+# ------------------------------------------------------------------------------
+# Find the distance between two points
+def distance(p1, p2):
+    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+
+# ------------------------------------------------------------------------------
+# Make radian angles positive
+def make_positive(theta):
+    while theta < 0:
+        theta = theta + 2 * math.pi
+    return theta
+
+# ------------------------------------------------------------------------------
+# Map positions within a slice or index array of lexicon rows to word indices
+def get_row_indices(rows, positions):
+    positions = np.asarray(positions, int)
+    if rows is None:
+        return positions
+    elif isinstance(rows, slice):
+        return positions + rows.start
+    return rows[positions]
+
+# ------------------------------------------------------------------------------
+# Get the lower and upper bounds of (word, sample, xy) trajectories over a
+# window of band samples either side of each sample
+def get_envelopes(trajectories, band):
+    lower = trajectories.copy()
+    upper = trajectories.copy()
+    for offset in range(1, band + 1):
+        np.minimum(lower[:, offset:], trajectories[:, :-offset],
+                   lower[:, offset:])
+        np.minimum(lower[:, :-offset], trajectories[:, offset:],
+                   lower[:, :-offset])
+        np.maximum(upper[:, offset:], trajectories[:, :-offset],
+                   upper[:, offset:])
+        np.maximum(upper[:, :-offset], trajectories[:, offset:],
+                   upper[:, :-offset])
+    return (lower, upper)
+
+# ------------------------------------------------------------------------------
+# Calculate the banded DTW distance from a (sample, xy) query trajectory to
+# each of a batch of (word, sample, xy) trajectories, with squared point
+# distances weighted per query sample
+def dtw_distances(query, batch, band, weights=None):
+    n = len(query)
+    diff = batch[:, np.newaxis, :, :] - query[np.newaxis, :, np.newaxis, :]
+    cost = np.sum(diff * diff, axis=3)    # (word, query sample, word sample)
+    if weights is not None:
+        cost = cost * np.asarray(weights)[np.newaxis, :, np.newaxis]
+    inf = np.full(len(batch), np.inf)
+    prev = [inf] * (n + 1)
+    prev[0] = np.zeros(len(batch))
+    for i in range(1, n + 1):
+        row = [inf] * (n + 1)
+        for j in range(max(1, i - band), min(n, i + band) + 1):
+            row[j] = cost[:, i-1, j-1] + np.minimum(np.minimum(prev[j-1],
+                                                   prev[j]), row[j-1])
+        prev = row
+    return prev[n]
+
+# ------------------------------------------------------------------------------
+# Get the indices of the n smallest values, smallest first
+def select_smallest(values, n):
+    n = min(n, len(values))
+    if n == 0:
+        return []
+    best = np.argpartition(values, n - 1)[:n]
+    return best[np.argsort(values[best], kind='mergesort')]
+
+# Finis
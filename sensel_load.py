@@ -0,0 +1,316 @@
+# ==============================================================================
+# SENSEL LOAD TEST
+#
+# Generates gestures for words in the keyboard zone, plays them to a simulated
+# Sensel as real frame packets, and reads them back through SenselDevice, the
+# device stream, and the emulator's contact handling and gesture dispatch.
+# Reports the sustained frame rate, frames dropped because the host read them
+# late, and recognition accuracy.
+# Linux and Mac only.
+#
+# Example: python sensel_load.py --frame-rate 125 --contacts 4 --gestures 100
+# ==============================================================================
+
+import argparse
+import math
+import random
+import time
+import numpy as np
+import sensel
+import sensel_contacts
+import sensel_devices
+import sensel_dispatch
+import sensel_lexicon
+import sensel_pointer
+import sensel_simulator
+import sensel_zones
+
+# === Gesture Generator ========================================================
+# Timed contact samples tracing the letters of words
+# ==============================================================================
+
+class GestureGenerator:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, lexicon, rect, frame_rate=125, seed=1):
+
+        # Define "magic number" parameters
+        self.scale = (0.35, 0.6)          # Range of mm per layout unit
+        self.rotation = 0.15              # Largest rotation either way (rad)
+        self.speed = (80.0, 300.0)        # Range of finger speeds (mm/s)
+        self.dwell = (0.0, 0.04)          # Range of pauses on letters (s)
+        self.noise = 0.5                  # Position noise (mm)
+        self.force = (200, 600)           # Range of base contact forces
+        self.letter_force = 1.8           # Force multiplier on letters
+        self.margin = 2.0                 # Distance kept from zone edges (mm)
+
+        # Define more variables
+        self.lexicon = lexicon            # Gives the letter coordinates
+        self.rect = rect                  # Zone (x0, x1, y0, y1) to draw in
+        self.frame_rate = frame_rate      # Samples per second
+        self.rng = random.Random(seed)
+
+    # --------------------------------------------------------------------------
+    # Trace a word as (x mm, y mm, force) samples, one per frame
+    def make_gesture(self, word):
+        rng = self.rng
+        keys = [self.lexicon.get_letter_coords(c) for c in word]
+        scale = rng.uniform(*self.scale)
+        angle = rng.uniform(-self.rotation, self.rotation)
+        (cos, sin) = (math.cos(angle), math.sin(angle))
+        keys = [((x * cos - y * sin) * scale, (x * sin + y * cos) * scale)
+                for (x, y) in keys]
+
+        # Place the gesture at random in the zone, shrinking it to fit
+        (x0, x1, y0, y1) = self.rect
+        xs = [x for (x, y) in keys]
+        ys = [y for (x, y) in keys]
+        width = max(max(xs) - min(xs), 1e-6)
+        height = max(max(ys) - min(ys), 1e-6)
+        fit = min(1.0, (x1 - x0 - 2 * self.margin) / width,
+                  (y1 - y0 - 2 * self.margin) / height)
+        dx = rng.uniform(x0 + self.margin, x1 - self.margin - width * fit)
+        dy = rng.uniform(y0 + self.margin, y1 - self.margin - height * fit)
+        keys = [((x - min(xs)) * fit + dx, (y - min(ys)) * fit + dy)
+                for (x, y) in keys]
+
+        # Move between letters at a steady speed, pausing on each
+        step = rng.uniform(*self.speed) / self.frame_rate
+        force = rng.uniform(*self.force)
+        points = []
+        for i in range(len(keys)):
+            dwell = int(round(rng.uniform(*self.dwell) * self.frame_rate))
+            for j in range(dwell + 1):
+                points.append((keys[i][0], keys[i][1],
+                               force * self.letter_force))
+            if i + 1 < len(keys):
+                d = sensel_lexicon.distance(keys[i], keys[i+1])
+                n = int(max(1, d / step))
+                for j in range(1, n):
+                    t = float(j) / n
+                    points.append((keys[i][0] + (keys[i+1][0]-keys[i][0]) * t,
+                                   keys[i][1] + (keys[i+1][1]-keys[i][1]) * t,
+                                   force))
+        if len(points) < 2:
+            points.append(points[-1])     # A contact starts and then ends
+        (x0, x1, y0, y1) = self.rect
+        return [(min(max(x + rng.gauss(0, self.noise), x0), x1),
+                 min(max(y + rng.gauss(0, self.noise), y0), y1),
+                 int(f * rng.uniform(0.9, 1.1))) for (x, y, f) in points]
+
+# === Load Test ================================================================
+# A generated session played through a simulated device
+# ==============================================================================
+
+class LoadTest:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, lexicon, frame_rate=125, contacts=1, gestures=100,
+                 num_workers=1, zone_file='overlay_zones.json', seed=1):
+
+        # Define "magic number" parameters
+        self.frame_rate = frame_rate      # Scan rate, None for as fast as read
+        self.contacts = contacts          # Fingers gesturing at once
+        self.gestures = gestures          # Gestures in the session
+        self.num_workers = num_workers    # Threads matching gestures
+        self.gap = (0.1, 0.4)             # Range of pauses between gestures (s)
+        self.chord_frames = 5             # Starts closer than this are chords
+        self.settle = 1.0                 # Quiet seconds before giving up on
+                                          # contacts whose end was dropped
+        self.use_leds = True              # Light LEDs each frame, as the
+                                          # emulator does
+
+        # Define more variables
+        self.lexicon = lexicon
+        self.zone_file = zone_file
+        self.seed = seed
+        self.frames = []                  # Frames of contacts to play
+        self.words = []                   # Word of each gesture, by unique id
+        self.paths = []                   # Path of each gesture, as traced
+        self.elapsed = 0                  # Seconds from first to last frame
+        self.frames_read = 0              # Frames the host read
+        self.frames_dropped = 0           # Frames the host read too late
+        self.submitted = 0                # Gestures sent for recognition
+        self.correct = 0                  # Of which matched first
+        self.in_options = 0               # Of which were among the options
+        self.latencies = []               # Gesture end to result (s)
+        self.reference = 0                # Gestures matched first offline
+
+    # --------------------------------------------------------------------------
+    # Generate the session: each finger draws words one after another, never
+    # starting within a chord of another finger
+    def generate(self):
+        zones = sensel_zones.load_zones(self.zone_file)
+        rect = [z["rect"] for z in zones if z["type_id"] == 1][0]
+        generator = GestureGenerator(self.lexicon, rect,
+                                     self.frame_rate or 125, self.seed)
+        rng = random.Random(self.seed)
+        words = [w for w in self.lexicon.words if len(w) > 1]
+        free = [i * self.chord_frames * 4 for i in range(self.contacts)]
+        starts = []
+        self.frames = []
+        self.words = []
+        self.paths = []
+        for uid in range(self.gestures):
+            finger = free.index(min(free))
+            start = free[finger]
+            while [s for s in starts if abs(s - start) <= self.chord_frames]:
+                start = start + 1
+            starts.append(start)
+            word = rng.choice(words)
+            samples = generator.make_gesture(word)
+            while len(self.frames) < start + len(samples):
+                self.frames.append([])
+            for i in range(len(samples)):
+                if i == 0:
+                    event = sensel.SENSEL_EVENT_CONTACT_START
+                elif i == len(samples) - 1:
+                    event = sensel.SENSEL_EVENT_CONTACT_END
+                else:
+                    event = sensel.SENSEL_EVENT_CONTACT_MOVE
+                (x, y, force) = samples[i]
+                self.frames[start + i].append((finger, event, x, y, force,
+                                               10, uid))
+            self.words.append(word)
+            self.paths.append([(x, y) for (x, y, f) in samples[:-1]])
+            free[finger] = start + len(samples) + \
+                    int(rng.uniform(*self.gap) * (self.frame_rate or 125))
+
+    # --------------------------------------------------------------------------
+    # Match the generated paths directly, for the accuracy without the device
+    # or any load
+    def match_offline(self):
+        self.reference = 0
+        for (word, path) in zip(self.words, self.paths):
+            (vector, options) = self.lexicon.recognize(path)
+            if self.lexicon.words[options[0][0]] == word:
+                self.reference = self.reference + 1
+
+    # --------------------------------------------------------------------------
+    # Generate a session and play it
+    def run(self):
+        self.generate()
+        self.match_offline()
+        self.play()
+
+    # --------------------------------------------------------------------------
+    # Play the generated session and read it back, handling contacts as the
+    # emulator does
+    def play(self):
+        self.correct = 0
+        self.in_options = 0
+        self.latencies = []
+        sim = sensel_simulator.SimulatedSensel(frame_rate=self.frame_rate)
+        sim.drop_late = True
+        for frame in self.frames:
+            sim.add_frame(frame)
+        sim.start()
+        device = sensel.SenselDevice()
+        if not device.openConnection(sim.port_name):
+            sim.stop()
+            raise IOError("Could not open simulated device")
+        device.setFrameContentControl(sensel.SENSEL_FRAME_CONTACTS_FLAG)
+        device.startScanning()
+        zone_map = sensel_zones.ZoneMap(sensel_zones.load_zones(self.zone_file),
+                                        sim.width_mm, sim.height_mm)
+        dispatcher = sensel_dispatch.GestureDispatcher(self.lexicon,
+                                                       self.num_workers)
+        pointer = sensel_pointer.PointerPipeline(
+                sensel_pointer.RecordingBackend())
+        handler = sensel_contacts.ContactHandler(zone_map,
+                device.getMaxContacts(), 1, dispatcher, pointer, None,
+                sim.width_mm)
+        handler.chord_frames = self.chord_frames
+        submitted = []                    # (Unique id, end time) by sequence
+        handler.on_submit = lambda c: submitted.append((c.uid, t))
+        stream = sensel_devices.DeviceStream([device],
+                                             self.frame_rate is not None)
+        first = None
+        last = time.time()
+        stream.start()
+        while True:
+
+            # Score the gestures matched so far
+            for (vector, options, path) in dispatcher.poll():
+                (uid, end) = submitted[len(self.latencies)]
+                self.score(uid, options, end)
+
+            # Stop once all frames are played and matched, waiting a while
+            # for contacts whose end frames were dropped
+            event = stream.get(0.01)
+            if event is None:
+                if not sim.pending() and not dispatcher.pending() and \
+                        (not handler.count_active() or
+                         time.time() - last > self.settle):
+                    break
+                continue
+            (t, device_index, contacts) = event
+            if first is None:
+                first = t
+            last = t
+
+            # Trace and match contacts as the emulator does
+            led_array = handler.handle_frame(t, device_index, contacts)
+            if self.use_leds:
+                device.setLEDBrightnessArr(led_array)
+
+        self.elapsed = last - (first or last)
+        self.frames_read = stream.frames[0]
+        self.frames_dropped = sim.frames_dropped
+        self.submitted = len(submitted)
+        stream.stop()
+        dispatcher.stop()
+        device.stopScanning()
+        device.closeConnection()
+        sim.stop()
+
+    # --------------------------------------------------------------------------
+    # Score the options matched for a gesture
+    def score(self, uid, options, end):
+        self.latencies.append(time.time() - end)
+        words = [self.lexicon.words[i] for (i, e) in options]
+        if words and words[0] == self.words[uid]:
+            self.correct = self.correct + 1
+        if self.words[uid] in words:
+            self.in_options = self.in_options + 1
+
+    # --------------------------------------------------------------------------
+    # Summarize the results on one line
+    def report(self):
+        played = len(self.frames)
+        scored = max(len(self.latencies), 1)
+        return ("%5.1f frames/s, %d of %d frames dropped, %d of %d gestures "
+                "matched, top-1 %5.1f%% (%5.1f%% offline), top-%d %5.1f%%, "
+                "%6.1f ms to match (95th %6.1f ms)" %
+                (self.frames_read / max(self.elapsed, 1e-6),
+                 self.frames_dropped, played, len(self.latencies),
+                 self.gestures, 100.0 * self.correct / scored,
+                 100.0 * self.reference / max(self.gestures, 1),
+                 self.lexicon.num_options, 100.0 * self.in_options / scored,
+                 1000 * np.mean(self.latencies or [0]),
+                 1000 * np.percentile(self.latencies or [0], 95)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=
+            "Play generated gestures through a simulated Sensel")
+    parser.add_argument("--frame-rate", type=int, default=125,
+                        help="scan rate up to 255, 0 for as fast as read")
+    parser.add_argument("--contacts", type=int, default=1,
+                        help="fingers gesturing at once")
+    parser.add_argument("--gestures", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--words", default="words.txt")
+    parser.add_argument("--matcher", default="serror")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    lexicon = sensel_lexicon.GestureLexicon(args.words)
+    lexicon.set_matcher(args.matcher)
+    test = LoadTest(lexicon, args.frame_rate or None, args.contacts,
+                    args.gestures, args.workers, seed=args.seed)
+    test.run()
+    print(test.report())
+
+# Finis
@@ -0,0 +1,310 @@
+# ==============================================================================
+# SENSEL PERFORMANCE SUITE
+#
+# Times the recognition and serial protocol hot paths, from single calls up to
+# a replayed session through a simulated device, and saves the results as
+# JSON. Each benchmark is set up only when it runs, warmed up, then timed over
+# repeated batches of enough calls to outlast the timer resolution. The
+# percentiles are of the batch means (the time per call of each batch), as the
+# fastest calls cannot be timed one by one; slow benchmarks use batches of one
+# call. Two result files can be compared to flag regressions.
+# Runs headless; the session replay needs Linux or Mac.
+#
+# Example: python sensel_perf.py run --output before.json
+#          python sensel_perf.py run --output after.json
+#          python sensel_perf.py compare before.json after.json
+# ==============================================================================
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import timeit
+import numpy as np
+import sensel
+import sensel_benchmark
+import sensel_lexicon
+import sensel_load
+import sensel_simulator
+
+PERCENTILES = (50, 90, 99)
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TIMING ROUTINES
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# ------------------------------------------------------------------------------
+# Time a number of calls with the garbage collector off, as timeit does
+def time_calls(function, number):
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = timeit.default_timer()
+        for i in range(number):
+            function()
+        return timeit.default_timer() - start
+    finally:
+        if enabled:
+            gc.enable()
+
+# ------------------------------------------------------------------------------
+# Time a function: warm it up, find a call count whose run takes at least
+# min_time, then time repeated batches of that many calls. Returns statistics
+# of the batch means, the time per call of each batch, in microseconds.
+def measure(function, repeat=30, warmup=3, min_time=0.02, number=None):
+    for i in range(warmup):
+        function()
+    if number is None:
+        number = 1
+        while time_calls(function, number) < min_time:
+            number = number * 2
+    times = np.array([time_calls(function, number) / number
+                      for i in range(repeat)]) * 1e6
+    stats = {
+        "number": number,
+        "repeat": repeat,
+        "min": float(times.min()),
+        "max": float(times.max()),
+        "mean": float(times.mean()),
+        "stdev": float(times.std()),
+    }
+    for p in PERCENTILES:
+        stats["batch_p%d" % p] = float(np.percentile(times, p))
+    return stats
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# BENCHMARKS
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# === Benchmark Suite ==========================================================
+# Benchmarks by name, each set up only when it is run
+# ==============================================================================
+
+class BenchmarkSuite:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, word_file='words.txt', resolution=16):
+        slow = {"repeat": 5, "warmup": 1, "number": 1} # A call at a time
+        self.word_file = word_file
+        self.resolution = resolution      # Segments of gesture vectors
+        self.lexicon = None               # Loaded by the first benchmark
+        self.device = None                # that needs it
+        self.benchmarks = [               # (name, setup, measure options)
+            ("startup.init_word_vectors", self.make_init_word_vectors, slow),
+            ("lexicon.process_word", self.make_process_word, {}),
+            ("lexicon.serror", self.make_serror, {}),
+            ("lexicon.get_closest_word", self.make_get_closest_word, {}),
+            ("lexicon.recognize", self.make_recognize, {}),
+            ("protocol.SenselContact", self.make_contact, {}),
+            ("protocol._parseFrameData.1",
+             lambda: self.make_parse_frame(1), {}),
+            ("protocol._parseFrameData.16",
+             lambda: self.make_parse_frame(16), {}),
+            ("protocol._verifyChecksum", self.make_verify_checksum, {}),
+            ("protocol._convertBufToVal", self.make_convert_buf, {}),
+            ("session.replay", self.make_session_replay, slow),
+        ]
+
+    # --------------------------------------------------------------------------
+    # Load the lexicon with a generated gesture, its vector and the template
+    # of its word
+    def load_lexicon(self):
+        if self.lexicon is not None:
+            return
+        self.lexicon = sensel_lexicon.GestureLexicon(self.word_file)
+        rng = random.Random(1)
+        word = [w for w in self.lexicon.words if len(w) >= 6][0]
+        self.path = sensel_benchmark.make_gesture(self.lexicon, word, rng)
+        self.vector = self.lexicon.process_word(self.path, self.resolution)
+        self.template = self.lexicon.get_word_vector(
+                self.lexicon.get_word_index(word), self.resolution)
+
+    # --------------------------------------------------------------------------
+    # Make a device that decodes without a connection
+    def load_device(self):
+        if self.device is None:
+            self.device = sensel.SenselDevice()
+            self.device.sensor_x_to_mm_factor = 230.0 / (256 * 184)
+            self.device.sensor_y_to_mm_factor = 130.0 / (256 * 104)
+
+    # --------------------------------------------------------------------------
+    # Build a contacts frame as the device sends it
+    def make_frame(self, count):
+        frame = bytearray([sensel.SENSEL_FRAME_CONTACTS_FLAG, 0, count])
+        for k in range(count):
+            frame += sensel_simulator.pack_contact(k, 2, 1000 * k, 5000,
+                                                   100 + k, 10)
+        return bytes(frame)
+
+    # --------------------------------------------------------------------------
+    # Load the word list from scratch
+    def make_init_word_vectors(self):
+        return lambda: sensel_lexicon.GestureLexicon(self.word_file)
+
+    # --------------------------------------------------------------------------
+    # Resample the gesture into a vector
+    def make_process_word(self):
+        self.load_lexicon()
+        return lambda: self.lexicon.process_word(self.path, self.resolution)
+
+    # --------------------------------------------------------------------------
+    # Compare the gesture vector with one template
+    def make_serror(self):
+        self.load_lexicon()
+        return lambda: self.lexicon.serror(self.vector, self.template)
+
+    # --------------------------------------------------------------------------
+    # Match the gesture vector against every word
+    def make_get_closest_word(self):
+        self.load_lexicon()
+        return lambda: self.lexicon.get_closest_word(self.vector)
+
+    # --------------------------------------------------------------------------
+    # Recognize the gesture from its raw path
+    def make_recognize(self):
+        self.load_lexicon()
+        return lambda: self.lexicon.recognize(self.path)
+
+    # --------------------------------------------------------------------------
+    # Decode one packed contact
+    def make_contact(self):
+        self.load_device()
+        contact = bytes(sensel_simulator.pack_contact(3, 2, 20000, 10000, 500,
+                                                      40, 7))
+        return lambda: sensel.SenselContact(contact,
+                                            self.device.sensor_x_to_mm_factor,
+                                            self.device.sensor_y_to_mm_factor)
+
+    # --------------------------------------------------------------------------
+    # Decode a frame of a number of contacts
+    def make_parse_frame(self, count):
+        self.load_device()
+        frame = self.make_frame(count)
+        return lambda: self.device._parseFrameData(frame)
+
+    # --------------------------------------------------------------------------
+    # Check the checksum of a 16 contact frame
+    def make_verify_checksum(self):
+        self.load_device()
+        frame = self.make_frame(16)
+        checksum = sum(bytearray(frame)) & 0xFF
+        return lambda: self.device._verifyChecksum(frame, checksum)
+
+    # --------------------------------------------------------------------------
+    # Convert a 4-byte register value
+    def make_convert_buf(self):
+        buf = bytes(bytearray([0x12, 0x34, 0x56, 0x78]))
+        return lambda: sensel._convertBufToVal(buf)
+
+    # --------------------------------------------------------------------------
+    # Read a generated session back as fast as possible, end to end
+    def make_session_replay(self):
+        self.load_lexicon()
+        session = sensel_load.LoadTest(self.lexicon, None, 2, 16)
+        session.generate()
+        return session.play
+
+# ------------------------------------------------------------------------------
+# Run the benchmarks whose names contain the filter and collect the results
+def run_benchmarks(word_file='words.txt', name_filter=None, repeat=None):
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "benchmarks": {},
+    }
+    suite = BenchmarkSuite(word_file)
+    for (name, setup, options) in suite.benchmarks:
+        if name_filter and name_filter not in name:
+            continue
+        function = setup()
+        options = dict(options)
+        if repeat is not None:
+            options["repeat"] = repeat
+        stats = measure(function, **options)
+        results["benchmarks"][name] = stats
+        print("  %-30s batch mean p50 %10.2f us  p90 %10.2f us  "
+              "p99 %10.2f us  (%d batches of %d)" %
+              (name, stats["batch_p50"], stats["batch_p90"],
+               stats["batch_p99"], stats["repeat"], stats["number"]))
+    return results
+
+# ------------------------------------------------------------------------------
+# Compare two result files on one statistic, flagging benchmarks slower by
+# more than the threshold. Returns the names of the regressions.
+def compare_results(base, new, statistic="batch_p50", threshold=0.1):
+    regressions = []
+    print("  %-30s %11s %11s  %7s" % ("benchmark (us, %s)" % statistic,
+                                      "base", "new", "change"))
+    for name in sorted(set(base["benchmarks"]) | set(new["benchmarks"])):
+        if name not in base["benchmarks"] or name not in new["benchmarks"]:
+            print("  %-30s only in %s" % (name, "new" if name not in
+                                          base["benchmarks"] else "base"))
+            continue
+        before = base["benchmarks"][name][statistic]
+        after = new["benchmarks"][name][statistic]
+        change = after / before - 1 if before > 0 else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "improved"
+        print(("  %-30s %11.2f %11.2f  %+6.1f%%  %s" %
+               (name, before, after, 100 * change, flag)).rstrip())
+    return regressions
+
+# ------------------------------------------------------------------------------
+# Load a result file
+def load_results(result_file):
+    f = open(result_file, 'r')
+    results = json.load(f)
+    f.close()
+    return results
+
+# ------------------------------------------------------------------------------
+# Save a result file
+def save_results(results, result_file):
+    f = open(result_file, 'w')
+    json.dump(results, f, indent=2, sort_keys=True)
+    f.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=
+            "Time the recognition and protocol hot paths")
+    commands = parser.add_subparsers(dest="command")
+    run = commands.add_parser("run", help="run the benchmarks")
+    run.add_argument("--output", help="JSON file to save the results to")
+    run.add_argument("--filter", help="run benchmarks whose names contain this")
+    run.add_argument("--repeat", type=int, help="timed runs per benchmark")
+    run.add_argument("--words", default="words.txt")
+    compare = commands.add_parser("compare",
+                                  help="flag regressions between two runs")
+    compare.add_argument("base")
+    compare.add_argument("new")
+    compare.add_argument("--statistic", default="batch_p50",
+                         help="statistic to compare, e.g. batch_p50, "
+                         "batch_p90 or min")
+    compare.add_argument("--threshold", type=float, default=0.1,
+                         help="fraction slower that counts as a regression")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        regressions = compare_results(load_results(args.base),
+                                      load_results(args.new),
+                                      args.statistic, args.threshold)
+        if regressions:
+            print("Regressed: %s" % ", ".join(regressions))
+            sys.exit(1)
+    elif args.command == "run":
+        results = run_benchmarks(args.words, args.filter, args.repeat)
+        if args.output:
+            save_results(results, args.output)
+    else:
+        parser.print_help()
+
+# Finis
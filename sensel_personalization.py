@@ -0,0 +1,136 @@
+# ==============================================================================
+# SENSEL GESTURE PERSONALIZATION
+#
+# Blends the gestures of accepted words into the lexicon's word templates so
+# that recognition adapts to the way a user actually draws each word. Updates
+# are appended to a log, which is compacted from time to time and replayed at
+# startup.
+# ==============================================================================
+
+import os
+import numpy as np
+
+# === Personal Templates =======================================================
+# In-place template adaptation with an append-only log
+# ==============================================================================
+
+class PersonalTemplates:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, lexicon, log_file='personal_templates.log'):
+
+        # Define "magic number" parameters
+        self.rate = 0.2                   # Share of a gesture blended in
+        self.compact_every = 500          # Log entries between compactions
+
+        # Define more variables
+        self.lexicon = lexicon            # Lexicon whose templates adapt
+        self.log_file = log_file          # Append-only log of updates
+        self.adapted = set()              # Indices of adapted words
+        self.log_entries = 0              # Entries in the log file
+        self.compacted_entries = 0        # Entries left by the last compaction
+
+        self.load()
+
+    # --------------------------------------------------------------------------
+    # Replay the log into the lexicon, first finishing a compaction that was
+    # stopped between removing the old log and renaming the new one
+    def load(self):
+        if self.log_file is None:
+            return
+        temp_file = self.log_file + ".tmp"
+        if not os.path.exists(self.log_file) and os.path.exists(temp_file):
+            os.rename(temp_file, self.log_file)
+        if not os.path.exists(self.log_file):
+            return
+        f = open(self.log_file, 'r')
+        for line in f:
+            fields = line.split()
+            if len(fields) != 4 or fields[0] not in ("add", "set"):
+                continue                  # Skip a partly written last line
+            index = self.lexicon.get_word_index(fields[1])
+            try:
+                resolution = int(fields[2])
+                points = np.array([float(v) for v in fields[3].split(",")])
+            except ValueError:
+                continue
+            if index is None or resolution not in self.lexicon.resolutions \
+                    or len(points) != 2 * resolution:
+                continue
+            self.update(index, resolution, points.reshape(resolution, 2),
+                        fields[0] == "set")
+            self.log_entries = self.log_entries + 1
+        f.close()
+
+    # --------------------------------------------------------------------------
+    # Blend the gesture of an accepted word into its templates
+    def accept(self, index, coords):
+        path = self.lexicon.filter_path(coords)
+        lines = []
+        for r in self.lexicon.resolutions:
+            points = self.lexicon.get_trajectories(
+                    self.lexicon.resample_path(path, r))
+            self.update(index, r, points, False)
+            lines.append(format_entry("add", self.lexicon.words[index],
+                                      r, points))
+        self.append(lines)
+
+    # --------------------------------------------------------------------------
+    # Update the template of a word at one resolution, in place
+    def update(self, index, resolution, points, replace):
+        if not replace:
+            template = self.lexicon.get_template(resolution, index)
+            points = template + self.rate * (points - template)
+        self.lexicon.set_template(resolution, index, points)
+        self.adapted.add(index)
+
+    # --------------------------------------------------------------------------
+    # Append entries to the log, compacting it when it grows long
+    def append(self, lines):
+        if self.log_file is None:
+            return
+        f = open(self.log_file, 'a')
+        f.write("".join(lines))
+        f.close()
+        self.log_entries = self.log_entries + len(lines)
+        if self.log_entries - self.compacted_entries >= self.compact_every * \
+                max(1, len(self.lexicon.resolutions)):
+            self.compact()
+
+    # --------------------------------------------------------------------------
+    # Rewrite the log as one entry per adapted template. The new log is
+    # written in full before the old one goes, and load() picks it up if the
+    # program stops before it is renamed.
+    def compact(self):
+        lines = []
+        for index in sorted(self.adapted):
+            for r in self.lexicon.resolutions:
+                lines.append(format_entry("set", self.lexicon.words[index], r,
+                                    self.lexicon.get_template(r, index)))
+        temp_file = self.log_file + ".tmp"
+        f = open(temp_file, 'w')
+        f.write("".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        if hasattr(os, "replace"):
+            os.replace(temp_file, self.log_file) # Atomic, also on Windows
+        else:
+            if os.path.exists(self.log_file):
+                os.remove(self.log_file)  # Windows cannot rename over a file
+            os.rename(temp_file, self.log_file)
+        self.log_entries = len(lines)
+        self.compacted_entries = len(lines)
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# UTILITY ROUTINES
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# ------------------------------------------------------------------------------
+# Format a log entry for a (sample, xy) trajectory
+def format_entry(kind, word, resolution, points):
+    values = ",".join(["%.4f" % v for v in np.ravel(points)])
+    return "%s %s %d %s\n" % (kind, word, resolution, values)
+
+# Finis
@@ -0,0 +1,173 @@
+# ==============================================================================
+# SENSEL POINTER PIPELINE
+#
+# Turns trackpad contact motion into cursor moves. Each contact is smoothed by
+# a One Euro filter, which follows fast motion closely and damps jitter when
+# the finger is nearly still. Motion is scaled by an acceleration curve,
+# summed with its sub-pixel remainder, and sent as at most one cursor move per
+# frame to a backend.
+# ==============================================================================
+
+import math
+
+# === One Euro Filter ==========================================================
+# Low-pass filter whose cutoff rises with speed
+# ==============================================================================
+
+class OneEuroFilter:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff      # Cutoff when still (Hz)
+        self.beta = beta                  # Cutoff increase per mm/s of speed
+        self.d_cutoff = d_cutoff          # Cutoff of the speed estimate (Hz)
+        self.value = None                 # Filtered value
+        self.speed = 0.0                  # Filtered speed (units/s)
+        self.time = 0.0                   # Time of the last sample (s)
+
+    # --------------------------------------------------------------------------
+    # Filter a sample taken at time t
+    def filter(self, value, t):
+        if self.value is None:
+            self.value = value
+            self.time = t
+            return value
+        dt = t - self.time
+        if dt <= 0:
+            return self.value
+        speed = (value - self.value) / dt
+        self.speed = self.speed + smoothing(self.d_cutoff, dt) * \
+                (speed - self.speed)
+        cutoff = self.min_cutoff + self.beta * abs(self.speed)
+        self.value = self.value + smoothing(cutoff, dt) * (value - self.value)
+        self.time = t
+        return self.value
+
+# === Pointer Pipeline =========================================================
+# Filtered, accelerated trackpad motion, coalesced per frame
+# ==============================================================================
+
+class PointerPipeline:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, backend, acceleration=((0, 5.0), (50, 5.0),
+                                              (300, 15.0)),
+                 min_cutoff=1.0, beta=0.05, max_step=30.0):
+
+        # Define "magic number" parameters
+        self.acceleration = acceleration  # (mm/s, pixels per mm) curve points
+        self.min_cutoff = min_cutoff      # Filter cutoff when still (Hz)
+        self.beta = beta                  # Filter cutoff increase per mm/s
+        self.max_step = max_step          # Longer jumps are glitches (mm)
+
+        # Define more variables
+        self.backend = backend            # Moves the cursor
+        self.contacts = {}                # Id -> (x filter, y filter, x, y)
+        self.pending = [0.0, 0.0]         # Motion not yet sent (pixels)
+        self.updates = 0                  # Cursor moves sent so far
+
+    # --------------------------------------------------------------------------
+    # Start following a contact
+    def start(self, contact_id, x, y, t):
+        fx = OneEuroFilter(self.min_cutoff, self.beta)
+        fy = OneEuroFilter(self.min_cutoff, self.beta)
+        self.contacts[contact_id] = (fx, fy, fx.filter(x, t), fy.filter(y, t))
+
+    # --------------------------------------------------------------------------
+    # Add the motion of a contact to the pending cursor move
+    def move(self, contact_id, x, y, t):
+        if contact_id not in self.contacts:
+            self.start(contact_id, x, y, t)
+            return
+        (fx, fy, px, py) = self.contacts[contact_id]
+        if abs(x - px) > self.max_step or abs(y - py) > self.max_step:
+            self.start(contact_id, x, y, t) # Follow from the new position
+            return
+        dt = t - fx.time
+        x = fx.filter(x, t)
+        y = fy.filter(y, t)
+        (dx, dy) = (x - px, y - py)
+        if dt > 0:
+            gain = self.get_gain(math.sqrt(dx * dx + dy * dy) / dt)
+            self.pending[0] = self.pending[0] + dx * gain
+            self.pending[1] = self.pending[1] + dy * gain
+        self.contacts[contact_id] = (fx, fy, x, y)
+
+    # --------------------------------------------------------------------------
+    # Stop following a contact
+    def end(self, contact_id):
+        self.contacts.pop(contact_id, None)
+
+    # --------------------------------------------------------------------------
+    # Send the whole pixels of the pending motion as one cursor move, keeping
+    # the fractions for the next frame
+    def flush(self):
+        dx = int(self.pending[0])         # Truncate towards zero
+        dy = int(self.pending[1])
+        if dx == 0 and dy == 0:
+            return
+        self.pending[0] = self.pending[0] - dx
+        self.pending[1] = self.pending[1] - dy
+        self.backend.move_by(dx, dy)
+        self.updates = self.updates + 1
+
+    # --------------------------------------------------------------------------
+    # Get the pixels per mm at a speed from the acceleration curve
+    def get_gain(self, speed):
+        points = self.acceleration
+        if speed <= points[0][0]:
+            return points[0][1]
+        for i in range(1, len(points)):
+            if speed < points[i][0]:
+                (s0, g0) = points[i-1]
+                (s1, g1) = points[i]
+                return g0 + (g1 - g0) * (speed - s0) / float(s1 - s0)
+        return points[-1][1]
+
+# === Cursor Backends ==========================================================
+# Objects with a move_by(dx, dy) method in pixels
+# ==============================================================================
+
+class Win32CursorBackend:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self):
+        import win32api                   # Windows only
+        self.win32api = win32api
+
+    # --------------------------------------------------------------------------
+    # Move the cursor relative to its position
+    def move_by(self, dx, dy):
+        (x, y) = self.win32api.GetCursorPos()
+        self.win32api.SetCursorPos((x + dx, y + dy))
+
+class RecordingBackend:
+    # Keeps a virtual cursor, for running without a display
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self):
+        self.position = [0, 0]            # Cursor position (pixels)
+        self.moves = 0                    # Moves made so far
+
+    # --------------------------------------------------------------------------
+    # Move the recorded cursor relative to its position
+    def move_by(self, dx, dy):
+        self.position[0] = self.position[0] + dx
+        self.position[1] = self.position[1] + dy
+        self.moves = self.moves + 1
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# UTILITY ROUTINES
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# ------------------------------------------------------------------------------
+# Get the exponential smoothing factor of a cutoff frequency over a time step
+def smoothing(cutoff, dt):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+# Finis
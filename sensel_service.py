@@ -0,0 +1,407 @@
+# ==============================================================================
+# SENSEL RECOGNITION SERVICE
+#
+# Serves gesture recognition from one warm lexicon over a localhost TCP socket,
+# or a Unix domain socket on Linux and Mac, so that several front ends can
+# share it. Requests that arrive close together are scored as one batch.
+#
+# Messages are a 4-byte length followed by a little-endian body:
+#   request:  type, id, resolution, gesture scale, point count, key point
+#             count, (x, y) points, key point fractions
+#   response: type, id, resolution, option count, vector, (index, error)
+#   words:    type, id, newline separated words
+#
+# Example: python sensel_service.py --port 47800
+#          python sensel_service.py --socket /tmp/sensel_recognition.sock
+# ==============================================================================
+
+import sys
+PY3 = sys.version > '3'
+
+import argparse
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import numpy as np
+import sensel_lexicon
+if PY3:
+    import queue
+else:
+    import Queue as queue
+
+MSG_RECOGNIZE = 1
+MSG_WORDS = 2
+DEFAULT_ADDRESS = ("127.0.0.1", 47800)
+REQUEST_HEADER = struct.Struct('<BIBfHB')
+RESPONSE_HEADER = struct.Struct('<BIBB')
+WORDS_HEADER = struct.Struct('<BI')
+LENGTH = struct.Struct('<I')
+
+# === Recognition Server =======================================================
+# Connection threads feeding one batching scorer thread
+# ==============================================================================
+
+class RecognitionServer:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, lexicon, address=DEFAULT_ADDRESS, batch_window=0.0,
+                 max_batch=64):
+
+        # Define "magic number" parameters
+        self.batch_window = batch_window  # Seconds to wait for more requests,
+                                          # 0 to take those already queued
+        self.max_batch = max_batch        # Requests scored together at most
+
+        # Define more variables
+        self.lexicon = lexicon            # Warm lexicon shared by all clients
+        self.address = address            # (host, port) or Unix socket path
+        self.requests = queue.Queue()     # (connection, lock, id, gesture)
+        self.running = False
+        self.batches = 0                  # Batches scored so far
+        self.requests_scored = 0          # Requests scored so far
+        self.errors = 0                   # Requests refused or failed
+        self.words = "\n".join(lexicon.words).encode('ascii')
+        self.listener = None
+        self.threads = []
+
+    # --------------------------------------------------------------------------
+    # Listen on the socket and start scoring. A port of 0 picks a free one,
+    # which is kept in address.
+    def start(self):
+        self.listener = make_socket(self.address)
+        if is_tcp(self.address):
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        elif os.path.exists(self.address):
+            os.remove(self.address)       # Left over by a stopped server
+        self.listener.bind(self.address)
+        self.listener.listen(16)
+        if is_tcp(self.address):
+            self.address = self.listener.getsockname()[:2]
+        self.running = True
+        for target in (self.accept, self.score):
+            thread = threading.Thread(target=target)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    # --------------------------------------------------------------------------
+    # Stop listening and scoring
+    def stop(self):
+        self.running = False
+        self.requests.put(None)
+        try:
+            connection = make_socket(self.address)
+            connection.connect(self.address) # Wake the accept thread
+            connection.close()
+        except socket.error:
+            pass
+        for thread in self.threads:
+            thread.join()
+        self.listener.close()
+        if not is_tcp(self.address) and os.path.exists(self.address):
+            os.remove(self.address)
+
+    # --------------------------------------------------------------------------
+    # Accept clients, each read on its own thread
+    def accept(self):
+        while self.running:
+            (connection, address) = self.listener.accept()
+            if not self.running:
+                connection.close()
+                return
+            if is_tcp(self.address):      # Send small answers at once
+                connection.setsockopt(socket.IPPROTO_TCP,
+                                      socket.TCP_NODELAY, 1)
+            thread = threading.Thread(target=self.read, args=(connection,))
+            thread.daemon = True
+            thread.start()
+
+    # --------------------------------------------------------------------------
+    # Queue the requests of a client until it disconnects
+    def read(self, connection):
+        lock = threading.Lock()           # Guards writes to the connection
+        while self.running:
+            message = read_message(connection)
+            if message is None:
+                connection.close()
+                return
+            if message[0] == MSG_WORDS:
+                (t, request_id) = WORDS_HEADER.unpack_from(message)
+                lock.acquire()
+                write_message(connection, WORDS_HEADER.pack(MSG_WORDS,
+                                                    request_id) + self.words)
+                lock.release()
+            elif message[0] == MSG_RECOGNIZE:
+                try:
+                    (request_id, gesture) = unpack_request(message)
+                except (struct.error, ValueError):
+                    connection.close()    # Not speaking our protocol
+                    return
+                if gesture[1] is not None and \
+                        gesture[1] not in self.lexicon.resolutions:
+                    logging.warning("Refused request at resolution %d" %
+                                    gesture[1])
+                    self.answer(connection, lock, request_id, ([], []))
+                    self.errors = self.errors + 1
+                    continue
+                self.requests.put((connection, lock, request_id, gesture))
+
+    # --------------------------------------------------------------------------
+    # Score queued requests in batches, waiting briefly after the first of a
+    # batch for others to arrive
+    def score(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                try:
+                    request = self.requests.get(
+                            timeout=max(deadline - time.time(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.requests.put(None) # Stop after this batch
+                    break
+                batch.append(request)
+            try:
+                results = self.lexicon.recognize_batch([r[3] for r in batch])
+            except Exception as e:
+                logging.warning("Batch of %d requests failed: %s" %
+                                (len(batch), e))
+                results = [self.recognize(r[3]) for r in batch]
+            self.batches = self.batches + 1
+            self.requests_scored = self.requests_scored + len(batch)
+            for ((connection, lock, request_id, gesture), result) \
+                    in zip(batch, results):
+                self.answer(connection, lock, request_id, result)
+
+    # --------------------------------------------------------------------------
+    # Recognize one gesture of a failed batch, giving no vector and no options
+    # if it fails on its own too
+    def recognize(self, gesture):
+        try:
+            return self.lexicon.recognize_batch([gesture])[0]
+        except Exception as e:
+            logging.warning("Request failed: %s" % e)
+            self.errors = self.errors + 1
+            return ([], [])
+
+    # --------------------------------------------------------------------------
+    # Send the (vector, options) result of a request to its client
+    def answer(self, connection, lock, request_id, result):
+        lock.acquire()
+        try:
+            write_message(connection, pack_response(request_id, *result))
+        except socket.error:
+            pass                          # The client went away
+        lock.release()
+
+# === Recognition Client =======================================================
+# Recognizes gestures through a server, with several requests in flight
+# ==============================================================================
+
+class RecognitionClient:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, address=DEFAULT_ADDRESS, gesture_scale=None):
+        self.gesture_scale = gesture_scale # Layout units per mm, or None
+        self.connection = make_socket(address)
+        self.connection.connect(address)
+        self.lock = threading.Lock()      # Guards the fields below and writes
+        self.done = threading.Condition(self.lock)
+        self.next_id = 0                  # Id of the next request
+        self.results = {}                 # Id -> result message
+        self.closed = False
+        self.receiver = threading.Thread(target=self.receive)
+        self.receiver.daemon = True
+        self.receiver.start()
+        self.words = self.request(WORDS_HEADER.pack(MSG_WORDS, 0))
+        self.words = self.words[WORDS_HEADER.size:].decode('ascii').split("\n")
+
+    # --------------------------------------------------------------------------
+    # Recognize a gesture, as GestureLexicon.recognize does
+    def recognize(self, coords, resolution=None, key_fractions=None):
+        message = self.request(pack_request(0, coords, resolution,
+                                            key_fractions, self.gesture_scale))
+        return unpack_response(message)[1:]
+
+    # --------------------------------------------------------------------------
+    # Send a message under a new id, which follows the type byte of every
+    # message, and wait for the answer to it
+    def request(self, message):
+        self.lock.acquire()
+        try:
+            request_id = self.next_id
+            self.next_id = request_id + 1
+            write_message(self.connection, message[:1] +
+                          struct.pack('<I', request_id) + message[5:])
+            while request_id not in self.results and not self.closed:
+                self.done.wait()
+            if self.closed:
+                raise socket.error("Recognition server disconnected")
+            return self.results.pop(request_id)
+        finally:
+            self.lock.release()
+
+    # --------------------------------------------------------------------------
+    # Hand answers to the threads waiting for them
+    def receive(self):
+        while True:
+            message = read_message(self.connection)
+            self.lock.acquire()
+            if message is None:
+                self.closed = True
+            else:
+                self.results[struct.unpack_from('<I', message, 1)[0]] = message
+            self.done.notify_all()
+            self.lock.release()
+            if message is None:
+                return
+
+    # --------------------------------------------------------------------------
+    # Disconnect from the server
+    def close(self):
+        self.connection.shutdown(socket.SHUT_RDWR)
+        self.connection.close()
+        self.receiver.join()
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# PROTOCOL ROUTINES
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# ------------------------------------------------------------------------------
+# Tell whether an address is a (host, port) pair rather than a socket path
+def is_tcp(address):
+    return isinstance(address, tuple)
+
+# ------------------------------------------------------------------------------
+# Make a stream socket for an address. Unix sockets are missing on Windows.
+def make_socket(address):
+    if is_tcp(address):
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+    if not hasattr(socket, "AF_UNIX"):
+        raise socket.error("Unix sockets are not available here, "
+                           "use a localhost port")
+    return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+# ------------------------------------------------------------------------------
+# Send a message with its length
+def write_message(connection, body):
+    connection.sendall(LENGTH.pack(len(body)) + body)
+
+# ------------------------------------------------------------------------------
+# Receive a message, or None once the connection closes
+def read_message(connection):
+    header = read_exactly(connection, LENGTH.size)
+    if header is None:
+        return None
+    return read_exactly(connection, LENGTH.unpack(header)[0])
+
+# ------------------------------------------------------------------------------
+# Receive a number of bytes, or None once the connection closes
+def read_exactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        try:
+            chunk = connection.recv(size - len(data))
+        except socket.error:
+            return None
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+# ------------------------------------------------------------------------------
+# Pack a recognition request. A resolution or gesture scale of 0 leaves the
+# choice to the server.
+def pack_request(request_id, coords, resolution=None, key_fractions=None,
+                 gesture_scale=None):
+    points = np.asarray(coords, '<f4').reshape(-1, 2)
+    fractions = np.asarray(key_fractions or [], '<f4')
+    return REQUEST_HEADER.pack(MSG_RECOGNIZE, request_id, resolution or 0,
+                               gesture_scale or 0, len(points),
+                               len(fractions)) + \
+            points.tobytes() + fractions.tobytes()
+
+# ------------------------------------------------------------------------------
+# Unpack a recognition request into its id and a recognize_batch gesture,
+# raising ValueError if the message does not hold the counted values
+def unpack_request(message):
+    (t, request_id, resolution, scale, num_points, num_fractions) = \
+            REQUEST_HEADER.unpack_from(message)
+    offset = REQUEST_HEADER.size
+    if len(message) != offset + 8 * num_points + 4 * num_fractions:
+        raise ValueError("Request size does not match its counts")
+    points = np.frombuffer(message, '<f4', 2 * num_points, offset)
+    fractions = np.frombuffer(message, '<f4', num_fractions,
+                              offset + 8 * num_points)
+    return (request_id, (points.reshape(-1, 2).astype(float),
+                         resolution or None,
+                         fractions.tolist() if num_fractions else None,
+                         scale or None))
+
+# ------------------------------------------------------------------------------
+# Pack a recognition result
+def pack_response(request_id, vector, options):
+    return RESPONSE_HEADER.pack(MSG_RECOGNIZE, request_id, len(vector),
+                                len(options)) + \
+            np.asarray(vector, '<f4').tobytes() + \
+            b''.join([struct.pack('<If', i, e) for (i, e) in options])
+
+# ------------------------------------------------------------------------------
+# Unpack a recognition result into its id, vector and (index, error) options
+def unpack_response(message):
+    (t, request_id, resolution, num_options) = \
+            RESPONSE_HEADER.unpack_from(message)
+    offset = RESPONSE_HEADER.size
+    vector = np.frombuffer(message, '<f4', resolution, offset).tolist()
+    offset = offset + 4 * resolution
+    options = [struct.unpack_from('<If', message, offset + 8 * i)
+               for i in range(num_options)]
+    return (request_id, vector, options)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=
+            "Serve gesture recognition over a local socket")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1],
+                        help="localhost TCP port to serve on")
+    parser.add_argument("--socket",
+                        help="Unix socket path to serve on instead (Linux "
+                        "and Mac)")
+    parser.add_argument("--words", default="words.txt")
+    parser.add_argument("--layout", help="keyboard layout file")
+    parser.add_argument("--matcher", default="serror")
+    parser.add_argument("--quantization", choices=["int16"])
+    parser.add_argument("--batch-window", type=float, default=0.0,
+                        help="seconds to wait for requests to batch")
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    layout = None
+    if args.layout:
+        layout = sensel_lexicon.load_layout(args.layout)
+    lexicon = sensel_lexicon.GestureLexicon(args.words, layout=layout)
+    lexicon.set_matcher(args.matcher)
+    lexicon.set_quantization(args.quantization)
+    address = args.socket or (DEFAULT_ADDRESS[0], args.port)
+    server = RecognitionServer(lexicon, address, args.batch_window,
+                               args.max_batch)
+    server.start()
+    print("Serving %d words on %s" % (len(lexicon.words), server.address))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+# Finis
@@ -0,0 +1,218 @@
+# ==============================================================================
+# SENSEL DEVICE SIMULATOR
+#
+# Serves the Sensel serial protocol on a pseudo terminal, so that SenselDevice
+# and the programs built on it can run without a Morph attached. Contact
+# frames are queued by the caller. Linux and Mac only.
+# ==============================================================================
+
+import sys
+PY3 = sys.version > '3'
+
+import collections
+import os
+import select
+import threading
+import time
+import tty
+from struct import pack
+import sensel
+
+# ------------------------------------------------------------------------------
+# Pack the 30 bytes of a contact as sent in a frame
+def pack_contact(contact_id, event_type, x_raw, y_raw, force=0, area=0,
+                 uid=0):
+    return pack('<IIIHHHHHHHBBBB', force, uid, area, x_raw, y_raw, 0, 0, 0,
+                0, 0, 0, 0, contact_id, event_type)
+
+# ------------------------------------------------------------------------------
+# Pack a packet: a type byte, a 2-byte size, the payload and its checksum
+def pack_packet(packet_type, payload):
+    return bytearray([packet_type]) + bytearray(pack('<H', len(payload))) + \
+            payload + bytearray([sum(bytearray(payload)) & 0xFF])
+
+# === Simulated Sensel =========================================================
+# A fake Morph answering register and frame reads on a pty
+# ==============================================================================
+
+class SimulatedSensel:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, width_um=230000, height_um=130000, num_cols=185,
+                 num_rows=105, max_contacts=16, frame_rate=125,
+                 serial_number=1):
+
+        # Define device properties
+        self.width_mm = width_um / 1000.0
+        self.height_mm = height_um / 1000.0
+        self.x_to_raw = 256 * (num_cols - 1) / self.width_mm
+        self.y_to_raw = 256 * (num_rows - 1) / self.height_mm
+        self.frame_rate = frame_rate      # Frames per second, None for no limit
+        self.write_chunk = None           # Bytes per pty write, None for all
+        self.drop_late = False            # Drop frames scanned while the host
+                                          # was late to read, as a Morph does
+        self.registers = {
+            sensel.SENSEL_REG_MAGIC: bytearray(b'S3NS31'),
+            sensel.SENSEL_REG_FW_PROTOCOL_VERSION:
+                    bytearray([1, 0, 9, 0, 0, 0, 0, 0, 1]),
+            0x10: bytearray([num_cols]),
+            0x11: bytearray([num_rows]),
+            sensel.SENSEL_REG_SENSOR_ACTIVE_AREA_WIDTH_UM:
+                    bytearray(pack('<I', width_um)),
+            sensel.SENSEL_REG_SENSOR_ACTIVE_AREA_HEIGHT_UM:
+                    bytearray(pack('<I', height_um)),
+            sensel.SENSEL_REG_SCAN_FRAME_RATE: bytearray([frame_rate or 0]),
+            sensel.SENSEL_REG_SCAN_CONTENT_CONTROL: bytearray([0]),
+            sensel.SENSEL_REG_SCAN_ENABLED: bytearray([0]),
+            sensel.SENSEL_REG_CONTACTS_MAX_COUNT: bytearray([max_contacts]),
+            sensel.SENSEL_REG_LED_BRIGHTNESS: bytearray(16),
+            sensel.SENSEL_REG_ERROR_CODE: bytearray([sensel.EC_OK]),
+            sensel.SENSEL_REG_BATTERY_VOLTAGE_MV: bytearray(pack('<H', 4000)),
+        }
+        self.serial_number = bytearray(pack('<I', serial_number))
+
+        # Define more variables
+        self.frames = collections.deque() # Queued frames of packed contacts
+        self.noise = collections.deque()  # Bytes to send before responses
+        self.frames_sent = 0              # Frame packets answered
+        self.empty_frames_sent = 0        # Of which had no queued contacts
+        self.frames_dropped = 0           # Queued frames dropped as late
+        self.running = False
+        self.next_frame_time = 0          # Earliest time of the next frame
+        (self.master, self.slave) = os.openpty()
+        tty.setraw(self.slave)
+        self.port_name = os.ttyname(self.slave)
+        self.thread = None
+
+    # --------------------------------------------------------------------------
+    # Queue a frame of (id, event type, x mm, y mm, force, area) contacts,
+    # each optionally followed by a unique id
+    def add_frame(self, contacts):
+        data = bytearray()
+        for contact in contacts:
+            (contact_id, event_type, x, y, force, area) = contact[:6]
+            data += pack_contact(contact_id, event_type,
+                                 int(round(x * self.x_to_raw)),
+                                 int(round(y * self.y_to_raw)), force, area,
+                                 contact[6] if len(contact) > 6 else 0)
+        self.add_frame_data(bytearray([sensel.SENSEL_FRAME_CONTACTS_FLAG, 0,
+                                       len(contacts)]) + data)
+
+    # --------------------------------------------------------------------------
+    # Queue the payload of a frame packet
+    def add_frame_data(self, data):
+        self.frames.append(data)
+
+    # --------------------------------------------------------------------------
+    # Queue bytes to send ahead of the next response, to corrupt the stream
+    def add_noise(self, data):
+        self.noise.append(bytearray(data))
+
+    # --------------------------------------------------------------------------
+    # Get the number of frames not yet read
+    def pending(self):
+        return len(self.frames)
+
+    # --------------------------------------------------------------------------
+    # Start answering requests on a background thread
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    # --------------------------------------------------------------------------
+    # Stop answering requests and close the pty
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    # --------------------------------------------------------------------------
+    # Parse requests from the host and answer them
+    def serve(self):
+        buf = bytearray()
+        while self.running:
+            (readable, w, x) = select.select([self.master], [], [], 0.05)
+            if not readable:
+                continue
+            try:
+                buf += bytearray(os.read(self.master, 4096))
+            except OSError:
+                return
+            while len(buf) >= 3:
+                (header, reg, size) = (buf[0], buf[1], buf[2])
+                if header == sensel.SENSEL_READ_HEADER:
+                    del buf[:3]
+                    self.write(self.read_response(reg, size))
+                elif header == sensel.SENSEL_WRITE_HEADER:
+                    if len(buf) < 4 + size:
+                        break
+                    data = buf[3:3+size]
+                    checksum = buf[3+size]
+                    del buf[:4+size]
+                    self.write(self.write_response(reg, data, checksum))
+                else:
+                    del buf[:1]           # Resynchronize on the next header
+
+    # --------------------------------------------------------------------------
+    # Build the answer to a register or frame read
+    def read_response(self, reg, size):
+        if reg == sensel.SENSEL_REG_SCAN_READ_FRAME:
+            return pack_packet(sensel.SENSEL_PT_FRAME, self.next_frame())
+        if size == 0:
+            if reg == sensel.SENSEL_REG_DEVICE_SERIAL_NUMBER:
+                return pack_packet(sensel.SENSEL_PT_RVS_ACK,
+                                   self.serial_number)
+            return bytearray([sensel.SENSEL_PT_RVS_NACK])
+        data = bytearray(size)
+        for i in range(size):
+            for (start, value) in self.registers.items():
+                if start <= reg + i < start + len(value):
+                    data[i] = value[reg + i - start]
+        return pack_packet(sensel.SENSEL_PT_READ_ACK, data)
+
+    # --------------------------------------------------------------------------
+    # Store a register write and build its acknowledgement
+    def write_response(self, reg, data, checksum):
+        if sum(data) & 0xFF != checksum:
+            return bytearray([sensel.SENSEL_PT_WRITE_NACK])
+        if reg in self.registers and len(data) <= len(self.registers[reg]):
+            self.registers[reg][:len(data)] = data
+        return bytearray([sensel.SENSEL_PT_WRITE_ACK])
+
+    # --------------------------------------------------------------------------
+    # Get the next frame payload, waiting for the scan period to pass
+    def next_frame(self):
+        if self.frame_rate:
+            now = time.time()
+            period = 1.0 / self.frame_rate
+            if now < self.next_frame_time:
+                time.sleep(self.next_frame_time - now)
+                now = self.next_frame_time
+            elif self.drop_late and self.next_frame_time:
+                late = int((now - self.next_frame_time) / period) # Scans missed
+                for i in range(min(late, len(self.frames))):
+                    self.frames.popleft()
+                    self.frames_dropped = self.frames_dropped + 1
+            self.next_frame_time = max(now, self.next_frame_time) + period
+        self.frames_sent = self.frames_sent + 1
+        if self.frames:
+            return self.frames.popleft()
+        self.empty_frames_sent = self.empty_frames_sent + 1
+        return bytearray([sensel.SENSEL_FRAME_CONTACTS_FLAG, 0, 0])
+
+    # --------------------------------------------------------------------------
+    # Write all of a response to the pty
+    def write(self, data):
+        if self.noise:
+            data = self.noise.popleft() + data
+        data = bytes(data)
+        while data:
+            n = os.write(self.master, data[:self.write_chunk or len(data)])
+            data = data[n:]
+
+# Finis
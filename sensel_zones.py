@@ -0,0 +1,138 @@
+# ==============================================================================
+# SENSEL OVERLAY ZONES
+#
+# Loads the zones of an overlay (keyboard, trackpad, shortcut buttons, ...)
+# from a JSON file. A point lies in a zone when it is strictly inside its
+# rectangle, and later zones lie on top of earlier ones. Overlays with many
+# zones are compiled into a grid, so that finding the zone under a point
+# costs about the same however many zones there are; cells cut by a zone edge
+# fall back to the exact bounds. A few zones are simply scanned.
+# ==============================================================================
+
+import json
+import numpy as np
+
+# Contact handling for each zone type, as stored in the emulator's contact_types
+ZONE_TYPES = {
+    "keyboard": 1,
+    "trackpad": 2,
+    "button": 3,
+}
+
+# ------------------------------------------------------------------------------
+# Load zone definitions from a JSON file
+def load_zones(zone_file):
+    f = open(zone_file, 'r')
+    config = json.load(f)
+    f.close()
+    zones = config["zones"]
+    for zone in zones:
+        if zone["type"] not in ZONE_TYPES or len(zone["rect"]) != 4:
+            raise ValueError("Invalid zone %s" % zone.get("name"))
+        zone["type_id"] = ZONE_TYPES[zone["type"]]
+    return zones
+
+# === Zone Map =================================================================
+# Grid lookup table of the zones covering the device area
+# ==============================================================================
+
+class ZoneMap:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, zones, width, height, cell_size=0.5):
+        self.zones = zones                # Zones, each with an (x0, x1, y0, y1)
+        self.cell_size = cell_size        # Grid cell edge length (mm)
+        self.max_scanned = 8              # Scan this few zones without a grid
+        self.cols = int(np.ceil(width / float(cell_size))) + 1
+        self.rows = int(np.ceil(height / float(cell_size))) + 1
+        self.compile()
+
+    # --------------------------------------------------------------------------
+    # Paint every zone into the grid, later zones on top of earlier ones.
+    # Cells a zone covers whole get its number. Cells cut by the edges of
+    # zones above any that covers them whole get -1 - k, where cut_cells[k]
+    # lists the zones to check against their bounds, topmost first, and the
+    # number of the zone under them.
+    def compile(self):
+        self.grid = None
+        self.cells = None
+        self.cut_cells = []
+        if len(self.zones) <= self.max_scanned:
+            return
+        self.grid = np.zeros((self.rows, self.cols), np.int16) # 0 is no zone
+        edges = np.arange(max(self.rows, self.cols) + 1) * self.cell_size
+        (x_lo, x_hi) = (edges[:self.cols], edges[1:self.cols+1])
+        (y_lo, y_hi) = (edges[:self.rows], edges[1:self.rows+1])
+        spans = []
+        for i in range(len(self.zones)):
+            (x0, x1, y0, y1) = self.zones[i]["rect"]
+            touched = (get_span((y_hi > y0) & (y_lo < y1)),
+                       get_span((x_hi > x0) & (x_lo < x1)))
+            covered = (get_span((y_lo > y0) & (y_hi <= y1)),
+                       get_span((x_lo > x0) & (x_hi <= x1)))
+            self.grid[covered[0][0]:covered[0][1],
+                      covered[1][0]:covered[1][1]] = i + 1
+            spans.append((touched, covered))
+        self.cells = self.grid.tolist()   # Nested lists index faster per point
+
+        # List the zones cutting each cell, except those under a zone that
+        # covers it whole
+        for i in range(len(self.zones)):
+            (((r0, r1), (c0, c1)), ((cr0, cr1), (cc0, cc1))) = spans[i]
+            for row in range(r0, r1):
+                cols = range(c0, c1)
+                if cr0 <= row < cr1 and cc0 < cc1:
+                    cols = list(range(c0, cc0)) + list(range(cc1, c1))
+                for col in cols:
+                    k = self.cells[row][col]
+                    if k > i + 1:
+                        continue          # Under a zone covering the cell
+                    if k >= 0:
+                        self.cut_cells.append(([], k))
+                        k = -len(self.cut_cells)
+                        self.cells[row][col] = k
+                    self.cut_cells[-k - 1][0].insert(0, i)
+
+    # --------------------------------------------------------------------------
+    # Get the zone at the given point, or None
+    def get_zone(self, x, y):
+        if self.cells is None:
+            return self.find_zone(x, y)
+        col = int(x / self.cell_size)
+        row = int(y / self.cell_size)
+        if 0 <= row < self.rows and 0 <= col < self.cols and x >= 0 and y >= 0:
+            i = self.cells[row][col]
+            if i < 0:
+                (cut, i) = self.cut_cells[-i - 1]
+                for k in cut:
+                    (x0, x1, y0, y1) = self.zones[k]["rect"]
+                    if x0 < x < x1 and y0 < y < y1:
+                        return self.zones[k]
+            if i:
+                return self.zones[i - 1]
+            return None
+        return self.find_zone(x, y)
+
+    # --------------------------------------------------------------------------
+    # Get the topmost zone whose bounds hold the point, or None
+    def find_zone(self, x, y):
+        for i in range(len(self.zones) - 1, -1, -1):
+            (x0, x1, y0, y1) = self.zones[i]["rect"]
+            if x0 < x < x1 and y0 < y < y1:
+                return self.zones[i]
+        return None
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# UTILITY ROUTINES
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# ------------------------------------------------------------------------------
+# Get the (start, stop) range of the true entries of a contiguous mask
+def get_span(mask):
+    indices = np.nonzero(mask)[0]
+    if len(indices) == 0:
+        return (0, 0)
+    return (int(indices[0]), int(indices[-1]) + 1)
+
+# Finis
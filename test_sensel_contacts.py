@@ -0,0 +1,221 @@
+# ==============================================================================
+# SENSEL CONTACT HANDLING TESTS
+#
+# Feeds frames of interleaved contacts through the emulator's contact handling
+# and checks what reaches gesture dispatch, the pointer and the callbacks.
+#
+# Example: python -m unittest test_sensel_contacts
+# ==============================================================================
+
+import unittest
+import sensel
+import sensel_contacts
+import sensel_features
+import sensel_pointer
+import sensel_zones
+
+START = sensel.SENSEL_EVENT_CONTACT_START
+MOVE = sensel.SENSEL_EVENT_CONTACT_MOVE
+END = sensel.SENSEL_EVENT_CONTACT_END
+
+# === Test Doubles =============================================================
+# Contacts as SenselDevice reads them, and a dispatcher that keeps its input
+# ==============================================================================
+
+class Contact:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, contact_id, event, x, y, force=100):
+        self.id = contact_id
+        self.type = event
+        self.x_pos_mm = x
+        self.y_pos_mm = y
+        self.total_force = force
+
+class RecordingDispatcher:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self):
+        self.submitted = []               # (path, key fractions) in order
+
+    # --------------------------------------------------------------------------
+    # Keep a submitted gesture
+    def submit(self, path, key_fractions=None):
+        self.submitted.append((path, key_fractions))
+
+# === Contact Handler Tests ====================================================
+# Keyboard, trackpad and button contacts across frames and devices
+# ==============================================================================
+
+class ContactHandlerTest(unittest.TestCase):
+
+    # --------------------------------------------------------------------------
+    # Build a handler for two devices on the standard overlay
+    def setUp(self):
+        zones = sensel_zones.load_zones('overlay_zones.json')
+        zone_map = sensel_zones.ZoneMap(zones, 230, 130)
+        self.dispatcher = RecordingDispatcher()
+        self.backend = sensel_pointer.RecordingBackend()
+        self.handler = sensel_contacts.ContactHandler(zone_map, 16, 2,
+                self.dispatcher, sensel_pointer.PointerPipeline(self.backend))
+        self.clicks = 0
+        self.chords = []
+        self.buttons = []
+        self.handler.on_click = self.click
+        self.handler.on_chord = self.chords.append
+        self.handler.on_button = self.buttons.append
+
+    # --------------------------------------------------------------------------
+    # Count a trackpad tap
+    def click(self):
+        self.clicks = self.clicks + 1
+
+    # --------------------------------------------------------------------------
+    # Play frames of (contact id, event, x, y) on a device, a frame at a time
+    def play(self, frames, device_index=0):
+        for (i, frame) in enumerate(frames):
+            contacts = [Contact(*c) for c in frame]
+            self.handler.handle_frame(i / 125.0, device_index, contacts)
+
+    # --------------------------------------------------------------------------
+    # Trace fingers in the keyboard zone as (start frame, points) gestures,
+    # interleaving the samples of those down at once
+    def make_frames(self, gestures):
+        length = max([start + len(points) for (start, points) in gestures])
+        frames = [[] for i in range(length)]
+        for (contact_id, (start, points)) in enumerate(gestures):
+            for (j, (x, y)) in enumerate(points):
+                event = MOVE
+                if j == 0:
+                    event = START
+                elif j == len(points) - 1:
+                    event = END
+                frames[start + j].append((contact_id, event, x, y))
+        return frames
+
+    # --------------------------------------------------------------------------
+    # Fingers moving at the same time each get only their own samples up to
+    # their last move, and are submitted in the order they end
+    def test_interleaved_keyboard_traces(self):
+        gestures = [
+            (0, [(20.0 + j, 30.0) for j in range(40)]),
+            (10, [(60.0, 20.0 + j) for j in range(20)]),
+            (20, [(100.0 - j, 90.0 - j) for j in range(30)]),
+        ]
+        self.play(self.make_frames(gestures))
+        paths = [path for (path, fractions) in self.dispatcher.submitted]
+        self.assertEqual(paths, [gestures[1][1][:-1], gestures[0][1][:-1],
+                                 gestures[2][1][:-1]])
+        self.assertEqual(self.chords, [])
+
+    # --------------------------------------------------------------------------
+    # A submitted trace is not changed by the next gesture on the same
+    # contact id
+    def test_submitted_trace_survives_reuse(self):
+        first = [(20.0 + j, 30.0) for j in range(15)]
+        second = [(80.0, 40.0 + j) for j in range(15)]
+        self.play(self.make_frames([(0, first)]) +
+                  self.make_frames([(0, second)]))
+        self.assertEqual([p for (p, f) in self.dispatcher.submitted],
+                         [first[:-1], second[:-1]])
+
+    # --------------------------------------------------------------------------
+    # The same contact id on two devices traces two separate gestures
+    def test_devices_keep_separate_traces(self):
+        left = [(20.0 + j, 30.0) for j in range(12)]
+        right = [(40.0, 60.0 - j) for j in range(12)]
+        frames = self.make_frames([(0, left)]) + [[]] * 8
+        other = self.make_frames([(8, right)])
+        for i in range(len(frames)):
+            self.handler.handle_frame(i / 125.0, 0,
+                                      [Contact(*c) for c in frames[i]])
+            self.handler.handle_frame(i / 125.0, 1,
+                                      [Contact(*c) for c in other[i]])
+        self.assertEqual([p for (p, f) in self.dispatcher.submitted],
+                         [left[:-1], right[:-1]])
+
+    # --------------------------------------------------------------------------
+    # Two fingers touching down together make one two-finger command with
+    # their mean movement, and no gesture
+    def test_two_finger_command(self):
+        self.play(self.make_frames([
+            (0, [(80.0, 30.0 + 2 * j) for j in range(10)]),
+            (1, [(90.0, 31.0 + 2 * j) for j in range(10)]),
+        ]))
+        self.assertEqual(self.dispatcher.submitted, [])
+        self.assertEqual(len(self.chords), 1)
+        self.assertAlmostEqual(self.chords[0][0], 0.0)
+        self.assertAlmostEqual(self.chords[0][1], 16.0)
+
+    # --------------------------------------------------------------------------
+    # Fingers touching down together on different devices are two gestures
+    def test_devices_do_not_pair(self):
+        left = [(80.0, 30.0 + 2 * j) for j in range(10)]
+        right = [(90.0, 31.0 + 2 * j) for j in range(10)]
+        frames = self.make_frames([(0, left)])
+        other = self.make_frames([(0, right)])
+        for i in range(len(frames)):
+            self.handler.handle_frame(i / 125.0, 0,
+                                      [Contact(*c) for c in frames[i]])
+            self.handler.handle_frame(i / 125.0, 1,
+                                      [Contact(*c) for c in other[i]])
+        self.assertEqual(self.chords, [])
+        self.assertEqual([p for (p, f) in self.dispatcher.submitted],
+                         [left[:-1], right[:-1]])
+
+    # --------------------------------------------------------------------------
+    # Fingers touching down together are two gestures once either is too long
+    # for a command, submitted in the order they end
+    def test_long_contacts_do_not_pair(self):
+        length = self.handler.chord_max_frames + 10
+        short = [(80.0, 30.0 + j) for j in range(10)]
+        first = [(20.0 + j * 0.5, 30.0) for j in range(length)]
+        second = [(60.0, 20.0 + j * 0.5) for j in range(length + 5)]
+        self.play(self.make_frames([(0, short), (2, first)]))
+        self.play(self.make_frames([(0, first), (1, second)]))
+        self.assertEqual(self.chords, [])
+        self.assertEqual([p for (p, f) in self.dispatcher.submitted],
+                         [short[:-1], first[:-1], first[:-1], second[:-1]])
+
+    # --------------------------------------------------------------------------
+    # With contact features on, gestures are submitted as key point paths
+    # with the fractions of the key point path's length at which they lie
+    def test_feature_paths(self):
+        self.handler.features = sensel_features.GestureFeatures(32)
+        points = [(20.0 + j, 30.0) for j in range(30)] + \
+                 [(49.0, 30.0 + j) for j in range(1, 30)]
+        self.play(self.make_frames([(0, points), (10, points)]))
+        self.assertEqual(len(self.dispatcher.submitted), 2)
+        for (path, fractions) in self.dispatcher.submitted:
+            self.assertEqual(path[0], points[0])
+            self.assertEqual(path[-1], points[-2])
+            self.assertEqual(len(path), len(fractions))
+            lengths = [0.0]
+            for i in range(1, len(path)):
+                lengths.append(lengths[-1] + sensel_contacts.distance(
+                        path[i], path[i-1]))
+            for i in range(len(path)):
+                self.assertAlmostEqual(fractions[i], lengths[i] / lengths[-1])
+
+    # --------------------------------------------------------------------------
+    # A still trackpad touch clicks, a moving one moves the cursor, and a
+    # button runs its zone's action when released
+    def test_trackpad_and_buttons(self):
+        self.play([[(0, START, 180.0, 40.0)], [(0, MOVE, 180.5, 40.0)],
+                   [(0, END, 180.5, 40.0)]])
+        self.assertEqual(self.clicks, 1)
+        self.play([[(1, START, 170.0, 40.0)]] +
+                  [[(1, MOVE, 170.0 + 2 * j, 40.0)] for j in range(1, 20)] +
+                  [[(1, END, 208.0, 40.0)]])
+        self.assertEqual(self.clicks, 1)
+        self.assertTrue(self.backend.position[0] > 0)
+        self.play([[(2, START, 200.0, 100.0)], [(2, END, 200.0, 100.0)]])
+        self.assertEqual([z["name"] for z in self.buttons], ["enter"])
+        self.assertEqual(self.handler.count_active(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
+
+# Finis
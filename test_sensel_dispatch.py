@@ -0,0 +1,65 @@
+# ==============================================================================
+# SENSEL GESTURE DISPATCH TESTS
+#
+# Matches gestures on dispatcher workers with a stand-in lexicon and checks
+# that results come back in order, also when matching fails.
+#
+# Example: python -m unittest test_sensel_dispatch
+# ==============================================================================
+
+import time
+import unittest
+import sensel_dispatch
+
+# === Test Doubles =============================================================
+# A lexicon that names each gesture by its path, failing on request
+# ==============================================================================
+
+class NamingLexicon:
+
+    # --------------------------------------------------------------------------
+    # Initilize class variables
+    def __init__(self, failing):
+        self.failing = failing            # Paths whose matching raises
+
+    # --------------------------------------------------------------------------
+    # Recognize a gesture as its own path, or fail like a lost connection
+    def recognize(self, path, resolution=None, key_fractions=None):
+        if path in self.failing:
+            raise IOError("Connection lost")
+        return ([0.0], [(path, 0.0)])
+
+# === Gesture Dispatcher Tests =================================================
+# In-order results and matching failures
+# ==============================================================================
+
+class GestureDispatcherTest(unittest.TestCase):
+
+    # --------------------------------------------------------------------------
+    # Poll a dispatcher until every submitted gesture is returned
+    def poll_all(self, dispatcher, timeout=5.0):
+        results = []
+        deadline = time.time() + timeout
+        while dispatcher.pending() > 0 and time.time() < deadline:
+            results.extend(dispatcher.poll())
+            time.sleep(0.001)
+        return results
+
+    # --------------------------------------------------------------------------
+    # A failed gesture comes back without options, and the workers go on to
+    # match the gestures after it
+    def test_failed_matching(self):
+        dispatcher = sensel_dispatch.GestureDispatcher(NamingLexicon([1]), 2)
+        for path in range(4):
+            dispatcher.submit(path)
+        results = self.poll_all(dispatcher)
+        dispatcher.stop()
+        self.assertEqual(dispatcher.pending(), 0)
+        self.assertEqual([options for (v, options, p) in results],
+                         [[(0, 0.0)], [], [(2, 0.0)], [(3, 0.0)]])
+        self.assertEqual(dispatcher.errors, 1)
+
+if __name__ == "__main__":
+    unittest.main()
+
+# Finis
@@ -0,0 +1,86 @@
+# ==============================================================================
+# SENSEL RECOGNITION SERVICE TESTS
+#
+# Runs a recognition server on a free localhost port and checks that bad
+# requests get an empty answer without stopping the service for other clients.
+#
+# Example: python -m unittest test_sensel_service
+# ==============================================================================
+
+import random
+import unittest
+import sensel_benchmark
+import sensel_lexicon
+import sensel_service
+
+# === Recognition Service Tests ================================================
+# Request checks, failing batches and the gesture scale of requests
+# ==============================================================================
+
+class RecognitionServiceTest(unittest.TestCase):
+
+    # --------------------------------------------------------------------------
+    # Serve a small lexicon with a generated gesture to recognize
+    def setUp(self):
+        self.lexicon = sensel_lexicon.GestureLexicon(None)
+        self.lexicon.set_words(sensel_lexicon.read_words('words.txt')[:500])
+        rng = random.Random(1)
+        self.gesture = sensel_benchmark.make_gesture(self.lexicon,
+                            self.lexicon.words[42], rng)
+        self.server = sensel_service.RecognitionServer(self.lexicon,
+                                                       ("127.0.0.1", 0))
+        self.server.start()
+        self.client = sensel_service.RecognitionClient(self.server.address)
+
+    # --------------------------------------------------------------------------
+    # Close the client and stop the server
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    # --------------------------------------------------------------------------
+    # Resolutions the lexicon does not hold get no options, and later
+    # requests are still answered
+    def test_unknown_resolution(self):
+        for resolution in (1, 20):
+            (vector, options) = self.client.recognize(self.gesture, resolution)
+            self.assertEqual(len(vector), 0)
+            self.assertEqual(options, [])
+        (vector, options) = self.client.recognize(self.gesture)
+        self.assertEqual([i for (i, e) in options],
+                         [i for (i, e) in self.lexicon.recognize(
+                                self.gesture)[1]])
+        self.assertEqual(self.server.errors, 2)
+
+    # --------------------------------------------------------------------------
+    # A request whose matching fails gets no options, and the scorer goes on
+    def test_failed_request(self):
+        recognize_batch = self.lexicon.recognize_batch
+        def failing(gestures):
+            if len(gestures[0][0]) == 1:
+                raise ZeroDivisionError("Bad gesture")
+            return recognize_batch(gestures)
+        self.lexicon.recognize_batch = failing
+        self.assertEqual(self.client.recognize([(1.0, 2.0)])[1], [])
+        self.assertTrue(len(self.client.recognize(self.gesture)[1]) > 0)
+        self.assertEqual(self.server.errors, 1)
+
+    # --------------------------------------------------------------------------
+    # DTW batches prune with the gesture scale of each request
+    def test_dtw_gesture_scale(self):
+        self.lexicon.set_matcher("dtw")
+        self.lexicon.shard_tolerance = 0.0
+        for scale in (0.5, 2.0, 8.0):
+            expected = self.lexicon.recognize(self.gesture, None, None, scale)
+            result = self.lexicon.recognize_batch([(self.gesture, None, None,
+                                                    scale)])[0]
+            self.assertEqual(result[1], expected[1])
+        self.assertNotEqual(self.lexicon.recognize(self.gesture, None, None,
+                                                   0.5)[1],
+                            self.lexicon.recognize(self.gesture, None, None,
+                                                   8.0)[1])
+
+if __name__ == "__main__":
+    unittest.main()
+
+# Finis